@@ -0,0 +1,598 @@
+"""
+Build the cross-source analytics store.
+Loads the per-keyword Meta ad JSONs, the annotation UI's per-keyword CSVs,
+the Gemini classification JSONs and reviews_with_topics.csv into typed
+DuckDB tables that share an app_key column, and exports every table to
+Parquet. Ad spend, impression and audience ranges are flattened into numeric
+bounds once and rolled up per page, keyword and month. DuckDB reads the sources directly and spills to disk, so the
+ingestion does not need the corpus to fit in memory.
+
+Usage:
+    python build_store.py [--ads-folder ...] [--annotation-folder ...]
+                          [--gemini-folder ...] [--reviews ...]
+                          [--reviews-folder ...] [--store-dir ...]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import duckdb
+
+# Configuration
+ADS_FOLDER = r"/path/to/meta ads metadata json"
+ANNOTATION_FOLDER = r"/path/to/store annotation csv"
+GEMINI_RESULTS_FOLDER = r"/path/to/output annotations"
+REVIEWS_WITH_TOPICS = r"/path/to/reviews_with_topics.csv"
+# Per-app review CSVs; supply app and score when reviews_with_topics.csv was
+# exported by bert_topic_modelling.ipynb, which does not write them
+REVIEWS_FOLDER = r"/path/to/google play reviews"
+STORE_DIR = Path("analytics_store")
+DATABASE_NAME = "analytics.duckdb"
+MEMORY_LIMIT = "4GB"  # DuckDB spills to STORE_DIR/tmp beyond this
+# Links between app keys that normalize differently but are the same app,
+# e.g. {"fairplay24": "fairplay"}. Keys are lowercase alphanumerics only.
+APP_ALIASES = {}
+
+# Columns of the Graph API fields requested by run_fetch_ads.py, plus the
+# media_type added by the media downloader
+AD_COLUMNS = {
+    "id": "VARCHAR",
+    "page_id": "VARCHAR",
+    "page_name": "VARCHAR",
+    "ad_snapshot_url": "VARCHAR",
+    "ad_creation_time": "VARCHAR",
+    "ad_delivery_start_time": "VARCHAR",
+    "ad_delivery_stop_time": "VARCHAR",
+    "ad_creative_bodies": "VARCHAR[]",
+    "ad_creative_link_titles": "VARCHAR[]",
+    "impressions": "STRUCT(lower_bound VARCHAR, upper_bound VARCHAR)",
+    "spend": "STRUCT(lower_bound VARCHAR, upper_bound VARCHAR)",
+    "estimated_audience_size": "STRUCT(lower_bound VARCHAR, upper_bound VARCHAR)",
+    "demographic_distribution": (
+        "STRUCT(percentage VARCHAR, age VARCHAR, gender VARCHAR)[]"
+    ),
+    "delivery_by_region": "STRUCT(percentage VARCHAR, region VARCHAR)[]",
+    "currency": "VARCHAR",
+    "publisher_platforms": "VARCHAR[]",
+    "languages": "VARCHAR[]",
+    "media_type": "VARCHAR",
+}
+ANNOTATION_LIST_FIELDS = [
+    "ad_category",
+    "app_name",
+    "primary_messaging_strategy",
+    "potentially_harmful_narratives",
+    "media_authenticity",
+]
+# Columns of the annotation UI's CSVs that load_ad_annotations reads
+ANNOTATION_CSV_COLUMNS = [
+    "id",
+    "is_spam",
+    *ANNOTATION_LIST_FIELDS,
+    "app_name_other",
+    "ad_category_other",
+    "sexual_content",
+    "ad_notes",
+    "timestamp",
+]
+# Columns of reviews_with_topics.csv that load_reviews reads
+REVIEW_CSV_COLUMNS = [
+    "reviewId",
+    "app",
+    "score",
+    "review_text",
+    "topic_id",
+    "topic_probability",
+    "qwen_label",
+]
+# Sums shared by the spend rollups. Spend is in the ad's currency, so every
+# rollup is also grouped by currency. Open-ended ranges (e.g. impressions
+# above 1M) have no upper bound; they add their lower bound to the upper sum
+# and midpoint, so those are lower estimates.
+ROLLUP_MEASURES = """
+    count(*) AS ads,
+    sum(spend_lower)::BIGINT AS spend_lower,
+    sum(coalesce(spend_upper, spend_lower))::BIGINT AS spend_upper,
+    sum(spend_mid) AS spend_mid,
+    sum(impressions_lower)::BIGINT AS impressions_lower,
+    sum(coalesce(impressions_upper, impressions_lower))::BIGINT AS impressions_upper,
+    sum(impressions_mid) AS impressions_mid,
+    min(delivery_start_date) AS first_delivery,
+    max(coalesce(delivery_stop_date, delivery_start_date)) AS last_delivery
+"""
+TABLES = [
+    "app_aliases",
+    "ads",
+    "spend_by_page",
+    "spend_by_keyword",
+    "spend_by_month",
+    "ad_annotations",
+    "post_classifications",
+    "reviews",
+    "promotion_narratives",
+    "apps",
+]
+
+
+def sql_string(value):
+    """Quote a path or value as a SQL string literal."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def struct_type(columns):
+    return "{" + ", ".join(f"'{k}': '{v}'" for k, v in columns.items()) + "}"
+
+
+def empty_source(columns):
+    """
+    Typed relation with no rows, read in place of a missing source so the
+    table still gets the columns a real load would give it.
+    """
+    nulls = ", ".join(f'NULL::{type_} AS "{name}"' for name, type_ in columns.items())
+    return f"(SELECT {nulls} WHERE false)"
+
+
+def source_glob(folder, pattern):
+    """Glob for a source folder, or None when it has no matching files."""
+    folder = Path(folder)
+    if not any(folder.glob(pattern)):
+        print(f"⚠️  No {pattern} files in {folder}, skipping")
+        return None
+    return sql_string(folder / pattern)
+
+
+def create_macros(con):
+    con.execute(
+        """
+        CREATE OR REPLACE MACRO normalize_app(name) AS
+            nullif(regexp_replace(lower(trim(name)), '[^a-z0-9]', '', 'g'), '')
+        """
+    )
+    con.execute(
+        """
+        CREATE OR REPLACE MACRO split_list(value) AS
+            list_filter(string_split(coalesce(value, ''), ';'), x -> trim(x) <> '')
+        """
+    )
+    con.execute(
+        """
+        CREATE OR REPLACE MACRO keyword_from_path(path) AS
+            regexp_extract(path, '([^/\\\\]+)\\.[a-z]+$', 1)
+        """
+    )
+
+
+def load_app_aliases(con):
+    con.execute(
+        "CREATE OR REPLACE TABLE app_aliases (alias VARCHAR PRIMARY KEY, app_key VARCHAR)"
+    )
+    if APP_ALIASES:
+        con.executemany(
+            "INSERT INTO app_aliases VALUES (normalize_app(?), normalize_app(?))",
+            list(APP_ALIASES.items()),
+        )
+    # Resolve a raw app name to its canonical key
+    con.execute(
+        """
+        CREATE OR REPLACE MACRO resolve_app(name) AS coalesce(
+            (SELECT a.app_key FROM app_aliases a WHERE a.alias = normalize_app(name)),
+            normalize_app(name)
+        )
+        """
+    )
+
+
+def load_ads(con, ads_folder):
+    """
+    One row per (keyword, ad), with the Ad Library's range objects flattened
+    into integer bounds and the region and demographic splits as typed lists.
+    """
+    source = source_glob(ads_folder, "*.json")
+    if source is None:
+        # Same columns as read_json, so the normalization below still applies
+        raw = f"SELECT * FROM {empty_source({**AD_COLUMNS, 'filename': 'VARCHAR'})}"
+    else:
+        raw = f"""
+            SELECT * FROM read_json(
+                {source},
+                format = 'array',
+                columns = {struct_type(AD_COLUMNS)},
+                filename = true
+            )
+        """
+    con.execute(f"CREATE OR REPLACE TEMP VIEW ads_raw AS {raw}")
+    con.execute(
+        """
+        CREATE OR REPLACE MACRO range_mid(lower, upper) AS
+            (lower + coalesce(upper, lower)) / 2
+        """
+    )
+    con.execute(
+        """
+        CREATE OR REPLACE TABLE ads AS
+        WITH bounds AS (
+            SELECT
+                *,
+                TRY_CAST(impressions.lower_bound AS BIGINT) AS impressions_lower,
+                TRY_CAST(impressions.upper_bound AS BIGINT) AS impressions_upper,
+                TRY_CAST(spend.lower_bound AS BIGINT) AS spend_lower,
+                TRY_CAST(spend.upper_bound AS BIGINT) AS spend_upper,
+                TRY_CAST(estimated_audience_size.lower_bound AS BIGINT)
+                    AS audience_lower,
+                TRY_CAST(estimated_audience_size.upper_bound AS BIGINT)
+                    AS audience_upper
+            FROM ads_raw
+        )
+        SELECT
+            keyword_from_path(filename) AS keyword,
+            resolve_app(keyword_from_path(filename)) AS app_key,
+            id AS ad_id,
+            page_id,
+            page_name,
+            TRY_CAST(ad_creation_time AS DATE) AS ad_creation_date,
+            TRY_CAST(ad_delivery_start_time AS DATE) AS delivery_start_date,
+            TRY_CAST(ad_delivery_stop_time AS DATE) AS delivery_stop_date,
+            date_trunc('month', TRY_CAST(ad_delivery_start_time AS DATE))
+                AS delivery_month,
+            ad_creative_bodies[1] AS body,
+            ad_creative_link_titles[1] AS link_title,
+            impressions_lower,
+            impressions_upper,
+            range_mid(impressions_lower, impressions_upper) AS impressions_mid,
+            spend_lower,
+            spend_upper,
+            range_mid(spend_lower, spend_upper) AS spend_mid,
+            audience_lower,
+            audience_upper,
+            currency,
+            list_transform(
+                delivery_by_region,
+                r -> {'region': r.region, 'share': TRY_CAST(r.percentage AS DOUBLE)}
+            ) AS regions,
+            list_transform(
+                demographic_distribution,
+                d -> {
+                    'age': d.age,
+                    'gender': d.gender,
+                    'share': TRY_CAST(d.percentage AS DOUBLE)
+                }
+            ) AS demographics,
+            publisher_platforms,
+            languages,
+            media_type,
+            ad_snapshot_url
+        FROM bounds
+        """
+    )
+
+
+def build_spend_rollups(con):
+    """
+    Spend and impression totals per advertiser page, keyword and delivery
+    month. An ad returned by several keyword searches counts once per page
+    and month, and once under each of its keywords.
+    """
+    unique_ads = """
+        unique_ads AS (
+            SELECT * FROM ads
+            QUALIFY row_number() OVER (PARTITION BY ad_id ORDER BY keyword) = 1
+        )
+    """
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE spend_by_page AS
+        WITH {unique_ads}
+        SELECT
+            page_id,
+            any_value(page_name) AS page_name,
+            currency,
+            {ROLLUP_MEASURES}
+        FROM unique_ads
+        GROUP BY page_id, currency
+        """
+    )
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE spend_by_keyword AS
+        SELECT keyword, currency, count(DISTINCT page_id) AS pages, {ROLLUP_MEASURES}
+        FROM ads
+        GROUP BY keyword, currency
+        """
+    )
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE spend_by_month AS
+        WITH {unique_ads}
+        SELECT
+            delivery_month,
+            currency,
+            count(DISTINCT page_id) AS pages,
+            {ROLLUP_MEASURES}
+        FROM unique_ads
+        GROUP BY delivery_month, currency
+        """
+    )
+
+
+def load_ad_annotations(con, annotation_folder):
+    """Manual ad annotations, with the ';'-joined answers split into lists."""
+    source = source_glob(annotation_folder, "*.csv")
+    if source is None:
+        raw = empty_source(
+            {name: "VARCHAR" for name in [*ANNOTATION_CSV_COLUMNS, "filename"]}
+        )
+    else:
+        raw = f"""
+            read_csv(
+                {source}, all_varchar = true, union_by_name = true, filename = true
+            )
+        """
+    lists = ",\n            ".join(
+        f"split_list({field}) AS {field}"
+        for field in ANNOTATION_LIST_FIELDS
+        if field != "app_name"
+    )
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE ad_annotations AS
+        SELECT
+            keyword_from_path(filename) AS keyword,
+            id AS ad_id,
+            is_spam = 'True' AS is_spam,
+            {lists},
+            list_concat(
+                list_filter(split_list(app_name), x -> x <> 'Other'),
+                split_list(app_name_other)
+            ) AS app_names,
+            nullif(ad_category_other, '') AS ad_category_other,
+            nullif(sexual_content, '') AS sexual_content,
+            nullif(ad_notes, '') AS ad_notes,
+            TRY_CAST(timestamp AS TIMESTAMP) AS annotated_at
+        FROM {raw}
+        """
+    )
+
+
+def load_post_classifications(con, gemini_folder):
+    """Gemini classifications of Instagram posts, one row per post."""
+    source = source_glob(gemini_folder, "*.json")
+    annotation_type = (
+        "STRUCT(is_spam BOOLEAN, "
+        + ", ".join(f"{field} VARCHAR[]" for field in ANNOTATION_LIST_FIELDS)
+        + ", sexual_content VARCHAR, ad_notes VARCHAR)"
+    )
+    columns = {
+        "file_name": "VARCHAR",
+        "status": "VARCHAR",
+        "annotations": annotation_type,
+    }
+    if source is None:
+        raw = empty_source({**columns, "filename": "VARCHAR"})
+    else:
+        raw = f"""
+            read_json(
+                {source},
+                format = 'array',
+                columns = {struct_type(columns)},
+                filename = true
+            )
+        """
+    lists = ",\n            ".join(
+        f"annotations.{field} AS {field}"
+        for field in ANNOTATION_LIST_FIELDS
+        if field != "app_name"
+    )
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE post_classifications AS
+        SELECT
+            keyword_from_path(filename) AS keyword,
+            regexp_replace(file_name, '\\.[^.]+$', '') AS post_id,
+            file_name,
+            status,
+            annotations.is_spam AS is_spam,
+            {lists},
+            list_filter(annotations.app_name, x -> x <> 'Other') AS app_names,
+            annotations.sexual_content AS sexual_content,
+            annotations.ad_notes AS ad_notes
+        FROM {raw}
+        """
+    )
+
+
+def load_reviews(con, reviews_path, reviews_folder=REVIEWS_FOLDER):
+    """
+    Reviews with their topic assignment, keyed by the app's review CSV name.
+    When the topics CSV has no app or score column, they are taken from the
+    per-app review CSVs by reviewId.
+    """
+    if Path(reviews_path).exists():
+        topics = (
+            f"read_csv({sql_string(reviews_path)}, all_varchar = true, header = true)"
+        )
+    else:
+        print(f"⚠️  {reviews_path} not found, skipping reviews")
+        topics = empty_source({name: "VARCHAR" for name in REVIEW_CSV_COLUMNS})
+    columns = {
+        row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {topics}").fetchall()
+    }
+    missing = [column for column in ("app", "score") if column not in columns]
+
+    source = f"{topics} t"
+    app, score = "t.app", "t.score"
+    if missing:
+        print(
+            f"⚠️  {Path(reviews_path).name} has no {' or '.join(missing)} column, "
+            f"taking them from the review CSVs in {reviews_folder}"
+        )
+        review_csvs = source_glob(reviews_folder, "*.csv")
+        if review_csvs is None:
+            app = app if "app" in columns else "NULL"
+            score = score if "score" in columns else "NULL"
+        else:
+            # One app and score per review, in case a review is in two CSVs
+            source += f"""
+            LEFT JOIN (
+                SELECT "reviewId", min(keyword_from_path(filename)) AS app,
+                       min(score) AS score
+                FROM read_csv({review_csvs}, all_varchar = true, header = true,
+                              union_by_name = true, filename = true)
+                GROUP BY "reviewId"
+            ) r USING ("reviewId")
+            """
+            app = "coalesce(t.app, r.app)" if "app" in columns else "r.app"
+            score = "coalesce(t.score, r.score)" if "score" in columns else "r.score"
+
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE reviews AS
+        SELECT
+            "reviewId" AS review_id,
+            {app} AS app,
+            resolve_app({app}) AS app_key,
+            TRY_CAST({score} AS INTEGER) AS score,
+            review_text,
+            TRY_CAST(topic_id AS INTEGER) AS topic_id,
+            TRY_CAST(topic_probability AS DOUBLE) AS topic_probability,
+            qwen_label AS topic_label
+        FROM {source}
+        """
+    )
+    unmatched = con.execute(
+        "SELECT count(*) FROM reviews WHERE app IS NULL"
+    ).fetchone()[0]
+    if unmatched:
+        print(f"⚠️  {unmatched:,} reviews have no app and are left out of app joins")
+
+
+def build_promotion_narratives(con):
+    """
+    Bridge table of (source, item, app, narrative, messaging strategy) over
+    non-spam ads and posts. Items without a named app fall back to their
+    collection keyword.
+    """
+    con.execute(
+        """
+        CREATE OR REPLACE TABLE promotion_narratives AS
+        WITH items AS (
+            SELECT 'ad' AS source, keyword, ad_id AS item_id, app_names,
+                   potentially_harmful_narratives, primary_messaging_strategy
+            FROM ad_annotations
+            WHERE NOT coalesce(is_spam, false)
+            UNION ALL
+            SELECT 'instagram_post', keyword, post_id, app_names,
+                   potentially_harmful_narratives, primary_messaging_strategy
+            FROM post_classifications
+            WHERE NOT coalesce(is_spam, true) AND status = 'success'
+        ),
+        item_apps AS (
+            SELECT *, unnest(
+                CASE WHEN len(coalesce(app_names, [])) > 0 THEN app_names
+                     ELSE [keyword] END
+            ) AS app_name
+            FROM items
+        )
+        SELECT
+            source,
+            keyword,
+            item_id,
+            resolve_app(app_name) AS app_key,
+            unnest(
+                CASE WHEN len(coalesce(potentially_harmful_narratives, [])) > 0
+                     THEN potentially_harmful_narratives ELSE ['None'] END
+            ) AS narrative,
+            primary_messaging_strategy
+        FROM item_apps
+        """
+    )
+
+
+def build_apps(con):
+    """Every app key with its coverage in each source."""
+    con.execute(
+        """
+        CREATE OR REPLACE TABLE apps AS
+        WITH keys AS (
+            SELECT app_key FROM ads
+            UNION SELECT app_key FROM promotion_narratives
+            UNION SELECT app_key FROM reviews
+        )
+        SELECT
+            k.app_key,
+            (SELECT count(*) FROM ads a WHERE a.app_key = k.app_key) AS ads,
+            (SELECT count(DISTINCT item_id) FROM promotion_narratives p
+             WHERE p.app_key = k.app_key AND p.source = 'ad') AS annotated_ads,
+            (SELECT count(DISTINCT item_id) FROM promotion_narratives p
+             WHERE p.app_key = k.app_key AND p.source = 'instagram_post') AS posts,
+            (SELECT count(*) FROM reviews r WHERE r.app_key = k.app_key) AS reviews
+        FROM keys k
+        WHERE k.app_key IS NOT NULL
+        """
+    )
+
+
+def export_parquet(con, store_dir):
+    parquet_dir = Path(store_dir) / "parquet"
+    parquet_dir.mkdir(parents=True, exist_ok=True)
+    for table in TABLES:
+        con.execute(
+            f"COPY {table} TO {sql_string(parquet_dir / f'{table}.parquet')} "
+            "(FORMAT parquet, COMPRESSION zstd)"
+        )
+
+
+def connect(store_dir=STORE_DIR, read_only=False):
+    """Connection to the store with the memory limit and spill directory set."""
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    con = duckdb.connect(str(store_dir / DATABASE_NAME), read_only=read_only)
+    con.execute(f"SET memory_limit = {sql_string(MEMORY_LIMIT)}")
+    con.execute(f"SET temp_directory = {sql_string(store_dir / 'tmp')}")
+    return con
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ads-folder", default=ADS_FOLDER)
+    parser.add_argument("--annotation-folder", default=ANNOTATION_FOLDER)
+    parser.add_argument("--gemini-folder", default=GEMINI_RESULTS_FOLDER)
+    parser.add_argument("--reviews", default=REVIEWS_WITH_TOPICS)
+    parser.add_argument("--reviews-folder", default=REVIEWS_FOLDER)
+    parser.add_argument("--store-dir", type=Path, default=STORE_DIR)
+    args = parser.parse_args()
+
+    con = connect(args.store_dir)
+    steps = [
+        ("macros", lambda: create_macros(con)),
+        ("app_aliases", lambda: load_app_aliases(con)),
+        ("ads", lambda: load_ads(con, args.ads_folder)),
+        ("spend rollups", lambda: build_spend_rollups(con)),
+        ("ad_annotations", lambda: load_ad_annotations(con, args.annotation_folder)),
+        (
+            "post_classifications",
+            lambda: load_post_classifications(con, args.gemini_folder),
+        ),
+        ("reviews", lambda: load_reviews(con, args.reviews, args.reviews_folder)),
+        ("promotion_narratives", lambda: build_promotion_narratives(con)),
+        ("apps", lambda: build_apps(con)),
+        ("parquet", lambda: export_parquet(con, args.store_dir)),
+    ]
+
+    print(f"\n{'=' * 50}")
+    for name, step in steps:
+        start = time.perf_counter()
+        step()
+        rows = ""
+        if name in TABLES:
+            rows = (
+                f"{con.execute(f'SELECT count(*) FROM {name}').fetchone()[0]:>10,} rows"
+            )
+        print(f"  {name:<22} {rows:>15} {time.perf_counter() - start:6.1f}s")
+    print(f"✓ Store written to {args.store_dir / DATABASE_NAME}")
+    print(f"{'=' * 50}")
+    con.close()
+
+
+if __name__ == "__main__":
+    main()
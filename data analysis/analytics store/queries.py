@@ -0,0 +1,220 @@
+"""
+Canned cross-source queries over the analytics store built by build_store.py.
+Run without a query name to list them.
+
+Usage:
+    python queries.py [query] [--store-dir analytics_store] [--limit 50]
+                      [--output result.csv]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from build_store import STORE_DIR, connect
+
+# Review topics that are not outliers, with each topic's share of an app's reviews
+APP_TOPICS = """
+    app_topics AS (
+        SELECT
+            app_key,
+            topic_label,
+            count(*) AS reviews,
+            avg(score) AS mean_score,
+            count(*) / sum(count(*)) OVER (PARTITION BY app_key) AS topic_share
+        FROM reviews
+        WHERE topic_id <> -1
+        GROUP BY app_key, topic_label
+    )
+"""
+
+QUERIES = {
+    "app_coverage": (
+        "Ads, annotated ads, classified posts and reviews per app",
+        """
+        SELECT *
+        FROM apps
+        ORDER BY (annotated_ads + posts > 0 AND reviews > 0) DESC, reviews DESC
+        """,
+    ),
+    "ecosystem_spend": (
+        "Total ads, spend and impressions across all keywords, per currency",
+        """
+        SELECT
+            currency,
+            sum(ads)::BIGINT AS ads,
+            (SELECT count(*) FROM spend_by_page p WHERE p.currency = m.currency)
+                AS pages,
+            sum(spend_lower)::BIGINT AS spend_lower,
+            sum(spend_upper)::BIGINT AS spend_upper,
+            sum(impressions_lower)::BIGINT AS impressions_lower,
+            sum(impressions_upper)::BIGINT AS impressions_upper,
+            min(first_delivery) AS first_delivery,
+            max(last_delivery) AS last_delivery
+        FROM spend_by_month m
+        GROUP BY currency
+        ORDER BY ads DESC
+        """,
+    ),
+    "top_advertisers": (
+        "Advertiser pages ranked by estimated spend",
+        """
+        SELECT page_name, page_id, currency, ads, spend_lower, spend_upper,
+               impressions_lower, first_delivery, last_delivery
+        FROM spend_by_page
+        ORDER BY spend_mid DESC
+        """,
+    ),
+    "spend_by_region": (
+        "Estimated spend and impressions per region (range midpoint x delivery share)",
+        """
+        WITH unique_ads AS (
+            SELECT * FROM ads
+            QUALIFY row_number() OVER (PARTITION BY ad_id ORDER BY keyword) = 1
+        ),
+        shares AS (
+            SELECT currency, spend_mid, impressions_mid, unnest(regions) AS r
+            FROM unique_ads
+        )
+        SELECT
+            r.region,
+            currency,
+            count(*) AS ads,
+            round(sum(spend_mid * r.share)) AS spend_mid,
+            round(sum(impressions_mid * r.share)) AS impressions_mid
+        FROM shares
+        GROUP BY ALL
+        ORDER BY spend_mid DESC
+        """,
+    ),
+    "narratives_by_app": (
+        "Harmful narratives per app in paid ads and organic posts",
+        """
+        SELECT
+            app_key,
+            narrative,
+            count(DISTINCT item_id) FILTER (WHERE source = 'ad') AS ads,
+            count(DISTINCT item_id) FILTER (WHERE source = 'instagram_post') AS posts
+        FROM promotion_narratives
+        GROUP BY ALL
+        ORDER BY ads + posts DESC
+        """,
+    ),
+    "harm_topics_by_app": (
+        "Top review topics per app with their share and mean star rating",
+        f"""
+        WITH {APP_TOPICS}
+        SELECT app_key, topic_label, reviews, round(topic_share, 4) AS topic_share,
+               round(mean_score, 2) AS mean_score
+        FROM app_topics
+        QUALIFY row_number() OVER (PARTITION BY app_key ORDER BY reviews DESC) <= 5
+        ORDER BY app_key, reviews DESC
+        """,
+    ),
+    "narrative_to_harm": (
+        "For each promotion narrative, the review topics of the apps it promotes",
+        f"""
+        WITH {APP_TOPICS},
+        overall AS (
+            SELECT topic_label, sum(reviews) / (SELECT sum(reviews) FROM app_topics)
+                AS overall_share
+            FROM app_topics
+            GROUP BY ALL
+        ),
+        narrative_apps AS (
+            SELECT narrative, app_key, count(DISTINCT (source, item_id)) AS promotions
+            FROM promotion_narratives
+            WHERE app_key IN (SELECT app_key FROM app_topics)
+            GROUP BY ALL
+        ),
+        narrative_totals AS (
+            SELECT narrative, sum(promotions)::BIGINT AS total_promotions,
+                   count(*) AS linked_apps
+            FROM narrative_apps
+            GROUP BY ALL
+        )
+        SELECT
+            n.narrative,
+            t.topic_label,
+            any_value(nt.linked_apps) AS linked_apps,
+            any_value(nt.total_promotions) AS promotions,
+            sum(t.reviews)::BIGINT AS reviews,
+            -- Topic share averaged over the apps, weighted by how often each app
+            -- uses the narrative; lift compares it with the share across all apps
+            round(sum(n.promotions * t.topic_share) / any_value(nt.total_promotions), 4)
+                AS weighted_share,
+            round(
+                sum(n.promotions * t.topic_share)
+                / any_value(nt.total_promotions)
+                / any_value(o.overall_share),
+                2
+            ) AS lift
+        FROM narrative_apps n
+        JOIN app_topics t USING (app_key)
+        JOIN narrative_totals nt USING (narrative)
+        JOIN overall o USING (topic_label)
+        GROUP BY n.narrative, t.topic_label
+        QUALIFY row_number() OVER (
+            PARTITION BY n.narrative ORDER BY weighted_share DESC
+        ) <= 5
+        ORDER BY promotions DESC, n.narrative, weighted_share DESC
+        """,
+    ),
+    "messaging_vs_rating": (
+        "Primary messaging strategies against the star ratings of promoted apps",
+        """
+        WITH strategies AS (
+            SELECT DISTINCT source, item_id, app_key,
+                   unnest(primary_messaging_strategy) AS strategy
+            FROM promotion_narratives
+        ),
+        ratings AS (
+            SELECT app_key, avg(score) AS mean_score, count(*) AS reviews
+            FROM reviews
+            GROUP BY ALL
+        )
+        SELECT
+            strategy,
+            count(DISTINCT (s.source, s.item_id)) AS promotions,
+            count(DISTINCT s.app_key) AS apps,
+            round(sum(r.mean_score * r.reviews) / sum(r.reviews), 2) AS mean_score
+        FROM strategies s
+        JOIN ratings r USING (app_key)
+        GROUP BY ALL
+        ORDER BY promotions DESC
+        """,
+    ),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("query", nargs="?", choices=sorted(QUERIES))
+    parser.add_argument("--store-dir", type=Path, default=STORE_DIR)
+    parser.add_argument("--limit", type=int, default=50, help="Rows to print")
+    parser.add_argument("--output", type=Path, help="Also write the result to CSV")
+    args = parser.parse_args()
+
+    if args.query is None:
+        print("Available queries:")
+        for name, (description, _) in QUERIES.items():
+            print(f"  {name:<20} {description.split('. ')[0]}")
+        return
+
+    description, sql = QUERIES[args.query]
+    con = connect(args.store_dir, read_only=True)
+    start = time.perf_counter()
+    result = con.sql(sql).df()
+    elapsed = time.perf_counter() - start
+    con.close()
+
+    print(f"\n{args.query}: {description}\n")
+    print(result.head(args.limit).to_string(index=False))
+    print(f"\n{len(result):,} rows in {elapsed:.2f}s")
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print(f"✓ Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Serialization and compression benchmark for the annotation API payloads.
+For each keyword JSON it times FastAPI's default path (jsonable_encoder plus
+JSONResponse) against orjson, and reports the transfer size with gzip at the
+server's compression level.
+
+Usage:
+    python benchmark_serialization.py /path/to/meta\\ ads\\ metadata\\ json [--repeats 5]
+"""
+
+import argparse
+import gzip
+import json
+import time
+from pathlib import Path
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+GZIP_LEVEL = 5  # Keep in sync with server.GZIP_LEVEL
+
+
+def best_time(fn, repeats):
+    """Fastest of several runs, in milliseconds, and the last result."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def benchmark_file(path, repeats):
+    """Time each serializer on one file. Returns a row of measurements."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    default_ms, default_body = best_time(
+        lambda: JSONResponse(jsonable_encoder(data)).body, repeats
+    )
+    orjson_ms, orjson_body = best_time(
+        lambda: orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS), repeats
+    )
+    gzip_ms, gzip_body = best_time(
+        lambda: gzip.compress(orjson_body, compresslevel=GZIP_LEVEL), repeats
+    )
+    return {
+        "file": path.name,
+        "items": len(data) if isinstance(data, list) else 1,
+        "default_ms": default_ms,
+        "orjson_ms": orjson_ms,
+        "gzip_ms": gzip_ms,
+        "raw_kb": len(default_body) / 1024,
+        "gzip_kb": len(gzip_body) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("json_folder", type=Path, help="Folder of keyword JSON files")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per measurement")
+    args = parser.parse_args()
+
+    json_files = sorted(args.json_folder.glob("*.json"))
+    if not json_files:
+        print(f"No JSON files found in {args.json_folder}")
+        return
+
+    rows = []
+    for path in json_files:
+        try:
+            rows.append(benchmark_file(path, args.repeats))
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Skipping {path.name}: {e}")
+
+    print(f"\n{'=' * 90}")
+    print(
+        f"{'file':<30} {'items':>7} {'default ms':>11} {'orjson ms':>10} "
+        f"{'gzip ms':>8} {'raw KB':>9} {'gzip KB':>8}"
+    )
+    for r in rows:
+        print(
+            f"{r['file'][:30]:<30} {r['items']:>7} {r['default_ms']:>11.1f} "
+            f"{r['orjson_ms']:>10.1f} {r['gzip_ms']:>8.1f} {r['raw_kb']:>9.0f} "
+            f"{r['gzip_kb']:>8.0f}"
+        )
+
+    if rows:
+        default_total = sum(r["default_ms"] for r in rows)
+        orjson_total = sum(r["orjson_ms"] + r["gzip_ms"] for r in rows)
+        raw_total = sum(r["raw_kb"] for r in rows)
+        gzip_total = sum(r["gzip_kb"] for r in rows)
+        print(
+            f"\nSerialization: {default_total:.0f} ms default vs "
+            f"{orjson_total:.0f} ms orjson + gzip "
+            f"({default_total / max(orjson_total, 1e-9):.1f}x)"
+        )
+        print(
+            f"Transfer: {raw_total / 1024:.1f} MB raw vs {gzip_total / 1024:.1f} MB "
+            f"gzipped ({1 - gzip_total / raw_total:.0%} smaller)"
+        )
+    print(f"{'=' * 90}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Concurrent load benchmark for the annotation server.
+Simulates several annotators browsing items while others run gallery scans,
+and reports p50/p95/p99 latency per endpoint. Run it against a server started
+with `python server.py`, once per server version to compare tail latency.
+It also checks that data endpoints are gzipped and media files are not.
+
+Usage:
+    python benchmark_server.py --json-file ads.json [--users 8] [--scanners 2]
+                               [--requests 50] [--base-url http://localhost:8000]
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def timed(session, method, url, latencies, lock, name, **kwargs):
+    """Issue one request and record its latency under name."""
+    start = time.perf_counter()
+    response = session.request(method, url, timeout=300, **kwargs)
+    elapsed = time.perf_counter() - start
+    with lock:
+        latencies[name].append(elapsed)
+        if response.status_code >= 400:
+            latencies[f"{name} (HTTP {response.status_code})"].append(elapsed)
+    return response
+
+
+def annotator(base_url, json_file, item_ids, num_requests, latencies, lock):
+    """Light user: fetch single items and the annotation map, like the index page."""
+    session = requests.Session()
+    for _ in range(num_requests):
+        timed(
+            session,
+            "GET",
+            f"{base_url}/api/get_item_by_id",
+            latencies,
+            lock,
+            "get_item_by_id",
+            params={"item_id": random.choice(item_ids), "json_file": json_file},
+        )
+        timed(
+            session,
+            "GET",
+            f"{base_url}/api/get_annotations",
+            latencies,
+            lock,
+            "get_annotations",
+            params={"json_file": json_file},
+        )
+
+
+def scanner(base_url, num_requests, latencies, lock):
+    """Heavy user: repeated gallery scans over every annotation CSV."""
+    session = requests.Session()
+    for _ in range(num_requests):
+        timed(
+            session,
+            "POST",
+            f"{base_url}/api/get_gallery_items",
+            latencies,
+            lock,
+            "get_gallery_items",
+            json={
+                "ad_category": "All",
+                "media_authenticity": "All",
+                "media_type": "All",
+            },
+        )
+
+
+def check_encodings(base_url, json_file, items):
+    """Content-Encoding of a data response and of one image and one video file."""
+    session = requests.Session()
+    session.headers["Accept-Encoding"] = "gzip"
+    keyword = json_file.replace(".json", "")
+    checks = {
+        "get_data": (
+            "POST",
+            f"{base_url}/api/get_data",
+            {"json": {"json_file": json_file}},
+        )
+    }
+    for media_type, extension in (("image", "png"), ("video", "mp4")):
+        item = next(
+            (i for i in items if (i.get("media_type") or "image") == media_type), None
+        )
+        if item is not None:
+            checks[f"{media_type} media"] = (
+                "GET",
+                f"{base_url}/scams-media/{keyword}/{item['id']}.{extension}",
+                {"headers": {"Range": "bytes=0-1023"}} if media_type == "video" else {},
+            )
+    encodings = {}
+    for name, (method, url, kwargs) in checks.items():
+        response = session.request(method, url, timeout=300, stream=True, **kwargs)
+        response.close()
+        if response.status_code < 400:
+            encodings[name] = response.headers.get("Content-Encoding", "identity")
+        else:
+            encodings[name] = f"HTTP {response.status_code}"
+    return encodings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--json-file", required=True, help="Keyword JSON to browse")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent annotators")
+    parser.add_argument("--scanners", type=int, default=2, help="Concurrent scans")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per user")
+    args = parser.parse_args()
+
+    response = requests.post(
+        f"{args.base_url}/api/get_data", json={"json_file": args.json_file}, timeout=300
+    )
+    response.raise_for_status()
+    items = [item for item in response.json() if "id" in item]
+    item_ids = [item["id"] for item in items]
+    if not item_ids:
+        print(f"No items found in {args.json_file}")
+        return
+
+    latencies = defaultdict(list)
+    lock = threading.Lock()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users + args.scanners) as executor:
+        futures = [
+            executor.submit(
+                annotator,
+                args.base_url,
+                args.json_file,
+                item_ids,
+                args.requests,
+                latencies,
+                lock,
+            )
+            for _ in range(args.users)
+        ]
+        futures += [
+            executor.submit(
+                scanner, args.base_url, max(1, args.requests // 10), latencies, lock
+            )
+            for _ in range(args.scanners)
+        ]
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - start
+
+    print(f"\n{'=' * 50}")
+    print(
+        f"{args.users} annotators, {args.scanners} scanners, "
+        f"{args.requests} requests each, {wall:.1f}s wall time"
+    )
+    print("Latency (ms):")
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        print(
+            f"  {name}: p50 {percentile(values, 50) * 1000:.0f} | "
+            f"p95 {percentile(values, 95) * 1000:.0f} | "
+            f"p99 {percentile(values, 99) * 1000:.0f} | "
+            f"max {values[-1] * 1000:.0f} (n={len(values)})"
+        )
+    print("Content-Encoding:")
+    for name, encoding in check_encodings(args.base_url, args.json_file, items).items():
+        print(f"  {name}: {encoding}")
+    print(f"{'=' * 50}")
+
+
+if __name__ == "__main__":
+    main()
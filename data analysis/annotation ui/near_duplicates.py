@@ -0,0 +1,246 @@
+"""
+Near-duplicate clustering of ad creatives.
+Ads whose creative text (bodies and link titles) has an estimated Jaccard
+similarity of at least SIMILARITY_THRESHOLD over character shingles are
+grouped with MinHash LSH, then split by media hash where the media has been
+downloaded, so one cluster is one creative. server.py reads the clusters to
+serve one ad per cluster for annotation.
+
+Usage:
+    python near_duplicates.py [--json-folder ...] [--media-folder ...]
+                              [--output creative_clusters.json]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from tqdm import tqdm
+
+# Configuration
+JSON_FOLDER = r"/path/to/meta ads metadata json"
+MEDIA_FOLDER = r"/path/to/downloaded media"  # BASE_PATH in server.py
+CLUSTERS_PATH = r"/path/to/store annotation csv/creative_clusters.json"
+SHINGLE_SIZE = 5  # Characters per shingle
+NUM_PERM = 128
+LSH_BANDS = 16  # 16 bands of 8 rows: pairs above ~0.7 similarity become candidates
+SIMILARITY_THRESHOLD = 0.8
+MINHASH_SEED = 42
+
+HASH_PRIME = (1 << 32) + 15  # Smallest prime above every 32-bit shingle hash
+NON_ALNUM_PATTERN = re.compile(r"[\W_]+")
+
+
+def creative_text(item):
+    """Normalized creative text: bodies and link titles, lowercased, punctuation dropped."""
+    parts = (item.get("ad_creative_bodies") or []) + (
+        item.get("ad_creative_link_titles") or []
+    )
+    text = " ".join(part for part in parts if isinstance(part, str))
+    return " ".join(NON_ALNUM_PATTERN.sub(" ", text.lower()).split())
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """32-bit hashes of the text's character shingles."""
+    if len(text) <= size:
+        grams = {text}
+    else:
+        grams = {text[i : i + size] for i in range(len(text) - size + 1)}
+    return np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) for gram in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=MINHASH_SEED):
+    """MinHash signature of every text, one row per text."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for i, text in enumerate(tqdm(texts, desc="MinHash")):
+        # a * x + b stays below 2**64 for 32-bit a, b and x
+        hashed = (shingles(text)[:, None] * a + b) % HASH_PRIME
+        signatures[i] = hashed.min(axis=0)
+    return signatures
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        self.parent[self.find(i)] = self.find(j)
+
+
+def cluster_texts(texts, bands=LSH_BANDS, threshold=SIMILARITY_THRESHOLD):
+    """
+    Group index of each distinct text. Texts sharing a band are merged when
+    their signatures agree on at least `threshold` of the rows. Each bucket
+    is compared with its first text only, so templated texts that fill a
+    bucket cost linear rather than quadratic time; pairs that miss through
+    it usually share another band.
+    """
+    signatures = minhash_signatures(texts)
+    rows = signatures.shape[1] // bands
+    groups = UnionFind(len(texts))
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_rows = np.ascontiguousarray(signatures[:, band * rows : (band + 1) * rows])
+        for i, key in enumerate(band_rows):
+            buckets[key.tobytes()].append(i)
+        for first, *others in buckets.values():
+            if not others:
+                continue
+            similarity = (signatures[others] == signatures[first]).mean(axis=1)
+            for i in np.asarray(others)[similarity >= threshold]:
+                groups.union(int(i), first)
+    return [groups.find(i) for i in range(len(texts))]
+
+
+def media_hash(media_folder, json_file, item):
+    """
+    Hash of an ad's downloaded media, or None when it is missing. Images get
+    a 64-bit difference hash, so re-encoded copies of the same picture
+    match; videos are compared by content.
+    """
+    keyword = json_file.replace(".json", "")
+    if (item.get("media_type") or "image") == "image":
+        path = os.path.join(media_folder, keyword, f"{item['id']}.png")
+        if not os.path.exists(path):
+            return None
+        from PIL import Image
+
+        try:
+            with Image.open(path) as img:
+                pixels = np.asarray(
+                    img.convert("L").resize((9, 8), Image.Resampling.LANCZOS),
+                    dtype=np.int16,
+                )
+        except OSError:
+            return None
+        return "d" + np.packbits(pixels[:, 1:] > pixels[:, :-1]).tobytes().hex()
+
+    path = os.path.join(media_folder, keyword, f"{item['id']}.mp4")
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return "s" + digest.hexdigest()
+
+
+def build_clusters(json_folder, media_folder=None):
+    """
+    Clusters of (json file, ad id) pairs with the same creative, largest
+    first. Only clusters with more than one ad are returned.
+    """
+    ads = []  # (json file, id, item)
+    for json_path in sorted(glob.glob(os.path.join(json_folder, "*.json"))):
+        json_file = os.path.basename(json_path)
+        with open(json_path, "r", encoding="utf-8") as f:
+            ads.extend(
+                (json_file, item["id"], item) for item in json.load(f) if item.get("id")
+            )
+
+    # Identical texts are hashed once
+    distinct_texts = {}
+    text_index = []
+    for _, _, item in ads:
+        text = creative_text(item)
+        text_index.append(distinct_texts.setdefault(text, len(distinct_texts)))
+    texts = list(distinct_texts)
+    print(f"{len(ads):,} ads, {len(texts):,} distinct creative texts")
+    text_groups = cluster_texts(texts)
+
+    clusters = defaultdict(list)
+    for (json_file, item_id, item), index in zip(
+        tqdm(ads, desc="Media hashes"), text_index
+    ):
+        media = media_hash(media_folder, json_file, item) if media_folder else None
+        if not texts[index] and media is None:
+            continue  # Nothing to compare this ad on
+        clusters[(text_groups[index], media)].append([json_file, item_id])
+
+    return sorted(
+        (members for members in clusters.values() if len(members) > 1),
+        key=len,
+        reverse=True,
+    )
+
+
+def save_clusters(clusters, path):
+    """Write clusters with the settings that produced them."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    payload = {
+        "settings": {
+            "shingle_size": SHINGLE_SIZE,
+            "num_perm": NUM_PERM,
+            "lsh_bands": LSH_BANDS,
+            "similarity_threshold": SIMILARITY_THRESHOLD,
+        },
+        "clusters": clusters,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+
+
+def load_clusters(path):
+    """Clusters saved by save_clusters, or an empty list if there are none."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [
+            [(json_file, item_id) for json_file, item_id in members]
+            for members in json.load(f)["clusters"]
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--json-folder", default=JSON_FOLDER)
+    parser.add_argument(
+        "--media-folder",
+        default=MEDIA_FOLDER,
+        help="Downloaded media, split clusters by media hash (pass '' to skip)",
+    )
+    parser.add_argument("--output", default=CLUSTERS_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    media_folder = args.media_folder
+    if media_folder and not os.path.isdir(media_folder):
+        print(f"⚠️  Media folder {media_folder} not found, clustering on text only")
+        media_folder = None
+    clusters = build_clusters(args.json_folder, media_folder or None)
+    save_clusters(clusters, args.output)
+
+    clustered = sum(len(members) for members in clusters)
+    print(f"\n{'=' * 50}")
+    print(f"Clusters:              {len(clusters):,}")
+    print(f"Ads in clusters:       {clustered:,}")
+    print(f"Annotations saved:     {clustered - len(clusters):,}")
+    if clusters:
+        print(f"Largest cluster:       {len(clusters[0]):,} ads")
+    print(f"Time:                  {time.perf_counter() - start:.1f}s")
+    print(f"✓ Saved to {args.output}")
+    print(f"{'=' * 50}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,105 @@
 import csv
 import datetime
+import gzip
 import json
 import os
 import glob
 import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
 from typing import List, Optional, Dict, Any
 
+import orjson
 import uvicorn
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
+from near_duplicates import load_clusters
+
 PORT = 8000
 BASE_PATH = r"/path/to/downloaded media"
 JSON_FOLDER = os.path.join(BASE_PATH, r"/path/to/meta ads metadata json")
 ANNOTATION_FOLDER = r"/path/to/store annotation csv"
 
+# Written by near_duplicates.py. With SERVE_CLUSTER_REPRESENTATIVES, remaining
+# mode serves one ad per near-duplicate cluster and skips clusters that
+# already have an annotation; PROPAGATE_CLUSTER_LABELS also copies each saved
+# annotation to the cluster's unannotated ads.
+CLUSTERS_PATH = os.path.join(ANNOTATION_FOLDER, "creative_clusters.json")
+SERVE_CLUSTER_REPRESENTATIVES = True
+PROPAGATE_CLUSTER_LABELS = False
+
+# Built by semantic_index.py, which lives with the embedding cache it reads
+TOPIC_MODELLING_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "topic modelling"
+)
+SEMANTIC_INDEX_DIR = r"/path/to/semantic_index"
+SEMANTIC_SEARCH_LIMIT = 50  # Largest k accepted by /api/semantic_search
+
 VALIDATION_MEDIA_ROOT = "/path/to/instagram posts"
 VALIDATION_JSON_DIR = os.path.join(VALIDATION_MEDIA_ROOT, "output_result_jsons")
 VALIDATION_CSV_PATH = os.path.join(VALIDATION_JSON_DIR, "validation_results.csv")
 
+NEXT_ITEMS_LIMIT = 20  # Default page size of get_next_remaining
+KEYWORD_JSON_CACHE_SIZE = 4  # Parsed keyword JSONs kept in memory for paging
+
+# Only JSON data responses are compressed; media is already compressed and
+# video Range responses must stay byte-addressable
+GZIP_MIN_SIZE = 1000  # Bytes; smaller responses are sent uncompressed
+GZIP_LEVEL = 5  # Most of the size reduction of level 9 at a fraction of the CPU
+
 app = FastAPI(title="Annotation UI", version="0.0.1")
 
 
+class OrjsonResponse(Response):
+    """
+    JSON response serialized with orjson. Data endpoints return it directly,
+    which also skips FastAPI's jsonable_encoder pass over every ad object.
+    Bodies of at least GZIP_MIN_SIZE bytes are gzipped when the client
+    accepts it.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+    async def __call__(self, scope, receive, send):
+        accept_encoding = dict(scope.get("headers", [])).get(b"accept-encoding", b"")
+        if len(self.body) >= GZIP_MIN_SIZE and b"gzip" in accept_encoding.lower():
+            self.body = gzip.compress(self.body, compresslevel=GZIP_LEVEL)
+            self.raw_headers = [
+                (key, value)
+                for key, value in self.raw_headers
+                if key != b"content-length"
+            ]
+            self.raw_headers += [
+                (b"content-length", str(len(self.body)).encode("latin-1")),
+                (b"content-encoding", b"gzip"),
+            ]
+        if not any(key == b"vary" for key, _ in self.raw_headers):
+            self.raw_headers.append((b"vary", b"Accept-Encoding"))
+        await super().__call__(scope, receive, send)
+
+
+# Data endpoints are plain `def` so FastAPI runs their file I/O in its thread
+# pool instead of on the event loop. Saves read-modify-write whole CSVs, so
+# concurrent writers to the same file are serialized with a per-file lock.
+csv_locks = defaultdict(threading.Lock)
+csv_locks_guard = threading.Lock()
+
+
+def csv_lock(csv_path):
+    """Lock guarding read-modify-write of one CSV file."""
+    with csv_locks_guard:
+        return csv_locks[os.path.abspath(csv_path)]
+
+
 class AnnotationPayload(BaseModel):
     jsonFileName: str
     id: str
@@ -37,6 +113,8 @@ class AnnotationPayload(BaseModel):
     media_authenticity: List[str]
     sexual_content: str
     ad_notes: Optional[str] = ""
+    # Overrides PROPAGATE_CLUSTER_LABELS for this save
+    propagate_to_cluster: Optional[bool] = None
 
 
 class GetDataPayload(BaseModel):
@@ -63,26 +141,229 @@ class ValidationPayload(BaseModel):
     correction_notes: Optional[str] = ""
 
 
+STATS_FACETS = [
+    "is_spam",
+    "ad_category",
+    "app_name",
+    "primary_messaging_strategy",
+    "potentially_harmful_narratives",
+    "media_authenticity",
+    "sexual_content",
+]
+
+
+class AnnotationStats:
+    """
+    Running counts of annotations and validations. Built from one scan of the
+    CSVs at startup and then updated by the save endpoints with the difference
+    between the replaced row and the new one, so polling never re-reads files.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.annotated = defaultdict(int)  # json file -> annotated items
+        self.facets = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+        self.validations = defaultdict(lambda: defaultdict(int))
+        self.item_totals = {}  # json file -> (mtime, number of items)
+
+    def load(self):
+        """Count every existing annotation and validation row."""
+        if os.path.exists(ANNOTATION_FOLDER):
+            for csv_file in os.listdir(ANNOTATION_FOLDER):
+                if not csv_file.endswith(".csv"):
+                    continue
+                json_file_name = csv_file.replace(".csv", ".json")
+                try:
+                    with open(
+                        os.path.join(ANNOTATION_FOLDER, csv_file),
+                        "r",
+                        newline="",
+                        encoding="utf-8",
+                    ) as f:
+                        for row in csv.DictReader(f):
+                            self.count_annotation(json_file_name, row, 1)
+                except Exception as e:
+                    print(f"Error counting {csv_file}: {e}")
+
+        if os.path.exists(VALIDATION_CSV_PATH):
+            try:
+                with open(VALIDATION_CSV_PATH, "r", newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        self.count_validation(row, 1)
+            except Exception as e:
+                print(f"Error counting validations: {e}")
+
+    def count_annotation(self, json_file_name, row, sign):
+        self.annotated[json_file_name] += sign
+        facets = self.facets[json_file_name]
+        for field in STATS_FACETS:
+            for value in (row.get(field) or "").split(";"):
+                if value:
+                    facets[field][value] += sign
+
+    def count_validation(self, row, sign):
+        source = row.get("source_json", "")
+        self.validations[source][row.get("validation_status", "")] += sign
+
+    def update_annotation(self, json_file_name, old_row, new_row):
+        """Apply a saved annotation; old_row is the row it replaced, if any."""
+        with self.lock:
+            if old_row is not None:
+                self.count_annotation(json_file_name, old_row, -1)
+            self.count_annotation(json_file_name, new_row, 1)
+
+    def update_validation(self, old_row, new_row):
+        """Apply a saved validation; old_row is the row it replaced, if any."""
+        with self.lock:
+            if old_row is not None:
+                self.count_validation(old_row, -1)
+            self.count_validation(new_row, 1)
+
+    def total_items(self, json_file_name):
+        """Number of items in a keyword JSON, re-read only when the file changes."""
+        json_path = os.path.join(JSON_FOLDER, json_file_name)
+        try:
+            mtime = os.path.getmtime(json_path)
+        except OSError:
+            return None
+        cached = self.item_totals.get(json_file_name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                total = len(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            return None
+        self.item_totals[json_file_name] = (mtime, total)
+        return total
+
+    def snapshot(self, json_file=None):
+        """Current counts, for one keyword JSON or across all of them."""
+        on_disk = {
+            os.path.basename(p) for p in glob.glob(os.path.join(JSON_FOLDER, "*.json"))
+        }
+
+        with self.lock:
+            json_files = (
+                [json_file] if json_file else sorted(set(self.annotated) | on_disk)
+            )
+            annotated = {name: self.annotated.get(name, 0) for name in json_files}
+            facets = defaultdict(lambda: defaultdict(int))
+            for name in json_files:
+                for field, counts in self.facets.get(name, {}).items():
+                    for value, count in counts.items():
+                        if count:
+                            facets[field][value] += count
+            sources = [json_file] if json_file else sorted(self.validations)
+            validations = {
+                source: {
+                    status: count
+                    for status, count in self.validations.get(source, {}).items()
+                    if count
+                }
+                for source in sources
+            }
+
+        # Item totals come from the JSON files, outside the counter lock
+        keywords = {}
+        for name, count in annotated.items():
+            total = self.total_items(name)
+            keywords[name] = {
+                "annotated": count,
+                "total": total,
+                "remaining": None if total is None else max(total - count, 0),
+            }
+
+        return {
+            "keywords": keywords,
+            "annotated": sum(annotated.values()),
+            "facets": {
+                field: dict(sorted(counts.items(), key=lambda kv: -kv[1]))
+                for field, counts in facets.items()
+            },
+            "validations": validations,
+        }
+
+
+annotation_stats = AnnotationStats()
+annotation_stats.load()
+
+
+class ClusterIndex:
+    """
+    Near-duplicate clusters of ads and which of them already have at least
+    one annotation. Built at startup and updated by save_annotation.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cluster_of = {}  # (json file, id) -> cluster number
+        self.members = []  # cluster number -> [(json file, id)]
+        self.annotated = set()  # cluster numbers with an annotation
+
+    def load(self):
+        self.members = load_clusters(CLUSTERS_PATH)
+        for cluster, members in enumerate(self.members):
+            for member in members:
+                self.cluster_of[member] = cluster
+        if not self.members:
+            return
+        for json_file_name in {json_file for json_file, _ in self.cluster_of}:
+            for item_id in read_annotated_ids(json_file_name):
+                self.mark_annotated(json_file_name, item_id)
+        print(
+            f"Loaded {len(self.members):,} near-duplicate clusters "
+            f"({len(self.annotated):,} annotated)"
+        )
+
+    def mark_annotated(self, json_file_name, item_id):
+        cluster = self.cluster_of.get((json_file_name, item_id))
+        if cluster is not None:
+            with self.lock:
+                self.annotated.add(cluster)
+
+    def pending(self, json_file_name, items, annotated_ids, start=0):
+        """
+        Unannotated items from items[start:], in order, keeping only the
+        first pending ad of each cluster that has no annotation yet. Clustered
+        items are returned as copies with their cluster_size.
+        """
+        seen = set()
+        for position, item in enumerate(items):
+            item_id = item.get("id")
+            if item_id in annotated_ids:
+                continue
+            cluster = self.cluster_of.get((json_file_name, item_id))
+            if cluster is not None:
+                # Clusters shown before `start` still hide their later members
+                if cluster in seen or cluster in self.annotated:
+                    continue
+                seen.add(cluster)
+            if position < start:
+                continue
+            if cluster is not None:
+                item = {**item, "cluster_size": len(self.members[cluster])}
+            yield item
+
+
+@app.get("/api/stats")
+def get_stats(json_file: Optional[str] = None):
+    return OrjsonResponse(annotation_stats.snapshot(json_file))
+
+
 @app.post("/api/get_data")
-async def get_data(payload: GetDataPayload):
+def get_data(payload: GetDataPayload):
     json_path = os.path.join(JSON_FOLDER, payload.json_file)
     if not os.path.exists(json_path):
         raise HTTPException(status_code=404, detail="JSON file not found")
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
-    return data
+    return OrjsonResponse(data)
 
 
-@app.post("/api/get_remaining_data")
-async def get_remaining_data(payload: GetDataPayload):
-    json_path = os.path.join(JSON_FOLDER, payload.json_file)
-    if not os.path.exists(json_path):
-        raise HTTPException(status_code=404, detail="JSON file not found")
-
-    with open(json_path, "r", encoding="utf-8") as f:
-        full_data = json.load(f)
-
-    csv_file_name = payload.json_file.replace(".json", ".csv")
+def read_annotated_ids(json_file):
+    """Ids already annotated for a keyword JSON."""
+    csv_file_name = json_file.replace(".json", ".csv")
     csv_path = os.path.join(ANNOTATION_FOLDER, csv_file_name)
 
     annotated_ids = set()
@@ -95,13 +376,84 @@ async def get_remaining_data(payload: GetDataPayload):
                         annotated_ids.add(row["id"])
         except Exception:
             pass
+    return annotated_ids
+
+
+cluster_index = ClusterIndex()
+cluster_index.load()
+
+
+def pending_items(json_file, items, annotated_ids, dedupe, start=0):
+    """Unannotated items from items[start:], one per cluster when dedupe is on."""
+    if dedupe:
+        return cluster_index.pending(json_file, items, annotated_ids, start)
+    return (item for item in items[start:] if item.get("id") not in annotated_ids)
 
-    remaining_data = [item for item in full_data if item.get("id") not in annotated_ids]
-    return remaining_data
+
+@lru_cache(maxsize=KEYWORD_JSON_CACHE_SIZE)
+def load_keyword_data(json_path, mtime):
+    """Parsed keyword JSON, cached per (path, mtime) so paging does not re-parse it."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@app.post("/api/get_remaining_data")
+def get_remaining_data(
+    payload: GetDataPayload, dedupe: bool = SERVE_CLUSTER_REPRESENTATIVES
+):
+    json_path = os.path.join(JSON_FOLDER, payload.json_file)
+    if not os.path.exists(json_path):
+        raise HTTPException(status_code=404, detail="JSON file not found")
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        full_data = json.load(f)
+
+    annotated_ids = read_annotated_ids(payload.json_file)
+    remaining_data = list(
+        pending_items(payload.json_file, full_data, annotated_ids, dedupe)
+    )
+    return OrjsonResponse(remaining_data)
+
+
+@app.get("/api/get_next_remaining")
+def get_next_remaining(
+    json_file: str,
+    after_id: Optional[str] = None,
+    limit: int = NEXT_ITEMS_LIMIT,
+    dedupe: bool = SERVE_CLUSTER_REPRESENTATIVES,
+):
+    """
+    The next `limit` unannotated items after `after_id`, in the same order as
+    get_remaining_data, plus how many remain after them. With dedupe, only
+    one ad per near-duplicate cluster is served.
+    """
+    json_path = os.path.join(JSON_FOLDER, json_file)
+    if not os.path.exists(json_path):
+        raise HTTPException(status_code=404, detail="JSON file not found")
+
+    full_data = load_keyword_data(json_path, os.path.getmtime(json_path))
+    annotated_ids = read_annotated_ids(json_file)
+
+    start = 0
+    if after_id is not None:
+        start = next(
+            (i + 1 for i, item in enumerate(full_data) if item.get("id") == after_id),
+            0,
+        )
+
+    items = []
+    remaining_after = 0
+    for item in pending_items(json_file, full_data, annotated_ids, dedupe, start):
+        if len(items) < limit:
+            items.append(item)
+        else:
+            remaining_after += 1
+
+    return OrjsonResponse({"items": items, "remaining_after": remaining_after})
 
 
 @app.get("/api/get_item_by_id")
-async def get_item_by_id(item_id: str, json_file: str):
+def get_item_by_id(item_id: str, json_file: str):
     json_path = os.path.join(JSON_FOLDER, json_file)
     if not os.path.exists(json_path):
         raise HTTPException(status_code=404, detail="JSON file not found")
@@ -111,13 +463,13 @@ async def get_item_by_id(item_id: str, json_file: str):
 
     for item in data:
         if item.get("id") == item_id:
-            return [item]
+            return OrjsonResponse([item])
 
     raise HTTPException(status_code=404, detail=f"Item with ID '{item_id}' not found")
 
 
 @app.get("/api/get_annotations")
-async def get_annotations(json_file: str):
+def get_annotations(json_file: str):
     csv_file_name = json_file.replace(".json", ".csv")
     csv_path = os.path.join(ANNOTATION_FOLDER, csv_file_name)
 
@@ -132,11 +484,11 @@ async def get_annotations(json_file: str):
         except Exception:
             return {}
 
-    return JSONResponse(content=annotations)
+    return OrjsonResponse(annotations)
 
 
 @app.post("/api/query_annotations")
-async def query_annotations(payload: QueryPayload):
+def query_annotations(payload: QueryPayload):
     target_field = payload.field_name
     target_value = payload.field_value
 
@@ -192,11 +544,11 @@ async def query_annotations(payload: QueryPayload):
             print(f"Error processing {csv_file}: {e}")
             continue
 
-    return results
+    return OrjsonResponse(results)
 
 
 @app.post("/api/get_gallery_items")
-async def get_gallery_items(payload: GalleryQueryPayload):
+def get_gallery_items(payload: GalleryQueryPayload):
     target_category = payload.ad_category
     target_auth = payload.media_authenticity
     target_media_type = payload.media_type
@@ -267,67 +619,190 @@ async def get_gallery_items(payload: GalleryQueryPayload):
             print(f"Error processing gallery scan for {csv_file}: {e}")
             continue
 
-    return results
-
+    return OrjsonResponse(results)
 
-@app.post("/api/save_annotation")
-async def save_annotation(annotation: AnnotationPayload):
-    annotation_data = annotation.dict()
-    item_id = annotation_data["id"]
-    json_file_name = annotation_data["jsonFileName"]
 
-    for key, value in annotation_data.items():
-        if isinstance(value, list):
-            annotation_data[key] = ";".join(map(str, value))
+ANNOTATION_HEADERS = [
+    "jsonFileName",
+    "id",
+    "is_spam",
+    "ad_category",
+    "ad_category_other",
+    "app_name",
+    "app_name_other",
+    "primary_messaging_strategy",
+    "potentially_harmful_narratives",
+    "media_authenticity",
+    "sexual_content",
+    "ad_notes",
+    "timestamp",
+    "propagated_from",  # "<json file>/<id>" the labels were copied from
+]
 
-    all_headers = [
-        "jsonFileName",
-        "id",
-        "is_spam",
-        "ad_category",
-        "ad_category_other",
-        "app_name",
-        "app_name_other",
-        "primary_messaging_strategy",
-        "potentially_harmful_narratives",
-        "media_authenticity",
-        "sexual_content",
-        "ad_notes",
-        "timestamp",
-    ]
 
+def write_annotations(json_file_name, rows, replace=True, insert=True):
+    """
+    Save annotation rows into a keyword's CSV by id. Rows for ids that are
+    already annotated replace them; replace=False skips them, and a function
+    of the existing row decides per row. insert=False skips ids that are not
+    annotated yet. Returns how many rows were written.
+    """
     os.makedirs(ANNOTATION_FOLDER, exist_ok=True)
     csv_file_name = json_file_name.replace(".json", ".csv")
     csv_path = os.path.join(ANNOTATION_FOLDER, csv_file_name)
 
-    annotation_data["timestamp"] = datetime.datetime.now().isoformat()
-
-    existing_data = []
-    if os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
-        with open(csv_path, "r", newline="", encoding="utf-8") as rf:
-            reader = csv.DictReader(rf)
-            existing_data = list(reader)
+    with csv_lock(csv_path):
+        existing_data = []
+        if os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+            with open(csv_path, "r", newline="", encoding="utf-8") as rf:
+                reader = csv.DictReader(rf)
+                existing_data = list(reader)
+
+        positions = {}
+        for i, row in enumerate(existing_data):
+            positions.setdefault(row.get("id"), i)
+
+        written = []  # (replaced row or None, new row)
+        for row in rows:
+            i = positions.get(row["id"])
+            if i is None:
+                if not insert:
+                    continue
+                positions[row["id"]] = len(existing_data)
+                existing_data.append(row)
+                written.append((None, row))
+            elif replace is True or (callable(replace) and replace(existing_data[i])):
+                written.append((existing_data[i], row))
+                existing_data[i] = row
+        if not written:
+            return 0
+
+        with open(csv_path, "w", newline="", encoding="utf-8") as wf:
+            writer = csv.DictWriter(
+                wf, fieldnames=ANNOTATION_HEADERS, extrasaction="ignore"
+            )
+            writer.writeheader()
+            writer.writerows(existing_data)
+
+        for old_row, new_row in written:
+            annotation_stats.update_annotation(json_file_name, old_row, new_row)
+            cluster_index.mark_annotated(json_file_name, new_row["id"])
+
+    return len(written)
+
+
+semantic_search = None
+semantic_search_lock = threading.Lock()
+
+
+def get_semantic_search():
+    """Search indexes and query encoder, loaded on the first search."""
+    global semantic_search
+    with semantic_search_lock:
+        if semantic_search is None:
+            if not os.path.isdir(SEMANTIC_INDEX_DIR):
+                raise HTTPException(
+                    status_code=503, detail="Semantic index has not been built"
+                )
+            if TOPIC_MODELLING_DIR not in sys.path:
+                sys.path.append(TOPIC_MODELLING_DIR)
+            from semantic_index import SemanticSearch
+
+            semantic_search = SemanticSearch(SEMANTIC_INDEX_DIR)
+    return semantic_search
+
+
+@app.get("/api/semantic_search")
+def semantic_search_items(
+    target: str = "reviews",
+    k: int = 10,
+    query: Optional[str] = None,
+    like_ad: Optional[str] = None,
+    like_review: Optional[str] = None,
+):
+    """
+    Reviews or ads (`target`) nearest to a free-text query, or to an indexed
+    ad or review, e.g. the reviews closest to an ad's promise.
+    """
+    if target not in ("reviews", "ads"):
+        raise HTTPException(status_code=400, detail="target must be reviews or ads")
+    given = [value is not None for value in (query, like_ad, like_review)]
+    if sum(given) != 1:
+        raise HTTPException(
+            status_code=400, detail="Pass exactly one of query, like_ad, like_review"
+        )
+    k = max(1, min(k, SEMANTIC_SEARCH_LIMIT))
+
+    search = get_semantic_search()
+    start = time.perf_counter()
+    if query is not None:
+        results = search.search(target, k, query=query)
+    elif like_ad is not None:
+        results = search.search(target, k, like_kind="ads", like_id=like_ad)
+    else:
+        results = search.search(target, k, like_kind="reviews", like_id=like_review)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Item is not in the index")
+
+    return OrjsonResponse(
+        {
+            "results": results,
+            "took_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+    )
 
-    found = False
-    for i, row in enumerate(existing_data):
-        if row.get("id") == item_id:
-            existing_data[i] = annotation_data
-            found = True
-            break
 
-    if not found:
-        existing_data.append(annotation_data)
+@app.post("/api/save_annotation")
+def save_annotation(annotation: AnnotationPayload):
+    annotation_data = annotation.dict()
+    propagate = annotation_data.pop("propagate_to_cluster")
+    if propagate is None:
+        propagate = PROPAGATE_CLUSTER_LABELS
+    item_id = annotation_data["id"]
+    json_file_name = annotation_data["jsonFileName"]
 
-    with open(csv_path, "w", newline="", encoding="utf-8") as wf:
-        writer = csv.DictWriter(wf, fieldnames=all_headers, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(existing_data)
+    for key, value in annotation_data.items():
+        if isinstance(value, list):
+            annotation_data[key] = ";".join(map(str, value))
 
-    return {"status": "success", "message": "Annotation saved."}
+    annotation_data["timestamp"] = datetime.datetime.now().isoformat()
+    write_annotations(json_file_name, [annotation_data])
+
+    # Copy the labels to near-duplicates that nobody has annotated yet. Copies
+    # made from this ad earlier are always updated, so corrections reach them;
+    # near-duplicates annotated by hand are left alone.
+    propagated = 0
+    cluster = cluster_index.cluster_of.get((json_file_name, item_id))
+    if cluster is not None:
+        source = f"{json_file_name}/{item_id}"
+        targets = defaultdict(list)
+        for member_file, member_id in cluster_index.members[cluster]:
+            if (member_file, member_id) != (json_file_name, item_id):
+                targets[member_file].append(
+                    {
+                        **annotation_data,
+                        "jsonFileName": member_file,
+                        "id": member_id,
+                        "propagated_from": source,
+                    }
+                )
+        for member_file, rows in targets.items():
+            propagated += write_annotations(
+                member_file,
+                rows,
+                replace=lambda row: row.get("propagated_from") == source,
+                insert=propagate,
+            )
+
+    return {
+        "status": "success",
+        "message": "Annotation saved.",
+        "propagated": propagated,
+    }
 
 
 @app.get("/api/get_validation_batch")
-async def get_validation_batch():
+def get_validation_batch():
     """
     Returns the same 300 random items (seeded) every time.
     It checks the CSV to see if an item has ALREADY been validated,
@@ -387,11 +862,13 @@ async def get_validation_batch():
         else:
             item["existing_validation"] = None
 
-    return {"total_batch_size": len(selected_batch), "items": selected_batch}
+    return OrjsonResponse(
+        {"total_batch_size": len(selected_batch), "items": selected_batch}
+    )
 
 
 @app.post("/api/save_validation_result")
-async def save_validation_result(payload: ValidationPayload):
+def save_validation_result(payload: ValidationPayload):
     """
     Saves or Updates a validation result in the CSV.
     """
@@ -411,37 +888,42 @@ async def save_validation_result(payload: ValidationPayload):
         "timestamp": datetime.datetime.now().isoformat(),
     }
 
-    # Read all existing data
-    rows = []
-    file_exists = os.path.exists(VALIDATION_CSV_PATH)
-    found = False
-
-    if file_exists:
-        try:
-            with open(VALIDATION_CSV_PATH, "r", newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                rows = list(reader)
-        except Exception:
-            rows = []
-
-    # Check if we need to update an existing row
-    for i, row in enumerate(rows):
-        if (
-            row["source_json"] == payload.source_json
-            and row["file_name"] == payload.file_name
-        ):
-            rows[i] = new_row
-            found = True
-            break
-
-    if not found:
-        rows.append(new_row)
-
-    # Write back completely
-    with open(VALIDATION_CSV_PATH, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    with csv_lock(VALIDATION_CSV_PATH):
+        # Read all existing data
+        rows = []
+        file_exists = os.path.exists(VALIDATION_CSV_PATH)
+        found = False
+
+        if file_exists:
+            try:
+                with open(VALIDATION_CSV_PATH, "r", newline="", encoding="utf-8") as f:
+                    reader = csv.DictReader(f)
+                    rows = list(reader)
+            except Exception:
+                rows = []
+
+        # Check if we need to update an existing row
+        old_row = None
+        for i, row in enumerate(rows):
+            if (
+                row["source_json"] == payload.source_json
+                and row["file_name"] == payload.file_name
+            ):
+                old_row = row
+                rows[i] = new_row
+                found = True
+                break
+
+        if not found:
+            rows.append(new_row)
+
+        # Write back completely
+        with open(VALIDATION_CSV_PATH, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+
+        annotation_stats.update_validation(old_row, new_row)
 
     return {"status": "success"}
 
@@ -0,0 +1,87 @@
+"""
+build_clusters on a small keyword file: near-identical creative texts are
+grouped, unrelated texts are not, and ads without text are grouped by the
+difference hash of their downloaded image.
+
+Usage:
+    python -m pytest test_near_duplicates.py
+"""
+
+import json
+
+import near_duplicates
+import numpy as np
+import pytest
+from PIL import Image
+
+BASE_TEXT = (
+    "Win real cash every day with India's most trusted rummy app. "
+    "Instant withdrawals to your bank account, 24x7 support and a "
+    "welcome bonus of 5000 rupees on your first deposit. Download now!"
+)
+OTHER_TEXT = (
+    "Fresh vegetables delivered to your doorstep in ten minutes. "
+    "Order groceries, fruits and dairy from local stores near you."
+)
+
+
+def gradient(width, height, flip=False):
+    """Horizontal grey gradient, reversed when flip is set."""
+    row = np.linspace(0, 255, width, dtype=np.uint8)
+    if flip:
+        row = row[::-1]
+    return Image.fromarray(np.tile(row, (height, 1)), mode="L").convert("RGB")
+
+
+@pytest.fixture
+def ads_folder(tmp_path):
+    """One keyword file of ads with images under media/<keyword>/<id>.png."""
+    json_folder = tmp_path / "json"
+    media_folder = tmp_path / "media"
+    json_folder.mkdir()
+    (media_folder / "rummy").mkdir(parents=True)
+
+    ads = [
+        {"id": "1", "ad_creative_bodies": [BASE_TEXT]},
+        # Same creative with a different bonus and punctuation
+        {"id": "2", "ad_creative_bodies": [BASE_TEXT.replace("5000", "2000") + "!!"]},
+        {"id": "3", "ad_creative_bodies": [OTHER_TEXT]},
+        # No text, the image is all there is to compare on
+        {"id": "4", "media_type": None},
+        {"id": "5", "media_type": "image"},
+        {"id": "6", "media_type": "image"},
+    ]
+    (json_folder / "rummy.json").write_text(json.dumps(ads), encoding="utf-8")
+
+    media = media_folder / "rummy"
+    gradient(64, 64).save(media / "4.png")
+    # Re-encoded at another size, the same picture to the difference hash
+    gradient(100, 80).save(media / "5.png")
+    gradient(64, 64, flip=True).save(media / "6.png")
+    return json_folder, media_folder
+
+
+def test_text_clusters(ads_folder):
+    json_folder, _ = ads_folder
+    clusters = near_duplicates.build_clusters(json_folder)
+    assert clusters == [[["rummy.json", "1"], ["rummy.json", "2"]]]
+
+
+def test_image_hash_clusters(ads_folder):
+    json_folder, media_folder = ads_folder
+    clusters = near_duplicates.build_clusters(json_folder, media_folder)
+    # Texts 1 and 2 have no images, so they still match on text alone
+    assert sorted(clusters) == [
+        [["rummy.json", "1"], ["rummy.json", "2"]],
+        [["rummy.json", "4"], ["rummy.json", "5"]],
+    ]
+
+
+def test_unrelated_texts_stay_apart():
+    texts = [
+        near_duplicates.creative_text({"ad_creative_bodies": [text]})
+        for text in (BASE_TEXT, OTHER_TEXT, BASE_TEXT.upper())
+    ]
+    groups = near_duplicates.cluster_texts(texts)
+    assert groups[0] == groups[2]
+    assert groups[0] != groups[1]
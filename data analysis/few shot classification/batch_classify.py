@@ -0,0 +1,361 @@
+"""
+Batch-API submission mode for few-shot image classification.
+Builds one JSONL of requests (few-shot prefix plus image) for a keyword folder,
+submits it as a Gemini batch job, polls it and ingests the results into the
+same output format as classify.py. Safe to re-run: a submitted job is tracked
+in a state file and is polled again instead of being submitted twice.
+"""
+
+import base64
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+from classify import (
+    MODEL,
+    ImageAnnotation,
+    append_result,
+    build_few_shot_prefix,
+    build_output_format_instructions,
+    compact_results,
+    get_client,
+    image_folder,
+    iter_upload_images,
+    keyword,
+    list_images,
+    load_media_parts,
+    load_processed_ids,
+    output_file,
+    repair_journal,
+    token_log_file,
+    validate_annotation,
+    write_token_log,
+)
+from google.genai import types
+
+# Configuration
+batch_dir = Path(f"batch_jobs/{keyword}")
+requests_file = batch_dir / "requests.jsonl"
+state_file = batch_dir / "state.json"
+POLL_INTERVAL = 60  # Seconds between job status checks
+USE_LOCAL_BATCH = False  # Run against LocalBatchClient instead of the Gemini API
+
+COMPLETED_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+
+
+class LocalBatchClient:
+    """
+    Local stand-in for the parts of genai.Client used by batch mode.
+    Jobs complete immediately and every request is answered by `responder`,
+    which receives the request dict and returns the response text.
+    """
+
+    def __init__(self, work_dir, responder=None):
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.responder = responder or (lambda request: '{"is_spam": true}')
+        self.jobs = {}
+        self.files = SimpleNamespace(upload=self._upload, download=self._download)
+        self.batches = SimpleNamespace(create=self._create, get=self._get)
+
+    def _upload(self, file, config=None):
+        return SimpleNamespace(name=str(file))
+
+    def _download(self, file):
+        with open(file, "rb") as f:
+            return f.read()
+
+    def _create(self, model, src, config=None):
+        name = f"batches/local-{len(self.jobs) + 1}"
+        dest = self.work_dir / f"local-{len(self.jobs) + 1}-results.jsonl"
+
+        with (
+            open(src, "r", encoding="utf-8") as rf,
+            open(dest, "w", encoding="utf-8") as wf,
+        ):
+            for line in rf:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                response = {
+                    "candidates": [
+                        {
+                            "content": {
+                                "role": "model",
+                                "parts": [{"text": self.responder(entry["request"])}],
+                            }
+                        }
+                    ],
+                    "usageMetadata": {
+                        "promptTokenCount": 0,
+                        "candidatesTokenCount": 0,
+                        "totalTokenCount": 0,
+                    },
+                }
+                wf.write(json.dumps({"key": entry["key"], "response": response}) + "\n")
+
+        self.jobs[name] = SimpleNamespace(
+            name=name,
+            state=SimpleNamespace(name="JOB_STATE_SUCCEEDED"),
+            dest=SimpleNamespace(file_name=str(dest)),
+            error=None,
+        )
+        return self.jobs[name]
+
+    def _get(self, name):
+        return self.jobs[name]
+
+
+def serialize_part(item):
+    """Convert a prompt item into the REST representation used in batch JSONL."""
+    if isinstance(item, str):
+        return {"text": item}
+    return {
+        "inline_data": {
+            "mime_type": item.inline_data.mime_type,
+            "data": base64.b64encode(item.inline_data.data).decode("ascii"),
+        }
+    }
+
+
+def load_state():
+    """Load the tracked batch job for this keyword, if any."""
+    if state_file.exists():
+        with open(state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+
+def save_state(state):
+    """Persist the tracked batch job so a restart can resume polling."""
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    with open(state_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+
+
+def build_requests_file(image_paths):
+    """
+    Write one JSONL line per image. The few-shot prefix is serialized once and
+    the same encoded parts are reused for every line.
+    """
+    prefix_contents, examples_added = build_few_shot_prefix()
+    prefix_parts = [serialize_part(item) for item in prefix_contents]
+    prefix_parts.append(serialize_part(build_output_format_instructions()))
+
+    generation_config = {
+        "response_mime_type": "application/json",
+        "response_json_schema": ImageAnnotation.model_json_schema(),
+    }
+
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    keys = []
+    with open(requests_file, "w", encoding="utf-8") as f:
+        for image_path, upload_path, mime_type in iter_upload_images(image_paths):
+            try:
+                media_parts = load_media_parts(upload_path, mime_type)
+            except (OSError, ValueError) as e:
+                print(f"\n⚠️  Error reading {image_path.name}: {e}")
+                continue
+
+            request = {
+                "contents": [
+                    {
+                        "role": "user",
+                        "parts": prefix_parts
+                        + [serialize_part(item) for item in media_parts],
+                    }
+                ],
+                "generation_config": generation_config,
+            }
+            f.write(json.dumps({"key": image_path.name, "request": request}) + "\n")
+            keys.append(image_path.name)
+
+    return keys, examples_added
+
+
+def submit_batch(batch_client, image_paths):
+    """Build the JSONL, upload it and create the batch job."""
+    keys, examples_added = build_requests_file(image_paths)
+    print(f"Built {len(keys)} requests with {examples_added} examples each")
+
+    uploaded = batch_client.files.upload(
+        file=str(requests_file),
+        config=types.UploadFileConfig(
+            display_name=f"few-shot-{keyword}", mime_type="jsonl"
+        ),
+    )
+    job = batch_client.batches.create(
+        model=MODEL,
+        src=uploaded.name,
+        config=types.CreateBatchJobConfig(display_name=f"few-shot-{keyword}"),
+    )
+
+    state = {
+        "job_name": job.name,
+        "model": MODEL,
+        "image_folder": str(image_folder),
+        "num_examples": examples_added,
+        "submitted_utc": datetime.now(timezone.utc).isoformat(),
+        "keys": keys,
+        "status": "submitted",
+    }
+    save_state(state)
+    print(f"Submitted batch job {job.name}")
+    return state
+
+
+def wait_for_job(batch_client, job_name):
+    """Poll the batch job until it reaches a terminal state."""
+    job = batch_client.batches.get(name=job_name)
+    while job.state.name not in COMPLETED_STATES:
+        print(f"Job {job_name} is {job.state.name}, checking again in {POLL_INTERVAL}s")
+        time.sleep(POLL_INTERVAL)
+        job = batch_client.batches.get(name=job_name)
+    return job
+
+
+def response_text_from(response):
+    """Join the text parts of the first candidate of a REST response."""
+    candidates = response.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(p.get("text", "") for p in parts if not p.get("thought"))
+
+
+def usage_value(usage, camel, snake):
+    """Read a usage field that may be in camelCase or snake_case."""
+    return usage.get(camel, usage.get(snake))
+
+
+def ingest_results(batch_client, job, state):
+    """Journal every batch result that has not been ingested yet."""
+    processed_files = load_processed_ids()
+    paths = {p.name: p for p in list_images(Path(state["image_folder"]))}
+    content = batch_client.files.download(file=job.dest.file_name)
+    ingested = 0
+
+    for line in content.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        file_name = entry.get("key")
+        if file_name in processed_files:
+            continue
+        file_path = str(paths.get(file_name, Path(state["image_folder"]) / file_name))
+
+        if "error" in entry:
+            result = {
+                "file_name": file_name,
+                "file_path": file_path,
+                "annotations": None,
+                "status": "error",
+                "error": json.dumps(entry["error"]),
+            }
+        else:
+            response = entry.get("response", {})
+            response_text = response_text_from(response)
+            try:
+                result = {
+                    "file_name": file_name,
+                    "file_path": file_path,
+                    "annotations": validate_annotation(response_text),
+                    "status": "success",
+                }
+            except ValueError as e:
+                result = {
+                    "file_name": file_name,
+                    "file_path": file_path,
+                    "annotations": None,
+                    "status": "json_error",
+                    "error": str(e),
+                    "raw_response": response_text,
+                }
+
+            usage = (
+                response.get("usageMetadata") or response.get("usage_metadata") or {}
+            )
+            write_token_log(
+                {
+                    "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+                    "file_name": file_name,
+                    "keyword": Path(state["image_folder"]).name,
+                    "model": state["model"],
+                    "status": "success"
+                    if result["status"] == "success"
+                    else "invalid_response",
+                    "retries": 0,
+                    "prompt_tokens": usage_value(
+                        usage, "promptTokenCount", "prompt_token_count"
+                    ),
+                    "output_tokens": usage_value(
+                        usage, "candidatesTokenCount", "candidates_token_count"
+                    ),
+                    "thoughts_tokens": usage_value(
+                        usage, "thoughtsTokenCount", "thoughts_token_count"
+                    ),
+                    "total_tokens": usage_value(
+                        usage, "totalTokenCount", "total_token_count"
+                    ),
+                    "stage": "full",
+                    "few_shot_mode": True,
+                    "batch_mode": True,
+                    "num_examples": state["num_examples"],
+                }
+            )
+
+        append_result(result)
+        processed_files.add(file_name)
+        ingested += 1
+
+    return ingested
+
+
+def run_batch(batch_client=None):
+    """Submit, poll and ingest one batch job for the configured keyword folder."""
+    if batch_client is None:
+        batch_client = LocalBatchClient(batch_dir) if USE_LOCAL_BATCH else get_client()
+
+    repair_journal()
+    state = load_state()
+
+    if state and state["status"] == "submitted":
+        print(f"Resuming batch job {state['job_name']}")
+    else:
+        processed_files = load_processed_ids()
+        image_paths = [
+            p for p in list_images(image_folder) if p.name not in processed_files
+        ]
+        if not image_paths:
+            print("No new images to process!")
+            return
+        state = submit_batch(batch_client, image_paths)
+
+    job = wait_for_job(batch_client, state["job_name"])
+    if job.state.name != "JOB_STATE_SUCCEEDED":
+        print(f"⚠️  Batch job {job.name} ended as {job.state.name}: {job.error}")
+        state["status"] = job.state.name
+        save_state(state)
+        return
+
+    ingested = ingest_results(batch_client, job, state)
+    compact_results()
+    state["status"] = "ingested"
+    save_state(state)
+
+    print(f"\n{'=' * 50}")
+    print(f"✓ Ingested {ingested} batch results into {output_file}")
+    print(f"✓ Token logs saved to {token_log_file}")
+    print(f"{'=' * 50}")
+
+
+if __name__ == "__main__":
+    run_batch()
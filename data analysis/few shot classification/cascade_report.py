@@ -0,0 +1,184 @@
+"""
+Report on a cascade run: how often the triage model agrees with the full
+annotation model, and the per-image latency and cost compared with sending
+every image to MODEL, based on gemini_token_log.jsonl.
+"""
+
+import json
+from pathlib import Path
+from statistics import mean
+
+from classify import (
+    MODEL,
+    TRIAGE_CONFIDENCE_THRESHOLD,
+    TRIAGE_MODEL,
+    estimate_cost,
+    load_existing_results,
+    output_file,
+    read_journal,
+    token_log_file,
+)
+
+
+def load_cascade_results():
+    """Results of the current output (compacted plus journal) that went through triage."""
+    merged = {r["file_name"]: r for r in load_existing_results()}
+    for r in read_journal():
+        merged[r["file_name"]] = r
+    return {
+        name: r
+        for name, r in merged.items()
+        if r.get("cascade") and r["status"] == "success"
+    }
+
+
+def load_stage_entries(file_names):
+    """Latest token log entry per (file_name, stage) for the given files."""
+    entries = {}
+    if not Path(token_log_file).exists():
+        return entries
+    with open(token_log_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("file_name") in file_names and entry.get("stage"):
+                entries[(entry["file_name"], entry["stage"])] = entry
+    return entries
+
+
+def summarize_agreement(results):
+    """Confusion counts of triage is_spam against full-model is_spam."""
+    counts = {
+        "spam/spam": 0,
+        "spam/not_spam": 0,
+        "not_spam/spam": 0,
+        "not_spam/not_spam": 0,
+    }
+    audit_total = 0
+    audit_agree = 0
+
+    for r in results.values():
+        cascade = r["cascade"]
+        triage = cascade.get("triage")
+        if cascade["stage"] != "full" or triage is None:
+            continue
+        triage_label = "spam" if triage["is_spam"] else "not_spam"
+        full_label = "spam" if r["annotations"].get("is_spam") else "not_spam"
+        counts[f"{triage_label}/{full_label}"] += 1
+        if cascade.get("audit"):
+            audit_total += 1
+            audit_agree += full_label == "spam"
+
+    compared = sum(counts.values())
+    agreement = (
+        (counts["spam/spam"] + counts["not_spam/not_spam"]) / compared
+        if compared
+        else None
+    )
+    audit_precision = audit_agree / audit_total if audit_total else None
+    return counts, agreement, audit_total, audit_precision
+
+
+def main():
+    results = load_cascade_results()
+    if not results:
+        print(f"No cascade results found in {output_file}")
+        return
+
+    entries = load_stage_entries(set(results))
+    triage_only = [n for n, r in results.items() if r["cascade"]["stage"] == "triage"]
+    escalated = [n for n, r in results.items() if r["cascade"]["stage"] == "full"]
+    audited = [n for n in escalated if results[n]["cascade"].get("audit")]
+
+    # Per-image cost and latency of the cascade as it actually ran, and of
+    # MODEL where it was called
+    cascade_costs = []
+    cascade_latencies = []
+    full_costs = {}
+    full_latencies = {}
+    for name in results:
+        stage_entries = [entries.get((name, s)) for s in ("triage", "full")]
+        stage_entries = [e for e in stage_entries if e]
+        if not stage_entries:
+            continue
+        cascade_costs.append(sum(estimate_cost(e) or 0.0 for e in stage_entries))
+        cascade_latencies.append(
+            sum(e.get("latency_seconds") or 0.0 for e in stage_entries)
+        )
+
+        full_entry = entries.get((name, "full"))
+        if full_entry:
+            full_costs[name] = estimate_cost(full_entry) or 0.0
+            full_latencies[name] = full_entry.get("latency_seconds") or 0.0
+
+    # Escalated images are mostly non-spam with long outputs, so MODEL's cost
+    # on triage-decided images is estimated from the audited ones, a random
+    # sample of confident spam verdicts
+    audit_costs = [full_costs[n] for n in audited if n in full_costs]
+    audit_latencies = [full_latencies[n] for n in audited if n in full_latencies]
+    baseline_costs = list(full_costs.values())
+    baseline_latencies = list(full_latencies.values())
+    if audit_costs:
+        unaudited = sum(
+            1
+            for n in triage_only
+            if any(entries.get((n, s)) for s in ("triage", "full"))
+        )
+        baseline_costs += [mean(audit_costs)] * unaudited
+        baseline_latencies += [mean(audit_latencies)] * unaudited
+
+    counts, agreement, audit_total, audit_precision = summarize_agreement(results)
+
+    print(f"\n{'=' * 50}")
+    print(
+        f"Cascade: {TRIAGE_MODEL} -> {MODEL} (threshold {TRIAGE_CONFIDENCE_THRESHOLD})"
+    )
+    print(f"  Images: {len(results)}")
+    print(f"  Decided by triage: {len(triage_only)}")
+    print(f"  Escalated to {MODEL}: {len(escalated)} (audits: {len(audited)})")
+
+    print("\nAgreement (triage / full):")
+    for label, count in counts.items():
+        print(f"  {label}: {count}")
+    if agreement is not None:
+        print(f"  Overall agreement: {agreement:.1%}")
+    if audit_precision is not None:
+        print(
+            f"  Audited spam verdicts confirmed by {MODEL}: {audit_precision:.1%} of {audit_total}"
+        )
+
+    if cascade_costs and baseline_costs:
+        baseline_cost = mean(baseline_costs)
+        baseline_latency = mean(baseline_latencies)
+        cascade_cost = mean(cascade_costs)
+        cascade_latency = mean(cascade_latencies)
+        print("\nPer image (cascade vs. full model only):")
+        if audit_costs:
+            print(
+                f"  Full-model baseline for triage-decided images estimated from "
+                f"{len(audit_costs)} audited images"
+            )
+        else:
+            print(
+                "  ⚠️  No audited images: the full-model baseline is measured on "
+                "escalated images only, which overstates the savings"
+            )
+        print(
+            f"  Cost: ${cascade_cost:.5f} vs ${baseline_cost:.5f} ({1 - cascade_cost / baseline_cost:.1%} saved)"
+        )
+        print(
+            f"  Latency: {cascade_latency:.2f}s vs {baseline_latency:.2f}s "
+            f"({1 - cascade_latency / baseline_latency:.1%} saved)"
+        )
+        print(
+            f"  Projected for {len(results)} images: "
+            f"${cascade_cost * len(results):.2f} vs ${baseline_cost * len(results):.2f}"
+        )
+    else:
+        print(f"\nNot enough entries in {token_log_file} to compare cost and latency.")
+    print(f"{'=' * 50}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,31 +3,92 @@ Few-shot image classification using Gemini 2.0 Flash.
 Includes example images with annotations to improve model consistency.
 """
 
+import hashlib
 import json
 import os
+import tempfile
+import threading
+import time
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Literal
 
+import ijson
 from dotenv import load_dotenv
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+from image_preprocessing import (
+    load_image,
+    preprocess_images,
+    settings_tag,
+    sniff_mime_type,
+)
+from pydantic import BaseModel, Field, model_validator
+from response_cache import ResponseCache, hash_file, hash_prompt
 from tqdm import tqdm
+from video_keyframes import (
+    extract_keyframes,
+    is_video,
+    keyframe_settings_tag,
+    prepare_media,
+)
 
 load_dotenv()
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
 # Configuration
 keyword = "instagram key word name"
-image_folder = Path(
-    f"/path/to/instagram posts downloaded/{keyword}"
-)
-examples_folder = Path(
-    "/path/to/few_shot_examples"
-)
+image_folder = Path(f"/path/to/instagram posts downloaded/{keyword}")
+examples_folder = Path("/path/to/few_shot_examples")
 output_file = rf"/path/to/output annotations/{keyword}.json"
+# Per-result journal, compacted into output_file when the run completes
+journal_file = rf"/path/to/output annotations/{keyword}.ndjson"
 token_log_file = "gemini_token_log.jsonl"
 MODEL = "gemini-2.5-pro"
-SAVE_INTERVAL = 10  # Save every N images
+USE_CONTEXT_CACHE = True  # Upload the few-shot prefix once via explicit context caching
+CONTEXT_CACHE_TTL = "3600s"  # Refreshed every CACHE_REFRESH_INTERVAL images
+CACHE_REFRESH_INTERVAL = 10
+# Smallest prefix explicit context caching accepts, per model (Gemini docs)
+MIN_CACHE_TOKENS = {
+    "gemini-2.5-pro": 4096,
+    "gemini-2.5-flash": 1024,
+    "gemini-2.5-flash-lite": 1024,
+}
+USE_PREPROCESSING = True  # Downscale and re-encode images before upload
+USE_RESPONSE_CACHE = True  # Answer identical (image, prompt, model) requests locally
+MAX_VALIDATION_ATTEMPTS = 3  # Calls per image before it is recorded as json_error
+MAX_API_RETRIES = 3  # Retries of rate-limited or unavailable API calls
+API_RETRY_BACKOFF = 5  # Seconds, doubled on every retry
+RETRYABLE_STATUS_CODES = {429, 500, 503, 504}
+
+# Cascade: a cheap spam-only triage call before the full annotation
+USE_CASCADE = False
+TRIAGE_MODEL = "gemini-2.5-flash-lite"
+TRIAGE_CONFIDENCE_THRESHOLD = 0.9  # Spam verdicts below this escalate to MODEL
+CASCADE_AUDIT_RATE = 0.05  # Share of confident spam verdicts also sent to MODEL
+
+# USD per 1M tokens (prompts up to 200k tokens), used for cost reporting
+MODEL_PRICING = {
+    "gemini-2.5-pro": {"input": 1.25, "cached": 0.125, "output": 10.00},
+    "gemini-2.5-flash": {"input": 0.30, "cached": 0.03, "output": 2.50},
+    "gemini-2.5-flash-lite": {"input": 0.10, "cached": 0.01, "output": 0.40},
+}
+BATCH_DISCOUNT = 0.5
+
+# Optional RequestScheduler shared by concurrent callers (see classify_corpus.py)
+scheduler = None
+token_log_lock = threading.Lock()
+client_lock = threading.Lock()
+_client = None
+
+
+def get_client():
+    """Create the Gemini client on first use, so offline tools import without a key."""
+    global _client
+    with client_lock:
+        if _client is None:
+            _client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    return _client
+
 
 # Few-shot examples with their expected annotations
 FEW_SHOT_EXAMPLES = [
@@ -101,6 +162,36 @@ FEW_SHOT_EXAMPLES = [
 ]
 
 
+class ImageAnnotation(BaseModel):
+    """Response schema for the full annotation, sent to the API and checked locally."""
+
+    is_spam: bool
+    ad_category: list[str] | None = None
+    app_name: list[str] | None = None
+    primary_messaging_strategy: list[str] | None = None
+    potentially_harmful_narratives: list[str] | None = None
+    media_authenticity: list[str] | None = None
+    sexual_content: Literal["yes", "no"] | None = None
+    ad_notes: str | None = None
+
+    @model_validator(mode="after")
+    def check_fields_for_non_spam(self):
+        if not self.is_spam:
+            missing = [
+                name for name, value in self if name != "is_spam" and value is None
+            ]
+            if missing:
+                raise ValueError(f"missing fields for non-spam image: {missing}")
+        return self
+
+
+class SpamTriage(BaseModel):
+    """Response schema for the cascade triage call."""
+
+    is_spam: bool
+    confidence: float = Field(ge=0.0, le=1.0)
+
+
 def build_base_instructions():
     """Build the base annotation instructions."""
     return """Analyze this image and answer the following questions. Provide your response in JSON format.
@@ -190,201 +281,735 @@ If is_spam is FALSE:
 """
 
 
-def load_existing_results():
+def list_images(folder):
+    """List the images and videos in a folder that can be classified."""
+    return (
+        list(folder.glob("*.png"))
+        + list(folder.glob("*.jpg"))
+        + list(folder.glob("*.jpeg"))
+        + list(folder.glob("*.mp4"))
+    )
+
+
+def read_image(image_path):
+    """Read an image for upload, preprocessed if enabled. Returns (bytes, mime type)."""
+    if USE_PREPROCESSING:
+        return load_image(image_path)
+    with open(image_path, "rb") as f:
+        data = f.read()
+    return data, sniff_mime_type(data)
+
+
+def iter_upload_images(image_paths):
+    """
+    Yield (image_path, upload path, mime type) for each image. With
+    preprocessing enabled a worker pool prepares images and video keyframes
+    ahead of the API calls.
+    """
+    if USE_PREPROCESSING:
+        yield from preprocess_images(image_paths, prepare=prepare_media)
+    else:
+        for image_path in image_paths:
+            yield image_path, image_path, None
+
+
+def load_media_parts(upload_path, mime_type):
+    """
+    Content items for one image or video. A video is sent as its keyframes in
+    playback order behind a short note, upload_path being either the cached
+    keyframe directory or the video itself.
+    """
+    upload_path = Path(upload_path)
+    if not (upload_path.is_dir() or is_video(upload_path)):
+        with open(upload_path, "rb") as f:
+            image_bytes = f.read()
+        return [
+            types.Part.from_bytes(
+                data=image_bytes, mime_type=mime_type or sniff_mime_type(image_bytes)
+            )
+        ]
+
+    frame_paths = (
+        sorted(upload_path.glob("*.jpg"))
+        if upload_path.is_dir()
+        else extract_keyframes(upload_path)
+    )
+    intro = (
+        f"\nThis is a video ad. The following {len(frame_paths)} images are "
+        "keyframes from it in playback order. Annotate the video as a whole."
+    )
+    parts = [intro]
+    for frame_path in frame_paths:
+        with open(frame_path, "rb") as f:
+            parts.append(types.Part.from_bytes(data=f.read(), mime_type="image/jpeg"))
+    return parts
+
+
+def build_few_shot_prefix():
+    """
+    Build the instruction text and interleaved few-shot examples once per run.
+    Returns the list of content items and the number of examples that were loaded.
+    """
+    contents = [build_base_instructions()]
+    examples_added = 0
+
+    for i, example in enumerate(FEW_SHOT_EXAMPLES, 1):
+        example_path = examples_folder / example["image_file"]
+        if not example_path.exists():
+            continue
+
+        try:
+            ex_bytes, ex_mime = read_image(example_path)
+
+            # Add example with clear labeling
+            contents.append(f"\n\nEXAMPLE {i}:")
+            contents.append(types.Part.from_bytes(data=ex_bytes, mime_type=ex_mime))
+            contents.append(
+                f"\nExpected JSON output:\n{json.dumps(example['annotation'], indent=2)}"
+            )
+            examples_added += 1
+        except Exception as e:
+            print(f"\n⚠️  Error loading example {example_path}: {e}")
+            continue
+
+    return contents, examples_added
+
+
+def create_context_cache(prefix_contents):
+    """
+    Upload the few-shot prefix through the Gemini explicit context caching API.
+    Returns the cache handle, or None if caching is unavailable so the caller can
+    fall back to sending the prefix inline with every request. Downscaled
+    examples can leave the prefix below the model's caching minimum, which is
+    checked first.
+    """
+    parts = [
+        types.Part.from_text(text=item) if isinstance(item, str) else item
+        for item in prefix_contents
+    ]
+    contents = [types.Content(role="user", parts=parts)]
+    min_tokens = MIN_CACHE_TOKENS.get(MODEL)
+    if min_tokens:
+        try:
+            counted = get_client().models.count_tokens(model=MODEL, contents=contents)
+            prefix_tokens = counted.total_tokens
+        except Exception as e:
+            print(f"⚠️  Could not count few-shot prefix tokens: {e}")
+            prefix_tokens = None
+        if prefix_tokens is not None and prefix_tokens < min_tokens:
+            print(
+                f"⚠️  Few-shot prefix is {prefix_tokens:,} tokens, below the "
+                f"{min_tokens:,}-token minimum for context caching on {MODEL}; "
+                "sending examples inline. Set USE_CONTEXT_CACHE = False to skip "
+                "this check."
+            )
+            return None
+        if prefix_tokens is not None:
+            print(f"Caching few-shot prefix of {prefix_tokens:,} tokens")
+    try:
+        return get_client().caches.create(
+            model=MODEL,
+            config=types.CreateCachedContentConfig(
+                display_name=f"few-shot-{keyword}",
+                contents=contents,
+                ttl=CONTEXT_CACHE_TTL,
+            ),
+        )
+    except Exception as e:
+        print(f"⚠️  Context caching unavailable, sending examples inline: {e}")
+        return None
+
+
+def refresh_context_cache(cache):
+    """Extend the cache TTL so it does not expire in the middle of a long run."""
+    try:
+        get_client().caches.update(
+            name=cache.name,
+            config=types.UpdateCachedContentConfig(ttl=CONTEXT_CACHE_TTL),
+        )
+    except Exception as e:
+        print(f"\n⚠️  Could not refresh context cache {cache.name}: {e}")
+
+
+def delete_context_cache(cache):
+    """Delete the context cache so we stop paying for its storage."""
+    try:
+        get_client().caches.delete(name=cache.name)
+    except Exception as e:
+        print(f"⚠️  Could not delete context cache {cache.name}: {e}")
+
+
+def build_triage_instructions():
+    """Build the minimal spam-only prompt used by the cascade triage model."""
+    return """Is this image related to gambling, betting, casino games, prediction games, lottery or similar activities?
+If it is NOT related to any of these, it is spam.
+
+Respond ONLY with a valid JSON object in this format:
+{
+  "is_spam": true/false,
+  "confidence": number between 0 and 1
+}
+"""
+
+
+def estimate_cost(entry):
+    """Estimate the USD cost of one token log entry, or None for unknown models."""
+    pricing = MODEL_PRICING.get(entry.get("model"))
+    if pricing is None:
+        return None
+
+    prompt_tokens = entry.get("prompt_tokens") or 0
+    cached_tokens = entry.get("cached_tokens") or 0
+    output_tokens = (entry.get("output_tokens") or 0) + (
+        entry.get("thoughts_tokens") or 0
+    )
+    cost = (
+        (prompt_tokens - cached_tokens) * pricing["input"]
+        + cached_tokens * pricing["cached"]
+        + output_tokens * pricing["output"]
+    ) / 1_000_000
+    if entry.get("batch_mode"):
+        cost *= BATCH_DISCOUNT
+    return cost
+
+
+def validate_annotation(response_text, schema=ImageAnnotation):
+    """
+    Parse and validate a response against the schema. Returns the annotation
+    dict without unset fields, so spam stays {"is_spam": true}. Raises
+    ValueError for empty, unparseable or invalid responses.
+    """
+    if not response_text:
+        raise ValueError("empty response")
+    data = parse_response_text(response_text)
+    return schema.model_validate(data).model_dump(exclude_none=True)
+
+
+def parse_response_text(response_text):
+    """Strip markdown code fences from a model response and parse the JSON."""
+    response_text = response_text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text.split("```json")[1].split("```")[0].strip()
+    elif response_text.startswith("```"):
+        response_text = response_text.split("```")[1].split("```")[0].strip()
+    return json.loads(response_text)
+
+
+def build_token_log_entry(
+    image_path, model, usage, latency_seconds, status, retries, **extra
+):
+    """
+    Build a token log entry for one model call. usage is the response's usage
+    metadata, or None when the call failed before a response was returned.
+    """
+    entry = {
+        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+        "file_name": image_path.name,
+        "keyword": image_path.parent.name,
+        "model": model,
+        "status": status,
+        "retries": retries,
+        "latency_seconds": round(latency_seconds, 3),
+    }
+    if usage is None:
+        entry.update(extra)
+        return entry
+
+    entry.update(
+        {
+            "prompt_tokens": usage.prompt_token_count,
+            "output_tokens": usage.candidates_token_count,
+            "thoughts_tokens": usage.thoughts_token_count,
+            "total_tokens": usage.total_token_count,
+            "cached_tokens": usage.cached_content_token_count,
+            "prompt_tokens_text": next(
+                (
+                    d.token_count
+                    for d in usage.prompt_tokens_details or []
+                    if d.modality.name == "TEXT"
+                ),
+                None,
+            ),
+            "prompt_tokens_image": next(
+                (
+                    d.token_count
+                    for d in usage.prompt_tokens_details or []
+                    if d.modality.name == "IMAGE"
+                ),
+                None,
+            ),
+        }
+    )
+    entry.update(extra)
+    return entry
+
+
+def write_token_log(token_log_entry):
+    """Append one entry to the token usage log."""
+    with token_log_lock, open(token_log_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps(token_log_entry) + "\n")
+
+
+def is_retryable(error):
+    """Whether an API error is worth retrying after a backoff."""
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def call_model(model, contents, config=None):
+    """
+    Call generate_content, waiting on the shared scheduler first if one is set
+    and retrying rate-limited or unavailable calls with exponential backoff.
+    Returns (response, wall-clock latency, retries). On failure the raised
+    error carries latency_seconds and retries attributes for logging.
+    """
+    start = time.perf_counter()
+    for retry in range(MAX_API_RETRIES + 1):
+        ticket = scheduler.acquire() if scheduler else None
+        tokens = 0
+        try:
+            response = get_client().models.generate_content(
+                model=model, contents=contents, config=config
+            )
+            tokens = response.usage_metadata.total_token_count or 0
+            return response, time.perf_counter() - start, retry
+        except Exception as e:
+            if retry == MAX_API_RETRIES or not is_retryable(e):
+                e.latency_seconds = time.perf_counter() - start
+                e.retries = retry
+                raise
+        finally:
+            if ticket:
+                scheduler.record(ticket, tokens)
+        time.sleep(API_RETRY_BACKOFF * 2**retry)
+
+
+def log_failed_call(image_path, model, error, **extra):
+    """Record a call that raised, so errors show up in the token log too."""
+    write_token_log(
+        build_token_log_entry(
+            image_path,
+            model,
+            None,
+            getattr(error, "latency_seconds", 0.0),
+            "error",
+            getattr(error, "retries", 0),
+            error=str(error),
+            **extra,
+        )
+    )
+
+
+def load_existing_results(output_path=None):
     """Load existing results from output file if it exists."""
-    if Path(output_file).exists():
+    output_path = output_path or output_file
+    if Path(output_path).exists():
         try:
-            with open(output_file, "r", encoding="utf-8") as f:
+            with open(output_path, "r", encoding="utf-8") as f:
                 return json.load(f)
-        except (json.JSONDecodeError, IOError):
+        except (json.JSONDecodeError, OSError):
             return []
     return []
 
 
-def save_results(results):
-    """Save results to JSON file."""
-    with open(output_file, "w", encoding="utf-8") as f:
+def read_journal(journal_path=None):
+    """Yield results from the journal, skipping a line truncated by a crash."""
+    journal_path = journal_path or journal_file
+    if not Path(journal_path).exists():
+        return
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def repair_journal(journal_path=None):
+    """Drop a partially written last line so new entries start on a fresh line."""
+    journal_path = journal_path or journal_file
+    if not Path(journal_path).exists():
+        return
+    with open(journal_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def append_result(result, journal_path=None):
+    """Append one result to the journal and flush it to disk immediately."""
+    journal_path = journal_path or journal_file
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_processed_ids(output_path=None, journal_path=None):
+    """
+    Get the set of already processed file names from the compacted output and
+    the journal. Only the file_name and status fields are streamed from the
+    output file. Images whose latest result is a json_error are left out so
+    they are queued again.
+    """
+    output_path = output_path or output_file
+    statuses = {}
+
+    if Path(output_path).exists():
+        try:
+            with open(output_path, "rb") as f:
+                file_name = status = None
+                for prefix, event, value in ijson.parse(f):
+                    if prefix == "item.file_name":
+                        file_name = value
+                    elif prefix == "item.status":
+                        status = value
+                    elif prefix == "item" and event == "end_map":
+                        statuses[file_name] = status
+                        file_name = status = None
+        except (ijson.JSONError, OSError):
+            pass
+
+    for r in read_journal(journal_path):
+        statuses[r["file_name"]] = r["status"]
+    return {name for name, status in statuses.items() if status != "json_error"}
+
+
+def compact_results(output_path=None, journal_path=None):
+    """
+    Merge the journal into the output JSON and remove the journal.
+    A later entry for the same file replaces an earlier one.
+    """
+    output_path = output_path or output_file
+    journal_path = journal_path or journal_file
+
+    merged = {r["file_name"]: r for r in load_existing_results(output_path)}
+    for r in read_journal(journal_path):
+        merged[r["file_name"]] = r
+    results = list(merged.values())
+
+    # Write to a temp file first so a crash never leaves a half-written output
+    output_dir = Path(output_path).parent
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=output_dir, suffix=".tmp", delete=False
+    ) as f:
         json.dump(results, f, indent=2, ensure_ascii=False)
+    os.replace(f.name, output_path)
+
+    if Path(journal_path).exists():
+        os.remove(journal_path)
+    return results
+
+
+def is_audit_sample(image_path):
+    """Deterministically pick a CASCADE_AUDIT_RATE share of images by name."""
+    digest = hashlib.sha256(image_path.name.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2**32 < CASCADE_AUDIT_RATE
+
+
+def triage_image(image_path, media_parts):
+    """
+    Ask TRIAGE_MODEL whether the image is spam.
+    Returns {"is_spam", "confidence"} or None if the call fails.
+    """
+    try:
+        response, latency, retries = call_model(
+            TRIAGE_MODEL,
+            [build_triage_instructions(), *media_parts],
+            types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=SpamTriage,
+            ),
+        )
+    except Exception as e:
+        log_failed_call(image_path, TRIAGE_MODEL, e, stage="triage")
+        print(f"\n⚠️  Triage failed for {image_path.name}, escalating: {e}")
+        return None
+
+    try:
+        triage = validate_annotation(response.text, schema=SpamTriage)
+        status = "success"
+    except ValueError as e:
+        triage = None
+        status = "invalid_response"
+        print(f"\n⚠️  Invalid triage for {image_path.name}, escalating: {e}")
+
+    write_token_log(
+        build_token_log_entry(
+            image_path,
+            TRIAGE_MODEL,
+            response.usage_metadata,
+            latency,
+            status,
+            retries,
+            stage="triage",
+            few_shot_mode=False,
+        )
+    )
+    return triage
+
+
+def annotate_single_image(
+    image_path,
+    upload_path,
+    mime_type,
+    prefix_contents,
+    output_format_instructions,
+    generate_config,
+    examples_added,
+):
+    """
+    Annotate one image or video and return its result entry. The bytes sent
+    are read from upload_path, which is the preprocessed copy or the keyframe
+    directory when preprocessing is on.
+    When generate_config points at a context cache the few-shot prefix is
+    already stored server-side, so only the target image is sent.
+    With USE_CASCADE, confident spam verdicts from the triage model are
+    returned without calling MODEL.
+    """
+    try:
+        media_parts = load_media_parts(upload_path, mime_type)
+
+        cascade_info = None
+        if USE_CASCADE:
+            triage = triage_image(image_path, media_parts)
+            confident_spam = (
+                triage is not None
+                and triage["is_spam"]
+                and triage["confidence"] >= TRIAGE_CONFIDENCE_THRESHOLD
+            )
+            audit = confident_spam and is_audit_sample(image_path)
+            if confident_spam and not audit:
+                return {
+                    "file_name": image_path.name,
+                    "file_path": str(image_path),
+                    "annotations": {"is_spam": True},
+                    "status": "success",
+                    "cascade": {"stage": "triage", "triage": triage, "audit": False},
+                }
+            cascade_info = {"stage": "full", "triage": triage, "audit": audit}
+
+        target_contents = [output_format_instructions, *media_parts]
+        if generate_config.cached_content:
+            contents = target_contents
+        else:
+            contents = prefix_contents + target_contents
+
+        # Re-ask only when the response fails schema validation
+        log_fields = {
+            "stage": "full",
+            "few_shot_mode": True,
+            "context_cache": bool(generate_config.cached_content),
+            "num_examples": examples_added,
+        }
+        if is_video(image_path):
+            log_fields["num_frames"] = len(media_parts) - 1
+        for attempt in range(1, MAX_VALIDATION_ATTEMPTS + 1):
+            try:
+                response, latency, retries = call_model(
+                    MODEL, contents, generate_config
+                )
+            except Exception as e:
+                log_failed_call(image_path, MODEL, e, attempt=attempt, **log_fields)
+                raise
+
+            response_text = response.text
+            try:
+                annotation_data = validate_annotation(response_text)
+                status = "success"
+            except ValueError as e:
+                validation_error = e
+                status = "invalid_response"
+                print(
+                    f"\n⚠️  Invalid response for {image_path.name} "
+                    f"(attempt {attempt}/{MAX_VALIDATION_ATTEMPTS}): {e}"
+                )
 
+            # Log token usage
+            write_token_log(
+                build_token_log_entry(
+                    image_path,
+                    MODEL,
+                    response.usage_metadata,
+                    latency,
+                    status,
+                    retries,
+                    attempt=attempt,
+                    **log_fields,
+                )
+            )
+            if status == "success":
+                break
+        else:
+            return {
+                "file_name": image_path.name,
+                "file_path": str(image_path),
+                "annotations": None,
+                "status": "json_error",
+                "error": str(validation_error),
+                "raw_response": response_text,
+            }
+
+        result = {
+            "file_name": image_path.name,
+            "file_path": str(image_path),
+            "annotations": annotation_data,
+            "status": "success",
+        }
+        if cascade_info:
+            result["cascade"] = cascade_info
+        return result
+
+    except Exception as e:
+        print(f"\n⚠️  Error processing {image_path.name}: {e}")
+        return {
+            "file_name": image_path.name,
+            "file_path": str(image_path),
+            "annotations": None,
+            "status": "error",
+            "error": str(e),
+        }
+
+
+def compute_prompt_hash(prefix_contents, output_format_instructions):
+    """Version hash of everything besides the target image that shapes a response."""
+    return hash_prompt(
+        prefix_contents + [output_format_instructions],
+        extra=json.dumps(ImageAnnotation.model_json_schema())
+        + (settings_tag() if USE_PREPROCESSING else "raw"),
+    )
 
-def get_processed_files(results):
-    """Get set of already processed file names."""
-    return {r["file_name"] for r in results}
+
+def answer_from_cache(image_paths, response_cache, prompt_hash, journal_path=None):
+    """
+    Journal every image whose response is already cached and return the
+    images that still need an API call together with their content hashes.
+    """
+    misses = []
+    image_hashes = {}
+
+    for image_path in image_paths:
+        try:
+            image_hash = hash_file(image_path)
+        except OSError:
+            misses.append(image_path)
+            continue
+        if is_video(image_path):
+            # Videos are answered from their keyframes, so the settings matter
+            image_hash = f"{image_hash}-{keyframe_settings_tag()}"
+
+        image_hashes[image_path] = image_hash
+        annotations = response_cache.get(image_hash, prompt_hash, MODEL)
+        if annotations is None:
+            misses.append(image_path)
+            continue
+
+        append_result(
+            {
+                "file_name": image_path.name,
+                "file_path": str(image_path),
+                "annotations": annotations,
+                "status": "success",
+                "cached": True,
+            },
+            journal_path,
+        )
+
+    return misses, image_hashes
 
 
 def annotate_images():
-    """Main annotation function with few-shot prompting and incremental saving."""
+    """Main annotation function with few-shot prompting and a per-result journal."""
 
-    # Load existing results if resuming
-    results = load_existing_results()
-    processed_files = get_processed_files(results)
+    # Resume from the compacted output and any journal left by a crashed run
+    repair_journal()
+    processed_files = load_processed_ids()
 
-    if results:
-        print(f"Resuming from previous run. Already processed: {len(results)} images\n")
+    if processed_files:
+        print(
+            f"Resuming from previous run. Already processed: {len(processed_files)} images\n"
+        )
 
-    image_paths = (
-        list(image_folder.glob("*.png"))
-        + list(image_folder.glob("*.jpg"))
-        + list(image_folder.glob("*.jpeg"))
-    )
+    image_paths = list_images(image_folder)
 
     # Filter out already processed images
     image_paths = [p for p in image_paths if p.name not in processed_files]
 
-    # Count available examples
-    available_examples = 0
-    for example in FEW_SHOT_EXAMPLES:
-        example_path = examples_folder / example["image_file"]
-        if example_path.exists():
-            available_examples += 1
+    # Build the few-shot prefix once and reuse it for every image
+    prefix_contents, examples_added = build_few_shot_prefix()
+    output_format_instructions = build_output_format_instructions()
+
+    print(f"Found {examples_added} out of {len(FEW_SHOT_EXAMPLES)} example images")
+
+    response_cache = ResponseCache() if USE_RESPONSE_CACHE else None
+    image_hashes = {}
+    if response_cache:
+        prompt_hash = compute_prompt_hash(prefix_contents, output_format_instructions)
+        remaining, image_hashes = answer_from_cache(
+            image_paths, response_cache, prompt_hash
+        )
+        print(f"Answered {len(image_paths) - len(remaining)} images from cache")
+        image_paths = remaining
 
-    print(f"Found {available_examples} out of {len(FEW_SHOT_EXAMPLES)} example images")
     print(f"Processing {len(image_paths)} remaining images\n")
 
     if not image_paths:
         print("No new images to process!")
+        if response_cache:
+            response_cache.close()
+        compact_results()
         return
 
-    for idx, image_path in enumerate(tqdm(image_paths, desc="Annotating images"), 1):
-        mime_type = "image/png" if image_path.suffix.lower() == ".png" else "image/jpeg"
-
-        try:
-            with open(image_path, "rb") as f:
-                image_bytes = f.read()
-
-            # Build interleaved content with examples
-            contents = [build_base_instructions()]
-
-            # Add few-shot examples with their annotations
-            examples_added = 0
-            for i, example in enumerate(FEW_SHOT_EXAMPLES, 1):
-                example_path = examples_folder / example["image_file"]
-                if not example_path.exists():
-                    continue
-
-                try:
-                    with open(example_path, "rb") as f:
-                        ex_bytes = f.read()
-                    ex_mime = (
-                        "image/png"
-                        if example_path.suffix.lower() == ".png"
-                        else "image/jpeg"
-                    )
-
-                    # Add example with clear labeling
-                    contents.append(f"\n\nEXAMPLE {i}:")
-                    contents.append(
-                        types.Part.from_bytes(data=ex_bytes, mime_type=ex_mime)
-                    )
-                    contents.append(
-                        f"\nExpected JSON output:\n{json.dumps(example['annotation'], indent=2)}"
-                    )
-                    examples_added += 1
-                except Exception as e:
-                    print(f"\n⚠️  Error loading example {example_path}: {e}")
-                    continue
-
-            # Add output format instructions and target image
-            contents.append(build_output_format_instructions())
-            contents.append(
-                types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
-            )
+    cache = create_context_cache(prefix_contents) if USE_CONTEXT_CACHE else None
+    if cache:
+        print(f"Using context cache {cache.name}\n")
+    generate_config = types.GenerateContentConfig(
+        cached_content=cache.name if cache else None,
+        response_mime_type="application/json",
+        response_schema=ImageAnnotation,
+    )
 
-            # Make API call
-            response = client.models.generate_content(
-                model=MODEL,
-                contents=contents,
+    try:
+        upload_images = iter_upload_images(image_paths)
+        for idx, (image_path, upload_path, mime_type) in enumerate(
+            tqdm(upload_images, total=len(image_paths), desc="Annotating images"), 1
+        ):
+            result = annotate_single_image(
+                image_path,
+                upload_path,
+                mime_type,
+                prefix_contents,
+                output_format_instructions,
+                generate_config,
+                examples_added,
             )
-
-            response_text = response.text.strip()
-
-            # Clean markdown code blocks
-            if response_text.startswith("```json"):
-                response_text = (
-                    response_text.split("```json")[1].split("```")[0].strip()
+            append_result(result)
+
+            image_hash = image_hashes.get(image_path)
+            full_answer = result.get("cascade", {}).get("stage") != "triage"
+            if (
+                response_cache
+                and image_hash
+                and result["status"] == "success"
+                and full_answer
+            ):
+                response_cache.put(
+                    image_hash, prompt_hash, MODEL, result["annotations"]
                 )
-            elif response_text.startswith("```"):
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-
-            annotation_data = json.loads(response_text)
-
-            results.append(
-                {
-                    "file_name": image_path.name,
-                    "file_path": str(image_path),
-                    "annotations": annotation_data,
-                    "status": "success",
-                }
-            )
-
-            # Log token usage
-            usage = response.usage_metadata
-            timestamp_utc = datetime.now(timezone.utc).isoformat()
-
-            token_log_entry = {
-                "timestamp_utc": timestamp_utc,
-                "file_name": image_path.name,
-                "model": MODEL,
-                "prompt_tokens": usage.prompt_token_count,
-                "output_tokens": usage.candidates_token_count,
-                "total_tokens": usage.total_token_count,
-                "prompt_tokens_text": next(
-                    (
-                        d.token_count
-                        for d in usage.prompt_tokens_details
-                        if d.modality.name == "TEXT"
-                    ),
-                    None,
-                ),
-                "prompt_tokens_image": next(
-                    (
-                        d.token_count
-                        for d in usage.prompt_tokens_details
-                        if d.modality.name == "IMAGE"
-                    ),
-                    None,
-                ),
-                "few_shot_mode": True,
-                "num_examples": examples_added,
-            }
-
-            with open(token_log_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(token_log_entry) + "\n")
-
-        except json.JSONDecodeError as e:
-            results.append(
-                {
-                    "file_name": image_path.name,
-                    "file_path": str(image_path),
-                    "annotations": None,
-                    "status": "json_error",
-                    "error": str(e),
-                    "raw_response": response_text
-                    if "response_text" in locals()
-                    else None,
-                }
-            )
-            print(f"\n⚠️  JSON error for {image_path.name}: {e}")
-
-        except Exception as e:
-            results.append(
-                {
-                    "file_name": image_path.name,
-                    "file_path": str(image_path),
-                    "annotations": None,
-                    "status": "error",
-                    "error": str(e),
-                }
-            )
-            print(f"\n⚠️  Error processing {image_path.name}: {e}")
 
-        # Save results every SAVE_INTERVAL images
-        if idx % SAVE_INTERVAL == 0:
-            save_results(results)
-            print(f"\nProgress saved: {len(results)} images processed")
+            if cache and idx % CACHE_REFRESH_INTERVAL == 0:
+                refresh_context_cache(cache)
+    finally:
+        if cache:
+            delete_context_cache(cache)
+        if response_cache:
+            response_cache.close()
 
-    # Final save
-    save_results(results)
+    # Fold the journal into the final JSON
+    results = compact_results()
 
     # Print summary
     successful = sum(1 for r in results if r["status"] == "success")
@@ -0,0 +1,227 @@
+"""
+Corpus-wide few-shot classification across every hashtag folder.
+Discovers each keyword folder under INSTAGRAM_ROOT and classifies all of them
+through one request scheduler and one token budget, writing per-keyword
+outputs with a single global progress bar and ETA.
+"""
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+
+import classify
+from classify import (
+    CACHE_REFRESH_INTERVAL,
+    FEW_SHOT_EXAMPLES,
+    MODEL,
+    USE_CONTEXT_CACHE,
+    USE_RESPONSE_CACHE,
+    ImageAnnotation,
+    annotate_single_image,
+    answer_from_cache,
+    append_result,
+    build_few_shot_prefix,
+    build_output_format_instructions,
+    compact_results,
+    compute_prompt_hash,
+    create_context_cache,
+    delete_context_cache,
+    iter_upload_images,
+    list_images,
+    load_processed_ids,
+    refresh_context_cache,
+    repair_journal,
+    token_log_file,
+)
+from google.genai import types
+from request_scheduler import RequestScheduler
+from response_cache import ResponseCache
+from tqdm import tqdm
+
+# Configuration
+INSTAGRAM_ROOT = Path("/path/to/instagram posts downloaded")
+OUTPUT_DIR = Path("/path/to/output annotations")
+MAX_CONCURRENT_REQUESTS = 8
+REQUESTS_PER_MINUTE = 150
+TOKENS_PER_MINUTE = 2_000_000
+TOKEN_BUDGET = None  # Stop scheduling new images once this many tokens are used
+
+
+def discover_keywords(root):
+    """Keyword folders under root that contain at least one image."""
+    return sorted(
+        folder.name
+        for folder in root.iterdir()
+        if folder.is_dir() and list_images(folder)
+    )
+
+
+def output_paths(keyword):
+    """Per-keyword output JSON and journal paths."""
+    return OUTPUT_DIR / f"{keyword}.json", OUTPUT_DIR / f"{keyword}.ndjson"
+
+
+def collect_pending(keywords, response_cache, prompt_hash):
+    """
+    Remaining images per keyword after resume and response-cache lookups.
+    Returns a flat list of (keyword, image_path) and the image hashes.
+    """
+    pending = []
+    image_hashes = {}
+
+    for keyword in keywords:
+        output_path, journal_path = output_paths(keyword)
+        repair_journal(journal_path)
+        processed_files = load_processed_ids(output_path, journal_path)
+        image_paths = [
+            p
+            for p in list_images(INSTAGRAM_ROOT / keyword)
+            if p.name not in processed_files
+        ]
+
+        if response_cache:
+            remaining, hashes = answer_from_cache(
+                image_paths, response_cache, prompt_hash, journal_path
+            )
+            image_hashes.update(hashes)
+            cached = len(image_paths) - len(remaining)
+            image_paths = remaining
+        else:
+            cached = 0
+
+        print(
+            f"  {keyword}: {len(processed_files)} done, {cached} from cache, "
+            f"{len(image_paths)} to classify"
+        )
+        pending.extend((keyword, p) for p in image_paths)
+
+    return pending, image_hashes
+
+
+def classify_corpus():
+    """Classify every keyword folder through one shared scheduler."""
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    keywords = discover_keywords(INSTAGRAM_ROOT)
+    print(f"Found {len(keywords)} keyword folders in {INSTAGRAM_ROOT}")
+
+    prefix_contents, examples_added = build_few_shot_prefix()
+    output_format_instructions = build_output_format_instructions()
+    print(f"Found {examples_added} out of {len(FEW_SHOT_EXAMPLES)} example images\n")
+
+    response_cache = ResponseCache() if USE_RESPONSE_CACHE else None
+    prompt_hash = compute_prompt_hash(prefix_contents, output_format_instructions)
+    pending, image_hashes = collect_pending(keywords, response_cache, prompt_hash)
+    print(f"\nProcessing {len(pending)} remaining images\n")
+
+    cache = None
+    if pending:
+        cache = create_context_cache(prefix_contents) if USE_CONTEXT_CACHE else None
+    generate_config = types.GenerateContentConfig(
+        cached_content=cache.name if cache else None,
+        response_mime_type="application/json",
+        response_schema=ImageAnnotation,
+    )
+
+    classify.scheduler = RequestScheduler(
+        REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, TOKEN_BUDGET
+    )
+    journal_lock = threading.Lock()
+    progress_lock = threading.Lock()
+    done_per_keyword = {keyword: 0 for keyword in keywords}
+    failed_per_keyword = {keyword: 0 for keyword in keywords}
+
+    def run_one(keyword, image_path, upload_path, mime_type):
+        result = annotate_single_image(
+            image_path,
+            upload_path,
+            mime_type,
+            prefix_contents,
+            output_format_instructions,
+            generate_config,
+            examples_added,
+        )
+        result["keyword"] = keyword
+        with journal_lock:
+            append_result(result, output_paths(keyword)[1])
+
+        image_hash = image_hashes.get(image_path)
+        full_answer = result.get("cascade", {}).get("stage") != "triage"
+        if (
+            response_cache
+            and image_hash
+            and result["status"] == "success"
+            and full_answer
+        ):
+            response_cache.put(image_hash, prompt_hash, MODEL, result["annotations"])
+        return keyword
+
+    def on_done(keyword, image_path, future):
+        # Exceptions raised in a done-callback are only logged by the executor,
+        # so a failed image is reported here. It has no journal entry and is
+        # queued again on the next run.
+        error = future.exception()
+        with progress_lock:
+            if error is None:
+                done_per_keyword[keyword] += 1
+            else:
+                failed_per_keyword[keyword] += 1
+                print(f"\n⚠️  Error processing {keyword}/{image_path.name}: {error!r}")
+            pbar.update(1)
+            pbar.set_postfix_str(f"last: {keyword}")
+            completed = pbar.n
+        if cache and completed % CACHE_REFRESH_INTERVAL == 0:
+            refresh_context_cache(cache)
+
+    keyword_by_path = {image_path: keyword for keyword, image_path in pending}
+    upload_images = iter_upload_images([image_path for _, image_path in pending])
+
+    pbar = tqdm(total=len(pending), desc="Annotating corpus", unit="img")
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+            in_flight = set()
+            for image_path, upload_path, mime_type in upload_images:
+                if classify.scheduler.budget_exhausted:
+                    print("\nToken budget exhausted, not scheduling more images")
+                    break
+
+                # Keep a bounded queue so the budget check stays current
+                if len(in_flight) >= MAX_CONCURRENT_REQUESTS * 2:
+                    _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                keyword = keyword_by_path[image_path]
+                future = executor.submit(
+                    run_one, keyword, image_path, upload_path, mime_type
+                )
+                future.add_done_callback(partial(on_done, keyword, image_path))
+                in_flight.add(future)
+
+            wait(in_flight)
+    finally:
+        upload_images.close()
+        pbar.close()
+        classify.scheduler = None
+        if cache:
+            delete_context_cache(cache)
+        if response_cache:
+            response_cache.close()
+
+    # Fold every keyword journal into its output JSON
+    print(f"\n{'=' * 50}")
+    print("Summary:")
+    for keyword in keywords:
+        results = compact_results(*output_paths(keyword))
+        successful = sum(1 for r in results if r["status"] == "success")
+        failed = failed_per_keyword[keyword]
+        print(
+            f"  {keyword}: {len(results)} images, {successful} successful, "
+            f"{done_per_keyword[keyword]} classified this run"
+            + (f", {failed} failed (retried on the next run)" if failed else "")
+        )
+    print(f"✓ Annotations saved to {OUTPUT_DIR}")
+    print(f"✓ Token logs saved to {token_log_file}")
+    print(f"{'=' * 50}")
+
+
+if __name__ == "__main__":
+    classify_corpus()
@@ -0,0 +1,133 @@
+"""
+Image preprocessing before Gemini upload.
+Decodes each image, downscales it to the model's effective input resolution,
+re-encodes it and caches the result by content hash, using a worker pool so
+preprocessing runs ahead of the API calls.
+"""
+
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Configuration
+PREPROCESS_CACHE_DIR = Path("preprocessed_cache")
+# Gemini tiles images into 768x768 crops of 258 tokens each, so anything larger
+# than one tile only costs more tokens without adding usable detail.
+MAX_IMAGE_SIDE = 768
+OUTPUT_FORMAT = "JPEG"  # "JPEG" or "WEBP"
+OUTPUT_QUALITY = 85
+PREPROCESS_WORKERS = os.cpu_count() or 1
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp"}
+
+
+def sniff_mime_type(data):
+    """Detect the image mime type from its magic bytes rather than the suffix."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "image/jpeg"
+
+
+def settings_tag():
+    """Short tag of the preprocessing settings, part of every cache key."""
+    return f"{MAX_IMAGE_SIDE}-{OUTPUT_FORMAT.lower()}-q{OUTPUT_QUALITY}"
+
+
+def cache_path_for(data):
+    """Cache file for the given raw image bytes under the current settings."""
+    digest = hashlib.sha256(data).hexdigest()
+    return (
+        PREPROCESS_CACHE_DIR / f"{digest}-{settings_tag()}{EXTENSIONS[OUTPUT_FORMAT]}"
+    )
+
+
+def preprocess_image_bytes(data):
+    """Resize and re-encode raw image bytes. Returns the encoded bytes."""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+
+        # Flatten transparency on white, JPEG has no alpha channel
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        img.save(buffer, format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY)
+        return buffer.getvalue()
+
+
+def preprocess_to_cache(image_path):
+    """
+    Preprocess one image into the cache and return (cache path, mime type).
+    Falls back to the original file if the image cannot be decoded.
+    """
+    try:
+        with open(image_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        # Let the caller surface the read error for this image
+        return str(image_path), "image/jpeg"
+
+    cache_path = cache_path_for(data)
+    if cache_path.exists():
+        return str(cache_path), MIME_TYPES[OUTPUT_FORMAT]
+
+    try:
+        processed = preprocess_image_bytes(data)
+    except (OSError, UnidentifiedImageError):
+        return str(image_path), sniff_mime_type(data)
+
+    # Keep the original if re-encoding would not make it smaller
+    if len(processed) >= len(data):
+        return str(image_path), sniff_mime_type(data)
+
+    PREPROCESS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(processed)
+    os.replace(tmp_path, cache_path)
+    return str(cache_path), MIME_TYPES[OUTPUT_FORMAT]
+
+
+def load_image(image_path):
+    """Preprocess a single image in-process and return (bytes, mime type)."""
+    path, mime_type = preprocess_to_cache(image_path)
+    with open(path, "rb") as f:
+        return f.read(), mime_type
+
+
+def preprocess_images(image_paths, workers=None, prepare=preprocess_to_cache):
+    """
+    Yield (image_path, upload path, mime type) in input order while a process
+    pool preprocesses the following images. Only paths cross process
+    boundaries, so memory stays bounded even when the pool runs far ahead.
+    prepare is the picklable per-file function run in the pool.
+    """
+    workers = workers or PREPROCESS_WORKERS
+    PREPROCESS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        processed = executor.map(prepare, image_paths, chunksize=4)
+        for image_path, (path, mime_type) in zip(image_paths, processed):
+            yield image_path, Path(path), mime_type
+    finally:
+        # Drop queued work if the consumer stops early
+        executor.shutdown(wait=True, cancel_futures=True)
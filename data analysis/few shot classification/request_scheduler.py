@@ -0,0 +1,67 @@
+"""
+Shared request scheduler for Gemini calls made from several worker threads.
+Keeps requests and tokens inside a sliding one-minute window and tracks a
+total token budget for the whole run.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class RequestScheduler:
+    """Sliding-window rate limiter for requests per minute and tokens per minute."""
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None, token_budget=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.token_budget = token_budget
+        self.lock = threading.Lock()
+        self.window = deque()  # [timestamp, tokens] per request
+        self.tokens_used = 0
+        self.requests_made = 0
+
+    def _estimated_tokens(self):
+        """Average tokens per request so far, used to reserve capacity up front."""
+        return self.tokens_used / self.requests_made if self.requests_made else 0
+
+    def _prune(self, now):
+        while self.window and now - self.window[0][0] >= self.WINDOW_SECONDS:
+            self.window.popleft()
+
+    def acquire(self):
+        """Block until a request fits in the window. Returns a ticket for record()."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._prune(now)
+                window_tokens = sum(tokens for _, tokens in self.window)
+                fits_requests = len(self.window) < self.requests_per_minute
+                fits_tokens = (
+                    self.tokens_per_minute is None
+                    or not self.window
+                    or window_tokens + self._estimated_tokens()
+                    <= self.tokens_per_minute
+                )
+                if fits_requests and fits_tokens:
+                    ticket = [now, self._estimated_tokens()]
+                    self.window.append(ticket)
+                    return ticket
+                wait = self.WINDOW_SECONDS - (now - self.window[0][0])
+            time.sleep(max(wait, 0.05))
+
+    def record(self, ticket, tokens):
+        """Replace the reserved estimate of a request with its actual token count."""
+        with self.lock:
+            ticket[1] = tokens
+            self.tokens_used += tokens
+            self.requests_made += 1
+
+    @property
+    def budget_exhausted(self):
+        with self.lock:
+            return (
+                self.token_budget is not None and self.tokens_used >= self.token_budget
+            )
@@ -0,0 +1,92 @@
+"""
+Persistent memoization cache for Gemini classifications.
+Responses are keyed by (image content hash, prompt version hash, model), so the
+same image re-posted under another hashtag or re-classified in a later run is
+answered locally. Changing the prompt, the few-shot examples or the model only
+misses for the affected key; older entries stay valid for their own key.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# Configuration
+RESPONSE_CACHE_FILE = "gemini_response_cache.sqlite"
+
+
+def hash_file(path):
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_prompt(contents, extra=""):
+    """
+    Version hash of a prompt: the text items and the bytes of every inline
+    image part, plus any extra settings that change what the model sees.
+    """
+    digest = hashlib.sha256()
+    for item in contents:
+        if isinstance(item, str):
+            digest.update(b"text:" + item.encode("utf-8"))
+        else:
+            digest.update(b"image:" + item.inline_data.mime_type.encode("utf-8"))
+            digest.update(hashlib.sha256(item.inline_data.data).digest())
+    digest.update(b"extra:" + extra.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed store of parsed annotations, safe to share between threads."""
+
+    def __init__(self, path=RESPONSE_CACHE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                image_hash TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                annotations TEXT NOT NULL,
+                created_utc TEXT NOT NULL,
+                PRIMARY KEY (image_hash, prompt_hash, model)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, image_hash, prompt_hash, model):
+        """Return the cached annotations, or None on a miss."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT annotations FROM responses "
+                "WHERE image_hash = ? AND prompt_hash = ? AND model = ?",
+                (image_hash, prompt_hash, model),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, image_hash, prompt_hash, model, annotations):
+        """Store the annotations of a successful call."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (
+                    image_hash,
+                    prompt_hash,
+                    model,
+                    json.dumps(annotations, ensure_ascii=False),
+                    datetime.now(timezone.utc).isoformat(),
+                ),
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,147 @@
+"""
+Batch mode end to end against LocalBatchClient: submit, poll and ingest,
+including resuming a job whose results were only partly ingested.
+
+Usage:
+    python -m pytest test_batch_classify.py
+"""
+
+import base64
+import hashlib
+import json
+import os
+
+import batch_classify
+import classify
+import pytest
+from PIL import Image
+
+IMAGES = {
+    "spam-1.png": (255, 0, 0),
+    "ad-2.png": (0, 255, 0),
+    "ad-3.png": (0, 0, 255),
+    "broken-4.png": (255, 255, 0),
+}
+
+
+def non_spam_annotation(file_name):
+    return {
+        "is_spam": False,
+        "ad_category": ["Casino Games"],
+        "app_name": [],
+        "primary_messaging_strategy": ["User Acquisition"],
+        "potentially_harmful_narratives": ["Easy Money Narrative"],
+        "media_authenticity": ["Authentic"],
+        "sexual_content": "no",
+        "ad_notes": file_name,
+    }
+
+
+@pytest.fixture
+def batch_env(tmp_path, monkeypatch):
+    """Keyword folder of solid-colour images with all outputs under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    image_folder = tmp_path / "images"
+    examples_folder = tmp_path / "examples"
+    image_folder.mkdir()
+    examples_folder.mkdir()
+    image_names = {}  # sha256 of the uploaded bytes -> file name
+    for file_name, colour in IMAGES.items():
+        path = image_folder / file_name
+        Image.new("RGB", (8, 8), colour).save(path)
+        image_names[hashlib.sha256(path.read_bytes()).hexdigest()] = file_name
+    example = classify.FEW_SHOT_EXAMPLES[0]["image_file"]
+    Image.new("RGB", (8, 8), (0, 0, 0)).save(examples_folder / example)
+
+    monkeypatch.setattr(classify, "USE_PREPROCESSING", False)
+    monkeypatch.setattr(classify, "examples_folder", examples_folder)
+    monkeypatch.setattr(classify, "output_file", str(tmp_path / "results.json"))
+    monkeypatch.setattr(classify, "journal_file", str(tmp_path / "results.ndjson"))
+    monkeypatch.setattr(classify, "token_log_file", str(tmp_path / "tokens.jsonl"))
+    batch_dir = tmp_path / "batch_jobs"
+    monkeypatch.setattr(batch_classify, "batch_dir", batch_dir)
+    monkeypatch.setattr(batch_classify, "requests_file", batch_dir / "requests.jsonl")
+    monkeypatch.setattr(batch_classify, "state_file", batch_dir / "state.json")
+    monkeypatch.setattr(batch_classify, "image_folder", image_folder)
+    monkeypatch.setattr(batch_classify, "output_file", classify.output_file)
+
+    requests = []
+
+    def responder(request):
+        """Answer by the image in the request, so answers can be traced to keys."""
+        requests.append(request)
+        parts = request["contents"][0]["parts"]
+        image = base64.b64decode(parts[-1]["inline_data"]["data"])
+        file_name = image_names[hashlib.sha256(image).hexdigest()]
+        if file_name.startswith("spam"):
+            return '{"is_spam": true}'
+        if file_name.startswith("broken"):
+            return "not json"
+        return json.dumps(non_spam_annotation(file_name))
+
+    client = batch_classify.LocalBatchClient(batch_dir, responder)
+    return client, requests
+
+
+def read_output():
+    with open(classify.output_file, "r", encoding="utf-8") as f:
+        return {result["file_name"]: result for result in json.load(f)}
+
+
+def check_results(results):
+    assert set(results) == set(IMAGES)
+    assert results["spam-1.png"]["status"] == "success"
+    assert results["spam-1.png"]["annotations"] == {"is_spam": True}
+    for file_name in ("ad-2.png", "ad-3.png"):
+        assert results[file_name]["status"] == "success"
+        assert results[file_name]["annotations"] == non_spam_annotation(file_name)
+    assert results["broken-4.png"]["status"] == "json_error"
+    assert results["broken-4.png"]["raw_response"] == "not json"
+
+
+def test_submit_poll_ingest(batch_env):
+    client, requests = batch_env
+    batch_classify.run_batch(client)
+
+    check_results(read_output())
+    assert batch_classify.load_state()["status"] == "ingested"
+    assert not os.path.exists(classify.journal_file)
+
+    # Every request carries the shared prefix, one example and its own image
+    assert len(requests) == len(IMAGES)
+    for request in requests:
+        parts = request["contents"][0]["parts"]
+        assert parts[0]["text"] == classify.build_base_instructions()
+        assert sum("inline_data" in part for part in parts) == 2
+    assert (
+        request["generation_config"]["response_json_schema"]
+        == classify.ImageAnnotation.model_json_schema()
+    )
+
+
+def test_resume_after_partial_ingest(batch_env, monkeypatch):
+    client, requests = batch_env
+    append_result = batch_classify.append_result
+    appended = []
+
+    def crash_after_two(result):
+        if len(appended) == 2:
+            raise KeyboardInterrupt
+        append_result(result)
+        appended.append(result["file_name"])
+
+    monkeypatch.setattr(batch_classify, "append_result", crash_after_two)
+    with pytest.raises(KeyboardInterrupt):
+        batch_classify.run_batch(client)
+    assert batch_classify.load_state()["status"] == "submitted"
+    # json_error results are not counted as processed, so they are retried
+    assert classify.load_processed_ids() == set(appended) - {"broken-4.png"}
+
+    # The rerun resumes the tracked job instead of submitting a new one
+    monkeypatch.setattr(batch_classify, "append_result", append_result)
+    batch_classify.run_batch(client)
+
+    assert len(client.jobs) == 1
+    assert len(requests) == len(IMAGES)
+    check_results(read_output())
+    assert batch_classify.load_state()["status"] == "ingested"
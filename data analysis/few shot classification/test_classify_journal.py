@@ -0,0 +1,65 @@
+"""
+Result journal: repairing a line truncated by a crash, re-queueing json_error
+images on resume and compacting the journal into the output JSON.
+
+Usage:
+    python -m pytest test_classify_journal.py
+"""
+
+import json
+
+import classify
+import pytest
+
+
+def result(file_name, status="success"):
+    return {"file_name": file_name, "status": status, "annotations": {}}
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "results.json"), str(tmp_path / "results.ndjson")
+
+
+def test_truncated_last_line_is_repaired(paths):
+    output_path, journal_path = paths
+    classify.append_result(result("a.png"), journal_path)
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"file_name": "b.png", "sta')  # Crash mid-write
+
+    assert [r["file_name"] for r in classify.read_journal(journal_path)] == ["a.png"]
+    classify.repair_journal(journal_path)
+    classify.append_result(result("c.png"), journal_path)
+
+    with open(journal_path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert [json.loads(line)["file_name"] for line in lines] == ["a.png", "c.png"]
+    assert classify.load_processed_ids(output_path, journal_path) == {"a.png", "c.png"}
+
+
+def test_json_error_is_requeued(paths):
+    output_path, journal_path = paths
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump([result("a.png"), result("b.png", "json_error")], f)
+    classify.append_result(result("c.png", "json_error"), journal_path)
+    assert classify.load_processed_ids(output_path, journal_path) == {"a.png"}
+
+    # A later success in the journal replaces the earlier json_error
+    classify.append_result(result("b.png"), journal_path)
+    assert classify.load_processed_ids(output_path, journal_path) == {"a.png", "b.png"}
+
+
+def test_compact_merges_journal(paths):
+    output_path, journal_path = paths
+    classify.append_result(result("a.png", "json_error"), journal_path)
+    classify.append_result(result("b.png"), journal_path)
+    classify.append_result(result("a.png"), journal_path)
+
+    results = classify.compact_results(output_path, journal_path)
+    assert {r["file_name"]: r["status"] for r in results} == {
+        "a.png": "success",
+        "b.png": "success",
+    }
+    with open(output_path, "r", encoding="utf-8") as f:
+        assert json.load(f) == results
+    assert list(classify.read_journal(journal_path)) == []
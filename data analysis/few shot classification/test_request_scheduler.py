@@ -0,0 +1,66 @@
+"""
+Request scheduler: acquire() blocks once the one-minute window is full of
+requests or tokens, and the token budget is tracked across calls. Runs
+against a fake clock, so no test actually sleeps.
+
+Usage:
+    python -m pytest test_request_scheduler.py
+"""
+
+from types import SimpleNamespace
+
+import pytest
+import request_scheduler
+from request_scheduler import RequestScheduler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic clock that only moves when the scheduler sleeps."""
+    clock = SimpleNamespace(now=0.0, sleeps=[])
+
+    def sleep(seconds):
+        clock.sleeps.append(seconds)
+        clock.now += seconds
+
+    fake_time = SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep)
+    monkeypatch.setattr(request_scheduler, "time", fake_time)
+    return clock
+
+
+def test_blocks_when_request_window_is_full(clock):
+    scheduler = RequestScheduler(requests_per_minute=2)
+    for _ in range(2):
+        scheduler.record(scheduler.acquire(), 100)
+    assert clock.sleeps == []
+
+    clock.now = 15.0
+    scheduler.record(scheduler.acquire(), 100)
+    # Waits until the first request leaves the window, 60s after it was made
+    assert clock.now == pytest.approx(60.0)
+    assert sum(clock.sleeps) == pytest.approx(45.0)
+
+
+def test_blocks_when_token_window_is_full(clock):
+    scheduler = RequestScheduler(requests_per_minute=100, tokens_per_minute=1000)
+    scheduler.record(scheduler.acquire(), 600)
+    clock.now = 10.0
+    # 600 tokens used plus an expected 600 for the next call exceeds the limit
+    scheduler.record(scheduler.acquire(), 600)
+    assert clock.now == pytest.approx(60.0)
+
+
+def test_first_request_is_never_blocked_by_tokens(clock):
+    scheduler = RequestScheduler(requests_per_minute=10, tokens_per_minute=100)
+    scheduler.record(scheduler.acquire(), 5000)
+    clock.now = 60.0
+    scheduler.record(scheduler.acquire(), 5000)
+    assert clock.sleeps == []
+
+
+def test_token_budget(clock):
+    scheduler = RequestScheduler(requests_per_minute=10, token_budget=1000)
+    scheduler.record(scheduler.acquire(), 600)
+    assert not scheduler.budget_exhausted
+    scheduler.record(scheduler.acquire(), 400)
+    assert scheduler.budget_exhausted
@@ -0,0 +1,65 @@
+"""
+Response cache: a hit needs the same image content, prompt version and model,
+and entries survive reopening the cache file.
+
+Usage:
+    python -m pytest test_response_cache.py
+"""
+
+import pytest
+from google.genai import types
+from response_cache import ResponseCache, hash_file, hash_prompt
+
+ANNOTATIONS = {"is_spam": False, "app_name": ["1xBet"], "sexual_content": "no"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    yield cache
+    cache.close()
+
+
+def test_hit_needs_image_prompt_and_model(cache):
+    cache.put("image", "prompt", "gemini-2.5-pro", ANNOTATIONS)
+    assert cache.get("image", "prompt", "gemini-2.5-pro") == ANNOTATIONS
+    assert cache.get("other image", "prompt", "gemini-2.5-pro") is None
+    assert cache.get("image", "other prompt", "gemini-2.5-pro") is None
+    assert cache.get("image", "prompt", "gemini-2.5-flash") is None
+
+
+def test_entries_persist(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    cache.put("image", "prompt", "gemini-2.5-pro", ANNOTATIONS)
+    cache.close()
+
+    cache = ResponseCache(path)
+    assert cache.get("image", "prompt", "gemini-2.5-pro") == ANNOTATIONS
+    cache.close()
+
+
+def test_image_hash_is_by_content(tmp_path):
+    original = tmp_path / "post-1.png"
+    repost = tmp_path / "post-2.png"
+    edited = tmp_path / "post-3.png"
+    original.write_bytes(b"\x89PNG same bytes")
+    repost.write_bytes(b"\x89PNG same bytes")
+    edited.write_bytes(b"\x89PNG other bytes")
+    assert hash_file(original) == hash_file(repost)
+    assert hash_file(original) != hash_file(edited)
+
+
+def test_prompt_hash_tracks_text_examples_and_settings():
+    example = types.Part.from_bytes(data=b"example", mime_type="image/png")
+    contents = ["instructions", example, "Expected annotation: {}"]
+    prompt_hash = hash_prompt(contents, extra="max_side=1024")
+
+    assert hash_prompt(list(contents), extra="max_side=1024") == prompt_hash
+    assert hash_prompt(["changed", *contents[1:]], "max_side=1024") != prompt_hash
+    other_example = types.Part.from_bytes(data=b"other", mime_type="image/png")
+    assert (
+        hash_prompt([contents[0], other_example, contents[2]], "max_side=1024")
+        != prompt_hash
+    )
+    assert hash_prompt(contents, extra="max_side=768") != prompt_hash
@@ -0,0 +1,159 @@
+"""
+Token, latency and cost analytics over gemini_token_log.jsonl.
+Streams the log once and reports throughput, latency percentiles, tokens per
+image by modality and projected cost per keyword, so the effect of prompt or
+few-shot changes can be measured.
+
+Usage:
+    python token_analytics.py [--log gemini_token_log.jsonl] [--since 2025-11-01]
+                              [--model gemini-2.5-pro] [--images-root /path/to/posts]
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from classify import estimate_cost, list_images, token_log_file
+
+IDLE_GAP_SECONDS = 300  # Gaps longer than this between calls count as idle time
+TOKEN_FIELDS = [
+    "prompt_tokens_text",
+    "prompt_tokens_image",
+    "cached_tokens",
+    "output_tokens",
+    "thoughts_tokens",
+]
+
+
+def stream_entries(log_path, since=None, model=None):
+    """Yield token log entries one line at a time, applying the filters."""
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if model and entry.get("model") != model:
+                continue
+            if since and entry.get("timestamp_utc", "") < since:
+                continue
+            yield entry
+
+
+def analyze(entries):
+    """Aggregate the entries into per-model and per-keyword statistics."""
+    stats = {
+        "calls": 0,
+        "status": defaultdict(int),
+        "retries": 0,
+        "latencies": defaultdict(list),
+        "images": set(),
+        "image_tokens": defaultdict(lambda: defaultdict(int)),
+        "keyword_images": defaultdict(set),
+        "keyword_cost": defaultdict(float),
+        "active_seconds": 0.0,
+    }
+    previous = None
+
+    for entry in entries:
+        stats["calls"] += 1
+        status = entry.get("status", "success")
+        stats["status"][status] += 1
+        stats["retries"] += entry.get("retries") or 0
+
+        timestamp = datetime.fromisoformat(entry["timestamp_utc"])
+        if previous is not None:
+            gap = (timestamp - previous).total_seconds()
+            if 0 < gap <= IDLE_GAP_SECONDS:
+                stats["active_seconds"] += gap
+        previous = timestamp
+
+        key = f"{entry.get('model')} [{entry.get('stage', 'full')}]"
+        if entry.get("latency_seconds") is not None and status != "error":
+            stats["latencies"][key].append(entry["latency_seconds"])
+
+        file_name = entry.get("file_name")
+        keyword = entry.get("keyword", "unknown")
+        if status == "success":
+            stats["images"].add((keyword, file_name))
+            stats["keyword_images"][keyword].add(file_name)
+        for field in TOKEN_FIELDS:
+            stats["image_tokens"][(keyword, file_name)][field] += entry.get(field) or 0
+        stats["keyword_cost"][keyword] += estimate_cost(entry) or 0.0
+
+    return stats
+
+
+def print_report(stats, images_root=None):
+    """Print the aggregated statistics."""
+    print(f"\n{'=' * 50}")
+    print(f"Calls: {stats['calls']}")
+    for status, count in sorted(stats["status"].items()):
+        print(f"  {status}: {count}")
+    print(f"  Retries: {stats['retries']}")
+
+    if stats["active_seconds"] > 0:
+        per_minute = len(stats["images"]) / (stats["active_seconds"] / 60)
+        print(
+            f"\nThroughput: {per_minute:.1f} images/min "
+            f"over {stats['active_seconds'] / 60:.1f} active minutes"
+        )
+
+    print("\nLatency (seconds):")
+    for key, values in sorted(stats["latencies"].items()):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99], method="inverted_cdf")
+        print(
+            f"  {key}: p50 {p50:.2f} | p95 {p95:.2f} | p99 {p99:.2f} (n={len(values)})"
+        )
+
+    images = stats["images"]
+    if images:
+        print("\nTokens per image:")
+        for field in TOKEN_FIELDS:
+            total = sum(stats["image_tokens"][image][field] for image in images)
+            print(f"  {field}: {total / len(images):.0f}")
+
+    print("\nCost per keyword (USD):")
+    total_spent = 0.0
+    total_projected = 0.0
+    for keyword in sorted(stats["keyword_cost"]):
+        spent = stats["keyword_cost"][keyword]
+        done = len(stats["keyword_images"][keyword])
+        total_spent += spent
+        line = f"  {keyword}: ${spent:.2f} for {done} images"
+        if done:
+            per_image = spent / done
+            line += f" (${per_image:.4f}/image)"
+            folder = Path(images_root) / keyword if images_root else None
+            if folder and folder.is_dir():
+                projected = per_image * len(list_images(folder))
+                total_projected += projected
+                line += f", projected ${projected:.2f} for the full folder"
+        print(line)
+    print(f"  Total spent: ${total_spent:.2f}")
+    if total_projected:
+        print(f"  Total projected: ${total_projected:.2f}")
+    print(f"{'=' * 50}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--log", default=token_log_file, help="Token log to read")
+    parser.add_argument("--since", help="Only entries at or after this ISO timestamp")
+    parser.add_argument("--model", help="Only entries for this model")
+    parser.add_argument(
+        "--images-root", help="Folder of keyword folders, used to project cost"
+    )
+    args = parser.parse_args()
+
+    stats = analyze(stream_entries(args.log, args.since, args.model))
+    print_report(stats, args.images_root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Keyframe extraction for video ads before Gemini upload.
+Samples each video at a fixed interval, keeps the frames where the scene
+changes the most (at most MAX_KEYFRAMES per video) and caches them as
+downscaled JPEGs by content hash, so a video costs at most MAX_KEYFRAMES
+image tiles instead of a full video upload.
+"""
+
+import heapq
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import cv2
+from image_preprocessing import MAX_IMAGE_SIDE, OUTPUT_QUALITY, preprocess_to_cache
+from response_cache import hash_file
+
+# Configuration
+KEYFRAME_CACHE_DIR = Path("keyframe_cache")
+VIDEO_SUFFIXES = {".mp4"}
+MAX_KEYFRAMES = 4  # Upper bound of frames sent per video
+SAMPLE_INTERVAL_SECONDS = 0.5  # Distance between candidate frames
+SCENE_CHANGE_THRESHOLD = 0.3  # Histogram distance (0-1) that counts as a new scene
+HISTOGRAM_BINS = [16, 16]  # Hue and saturation bins for scene comparison
+
+
+def is_video(path):
+    """Whether the file is a video that goes through keyframe extraction."""
+    return Path(path).suffix.lower() in VIDEO_SUFFIXES
+
+
+def keyframe_settings_tag():
+    """Short tag of the extraction settings, part of every cache key."""
+    return (
+        f"k{MAX_KEYFRAMES}-i{SAMPLE_INTERVAL_SECONDS}-t{SCENE_CHANGE_THRESHOLD}"
+        f"-{MAX_IMAGE_SIDE}-q{OUTPUT_QUALITY}"
+    )
+
+
+def keyframe_dir_for(video_path):
+    """Cache directory for a video's keyframes under the current settings."""
+    return KEYFRAME_CACHE_DIR / f"{hash_file(video_path)}-{keyframe_settings_tag()}"
+
+
+def frame_histogram(frame):
+    """Normalized hue/saturation histogram, robust to small motion and noise."""
+    small = cv2.resize(frame, (160, 90), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, HISTOGRAM_BINS, [0, 180, 0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+
+def sample_frames(video_path):
+    """
+    Yield (timestamp, frame, scene change score) every SAMPLE_INTERVAL_SECONDS.
+    The score is the histogram distance to the previous sample, 1.0 for the first.
+    """
+    capture = cv2.VideoCapture(str(video_path))
+    if not capture.isOpened():
+        raise ValueError(f"cannot open video {video_path}")
+
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        step = max(1, round(fps * SAMPLE_INTERVAL_SECONDS))
+        previous_hist = None
+        index = 0
+        # grab() skips decoding, so only sampled frames are fully decoded
+        while capture.grab():
+            if index % step == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    hist = frame_histogram(frame)
+                    score = (
+                        1.0
+                        if previous_hist is None
+                        else cv2.compareHist(
+                            previous_hist, hist, cv2.HISTCMP_BHATTACHARYYA
+                        )
+                    )
+                    previous_hist = hist
+                    yield index / fps, frame, score
+            index += 1
+    finally:
+        capture.release()
+
+
+def select_keyframes(video_path):
+    """
+    Pick up to MAX_KEYFRAMES frames: the opening frame plus the strongest scene
+    changes above SCENE_CHANGE_THRESHOLD, returned in playback order.
+    """
+    candidates = (
+        c for c in sample_frames(video_path) if c[2] >= SCENE_CHANGE_THRESHOLD
+    )
+    # nlargest keeps only MAX_KEYFRAMES decoded frames in memory at a time
+    strongest = heapq.nlargest(MAX_KEYFRAMES, candidates, key=lambda c: c[2])
+    return sorted(strongest, key=lambda c: c[0])
+
+
+def encode_frame(frame):
+    """Downscale a frame to MAX_IMAGE_SIDE and encode it as JPEG."""
+    height, width = frame.shape[:2]
+    scale = MAX_IMAGE_SIDE / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(
+            frame,
+            (round(width * scale), round(height * scale)),
+            interpolation=cv2.INTER_AREA,
+        )
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, OUTPUT_QUALITY])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+def extract_keyframes(video_path):
+    """Extract the keyframes of a video into the cache and return their paths."""
+    keyframe_dir = keyframe_dir_for(video_path)
+    if keyframe_dir.is_dir():
+        return sorted(keyframe_dir.glob("*.jpg"))
+
+    keyframes = select_keyframes(video_path)
+    if not keyframes:
+        raise ValueError(f"no frames decoded from {video_path}")
+
+    # Write into a temporary directory and rename it, so readers never see a
+    # partially written set of frames
+    KEYFRAME_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=KEYFRAME_CACHE_DIR, suffix=".tmp"))
+    try:
+        for i, (timestamp, frame, _) in enumerate(keyframes):
+            with open(tmp_dir / f"{i:02d}_{timestamp:08.2f}s.jpg", "wb") as f:
+                f.write(encode_frame(frame))
+        os.replace(tmp_dir, keyframe_dir)
+    except OSError:
+        # Another worker finished the same video first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not keyframe_dir.is_dir():
+            raise
+    return sorted(keyframe_dir.glob("*.jpg"))
+
+
+def prepare_media(path):
+    """
+    Prepare one file for upload and return (upload path, mime type). Videos
+    become their keyframe directory, images go through preprocess_to_cache.
+    """
+    if not is_video(path):
+        return preprocess_to_cache(path)
+    try:
+        return str(extract_keyframes(path)[0].parent), None
+    except (cv2.error, OSError, ValueError):
+        # Let the caller surface the extraction error for this video
+        return str(path), None
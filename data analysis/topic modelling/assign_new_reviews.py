@@ -0,0 +1,192 @@
+"""
+Incremental topic assignment for newly collected reviews.
+Loads the topic model and labels exported by topic_pipeline.py once, assigns
+topics to reviews that are not yet in reviews_with_topics.csv and appends
+them, without refitting or relabelling. With --watch it keeps polling the
+reviews folder and only re-reads CSVs that collect_reviews.py has rewritten.
+
+Usage:
+    python assign_new_reviews.py --reviews-folder "/path/to/google play reviews"
+                                 [--output-dir .] [--watch 600]
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from embedding_cache import EMBEDDING_MODEL, LazyEmbeddingModel, embed_documents
+from text_cleaning import clean_documents
+from topic_pipeline import (
+    ASSIGN_BATCH_SIZE,
+    LABELS_FILENAME,
+    MODEL_FILENAME,
+    OUTPUT_DIR,
+    RESULTS_FILENAME,
+    REVIEWS_FOLDER,
+    load_reviews,
+    reduce_outliers,
+    results_frame,
+)
+from tqdm import tqdm
+
+
+class TopicAssigner:
+    """Fitted topic model, labels and the set of reviews already assigned."""
+
+    def __init__(self, output_dir=OUTPUT_DIR, embedding_model=EMBEDDING_MODEL):
+        from bertopic import BERTopic
+
+        output_dir = Path(output_dir)
+        # Embeddings come from the embedding cache, so the model is saved without one
+        self.topic_model = BERTopic.load(str(output_dir / MODEL_FILENAME))
+        self.topic_model.verbose = False
+        with open(output_dir / LABELS_FILENAME, "r", encoding="utf-8") as f:
+            self.labels = {int(k): v for k, v in json.load(f).items()}
+
+        self.embedding_model_name = embedding_model
+        # Loaded on the first cache miss, polls answered from the cache never load it
+        self.embedding_model = LazyEmbeddingModel(embedding_model)
+        self.results_path = output_dir / RESULTS_FILENAME
+        self.seen_ids = set()
+        self.results_columns = None  # Header of an existing results CSV
+        if self.results_path.exists():
+            self.results_columns = self.check_columns(
+                pd.read_csv(self.results_path, nrows=0).columns.tolist()
+            )
+            self.seen_ids = set(
+                pd.read_csv(self.results_path, usecols=["reviewId"], dtype=str)[
+                    "reviewId"
+                ]
+            )
+        self.file_mtimes = {}
+        print(
+            f"✓ Loaded model with {len(self.labels)} topics, "
+            f"{len(self.seen_ids):,} reviews already assigned"
+        )
+
+    def check_columns(self, columns):
+        """
+        Columns of an existing results CSV, which appended rows must follow.
+        A CSV from bert_topic_modelling.ipynb lacks app and score, so those
+        are dropped; columns this script does not produce cannot be filled.
+        """
+        produced = results_frame(
+            pd.DataFrame(columns=["reviewId", "app", "content"]), [], [], {}
+        )
+        unknown = [column for column in columns if column not in produced.columns]
+        if unknown or "reviewId" not in columns:
+            raise ValueError(
+                f"Cannot append to {self.results_path}: its columns {columns} do not "
+                f"match {produced.columns.tolist()}. Re-export it with topic_pipeline.py "
+                "or move it aside."
+            )
+        dropped = [column for column in produced.columns if column not in columns]
+        if dropped:
+            print(
+                f"⚠️  {self.results_path.name} has no {' or '.join(dropped)} column, "
+                "appending without them"
+            )
+        return columns
+
+    def changed_files(self, reviews_folder):
+        """Review CSVs that are new or modified since the last poll."""
+        changed = []
+        for path in sorted(glob.glob(os.path.join(reviews_folder, "*.csv"))):
+            mtime = os.path.getmtime(path)
+            if self.file_mtimes.get(path) != mtime:
+                self.file_mtimes[path] = mtime
+                changed.append(path)
+        return changed
+
+    def new_reviews(self, reviews_folder):
+        """Reviews in changed CSVs whose reviewId has not been assigned yet."""
+        csv_files = self.changed_files(reviews_folder)
+        if not csv_files:
+            return None
+        reviews = load_reviews(reviews_folder, csv_files)
+        reviews["reviewId"] = reviews["reviewId"].astype(str)
+        reviews = reviews[~reviews["reviewId"].isin(self.seen_ids)]
+        return reviews.drop_duplicates("reviewId").reset_index(drop=True)
+
+    def assign(self, reviews, batch_size=ASSIGN_BATCH_SIZE):
+        """Topics, probabilities and labels for a batch of new reviews."""
+        documents = clean_documents(reviews["content"].tolist())
+        embeddings = embed_documents(
+            reviews["reviewId"].tolist(),
+            documents,
+            self.embedding_model_name,
+            model=self.embedding_model,
+        )
+
+        topics = np.empty(len(documents), dtype=np.int64)
+        probabilities = np.empty(len(documents), dtype=np.float32)
+        for start in tqdm(range(0, len(documents), batch_size), desc="Assigning"):
+            rows = slice(start, start + batch_size)
+            topics[rows], probabilities[rows] = self.topic_model.transform(
+                documents[rows], embeddings=np.asarray(embeddings[rows])
+            )
+
+        # Same outlier handling as the batch pipeline
+        topics = reduce_outliers(self.topic_model, documents, topics, embeddings)
+        return results_frame(reviews, topics, probabilities, self.labels)
+
+    def append(self, results_df):
+        """Append assigned reviews to the results CSV, in its column order."""
+        if self.results_columns is None:
+            results_df.to_csv(self.results_path, index=False, encoding="utf-8")
+            self.results_columns = results_df.columns.tolist()
+        else:
+            results_df[self.results_columns].to_csv(
+                self.results_path,
+                mode="a",
+                header=False,
+                index=False,
+                encoding="utf-8",
+            )
+        self.seen_ids.update(results_df["reviewId"])
+
+    def run_once(self, reviews_folder):
+        """Assign and append every new review. Returns how many were added."""
+        reviews = self.new_reviews(reviews_folder)
+        if reviews is None or reviews.empty:
+            return 0
+        results_df = self.assign(reviews)
+        self.append(results_df)
+        print(f"✓ Appended {len(results_df):,} reviews to {self.results_path}")
+        top = results_df["qwen_label"].value_counts().head(5)
+        for label, count in top.items():
+            print(f"  {count:>6,}  {label}")
+        return len(results_df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reviews-folder", default=REVIEWS_FOLDER)
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument(
+        "--watch",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Keep polling the reviews folder at this interval",
+    )
+    args = parser.parse_args()
+
+    assigner = TopicAssigner(args.output_dir, args.embedding_model)
+    while True:
+        added = assigner.run_once(args.reviews_folder)
+        if args.watch is None:
+            if not added:
+                print("No new reviews")
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
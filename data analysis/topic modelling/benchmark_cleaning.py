@@ -0,0 +1,98 @@
+"""
+Benchmark of batch review cleaning against the notebook's per-review loop.
+Times the original clean_review list comprehension, clean_documents with an
+empty cache and clean_documents with a warm cache, and checks that all three
+produce identical text.
+
+Usage:
+    python benchmark_cleaning.py "/path/to/google play reviews" [--workers 8]
+"""
+
+import argparse
+import glob
+import os
+import re
+import tempfile
+import time
+
+import emoji
+import pandas as pd
+from text_cleaning import clean_documents
+
+
+def clean_review_baseline(text):
+    """The notebook's original clean_review, kept verbatim for comparison."""
+    if not isinstance(text, str):
+        return ""
+
+    # 1. Deemojize - convert emojis to text
+    text = emoji.demojize(text, delimiters=(" ", " "))
+
+    # 2. Lowercase
+    text = text.lower()
+
+    # 3. Remove URLs
+    text = re.sub(r"http\S+|www\S+|https\S+", "", text)
+
+    # 4. Remove email addresses
+    text = re.sub(r"\S+@\S+", "", text)
+
+    # 5. Remove excessive whitespace
+    text = re.sub(r"\s+", " ", text).strip()
+
+    return text
+
+
+def load_documents(reviews_folder):
+    """Review texts from every non-empty CSV in the folder."""
+    frames = [
+        pd.read_csv(f)
+        for f in sorted(glob.glob(os.path.join(reviews_folder, "*.csv")))
+        if os.path.getsize(f) > 0
+    ]
+    return pd.concat(frames, ignore_index=True)["content"].dropna().tolist()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("reviews_folder", help="Folder of review CSVs")
+    parser.add_argument("--workers", type=int, default=None, help="Pool size")
+    args = parser.parse_args()
+
+    documents = load_documents(args.reviews_folder)
+    print(f"Documents: {len(documents):,}")
+
+    baseline_s, expected = timed(
+        lambda: [clean_review_baseline(doc) for doc in documents]
+    )
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold_s, cold = timed(
+            lambda: clean_documents(documents, args.workers, cache_dir=cache_dir)
+        )
+        warm_s, warm = timed(
+            lambda: clean_documents(documents, args.workers, cache_dir=cache_dir)
+        )
+
+    mismatches = sum(a != b for a, b in zip(expected, cold)) + sum(
+        a != b for a, b in zip(expected, warm)
+    )
+
+    print(f"\n{'=' * 50}")
+    print(f"Per-review loop:     {baseline_s:8.2f}s")
+    print(f"Batch, cold cache:   {cold_s:8.2f}s ({baseline_s / cold_s:.1f}x)")
+    print(f"Batch, warm cache:   {warm_s:8.2f}s ({baseline_s / warm_s:.1f}x)")
+    if mismatches:
+        print(f"⚠️  {mismatches} cleaned texts differ from the per-review loop")
+    else:
+        print("✓ Output identical to the per-review loop")
+    print(f"{'=' * 50}")
+
+
+if __name__ == "__main__":
+    main()
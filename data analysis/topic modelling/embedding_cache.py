@@ -0,0 +1,185 @@
+"""
+Persistent embedding store for review topic modelling.
+Vectors are appended to one float32 file per embedding model and read back
+through a memory map; a SQLite index maps (reviewId, text hash) to a row.
+Only new or edited reviews are encoded, so re-running the pipeline with
+different UMAP/HDBSCAN settings does not re-embed the corpus.
+"""
+
+import hashlib
+import os
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+
+# Configuration
+EMBEDDING_CACHE_DIR = Path("embedding_cache")
+EMBEDDING_MODEL = "all-MiniLM-L12-v2"
+ENCODE_BATCH_SIZE = 4096  # Reviews encoded and persisted per step
+
+
+def text_hash(text):
+    """SHA-256 of a cleaned review text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_embedding_model(model_name=EMBEDDING_MODEL):
+    """Load the sentence-transformers model only when something must be encoded."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+class LazyEmbeddingModel:
+    """Loads the model on the first encode call and keeps it for later ones."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        self.model_name = model_name
+        self.model = None
+
+    def encode(self, texts):
+        if self.model is None:
+            self.model = load_embedding_model(self.model_name)
+        return self.model.encode(texts)
+
+
+class EmbeddingStore:
+    """Append-only memory-mapped vectors for one model, indexed by (reviewId, text hash)."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, cache_dir=EMBEDDING_CACHE_DIR):
+        self.model_name = model_name
+        self.dir = Path(cache_dir) / model_name.replace("/", "__")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.dir / "vectors.f32"
+        self.conn = sqlite3.connect(self.dir / "index.sqlite")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rows (
+                review_id TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                PRIMARY KEY (review_id, text_hash)
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.conn.commit()
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim = int(row[0]) if row else None
+
+    @property
+    def num_rows(self):
+        """Rows that are both written and indexed."""
+        return self.conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def lookup(self, keys):
+        """Row of every (review_id, text_hash) key, -1 when not cached."""
+        index = {
+            (review_id, hashed): row
+            for review_id, hashed, row in self.conn.execute(
+                "SELECT review_id, text_hash, row FROM rows"
+            )
+        }
+        return np.array([index.get(key, -1) for key in keys], dtype=np.int64)
+
+    def append(self, keys, vectors):
+        """
+        Persist new vectors and then index them. The data is fsynced before the
+        index commit, so a crash can leave unused bytes but never a bad row.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (str(self.dim),)
+            )
+
+        # Drop bytes from an interrupted append so rows stay aligned
+        start = self.num_rows
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(start * self.dim * 4)
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO rows VALUES (?, ?, ?)",
+            [
+                (review_id, hashed, start + i)
+                for i, (review_id, hashed) in enumerate(keys)
+            ],
+        )
+        self.conn.commit()
+
+    def vectors(self):
+        """Read-only memory map over every indexed vector."""
+        rows = self.num_rows
+        if rows == 0:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)
+        )
+
+    def get(self, rows):
+        """
+        Vectors for the given rows. When they are the leading rows in order,
+        which is the case for an unchanged corpus, the memory map itself is
+        returned without copying.
+        """
+        vectors = self.vectors()
+        if np.array_equal(rows, np.arange(len(rows))):
+            return vectors[: len(rows)]
+        return np.asarray(vectors[rows])
+
+    def close(self):
+        self.conn.close()
+
+
+def embed_documents(
+    review_ids,
+    texts,
+    model_name=EMBEDDING_MODEL,
+    model=None,
+    cache_dir=EMBEDDING_CACHE_DIR,
+    batch_size=ENCODE_BATCH_SIZE,
+):
+    """
+    Embeddings for the given reviews, encoding only those whose
+    (reviewId, text hash) is not cached for model_name yet. model is loaded
+    on demand if not passed. Returns an (n, dim) float32 array.
+    """
+    store = EmbeddingStore(model_name, cache_dir)
+    try:
+        keys = [
+            (str(review_id), text_hash(text))
+            for review_id, text in zip(review_ids, texts)
+        ]
+        rows = store.lookup(keys)
+
+        # Encode each missing key once, even if it appears several times
+        missing = {}
+        for i in np.flatnonzero(rows < 0):
+            missing.setdefault(keys[i], i)
+        print(
+            f"Embeddings: {len(keys) - int((rows < 0).sum()):,} cached, "
+            f"{len(missing):,} to encode"
+        )
+
+        if missing:
+            model = model or load_embedding_model(model_name)
+            pending = list(missing.items())
+            for start in tqdm(
+                range(0, len(pending), batch_size), desc="Encoding new reviews"
+            ):
+                batch = pending[start : start + batch_size]
+                vectors = model.encode([texts[i] for _, i in batch])
+                store.append([key for key, _ in batch], vectors)
+            rows = store.lookup(keys)
+
+        return store.get(rows)
+    finally:
+        store.close()
@@ -0,0 +1,209 @@
+"""
+Cached, batched LLM topic labels for BERTopic.
+CachedTextGeneration is a drop-in for BERTopic's TextGeneration: each label is
+cached by (representative documents, keywords, prompt, model, generation
+settings), so a refit only generates labels for topics whose representative
+documents or keywords changed, and uncached topics are generated in batches.
+load_generator builds the 4-bit GPU pipeline or, without CUDA, a small model
+on the CPU.
+"""
+
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+
+from bertopic.representation import TextGeneration
+from bertopic.representation._utils import truncate_document
+from tqdm import tqdm
+
+# Configuration
+LABEL_CACHE_PATH = Path("label_cache.sqlite")
+LABEL_BATCH_SIZE = 8  # Prompts per generate call
+GPU_LLM_MODEL = "Qwen/Qwen2.5-7B-Instruct-1M"
+CPU_LLM_MODEL = "Qwen/Qwen2.5-0.5B-Instruct"  # Small enough for CPU-only machines
+GENERATION_KWARGS = {
+    "temperature": 0.1,
+    "max_new_tokens": 500,
+    "repetition_penalty": 1.1,
+}
+
+
+def resolve_llm(model_id=GPU_LLM_MODEL, cpu=False):
+    """
+    The (model id, cpu) pair labelling will actually use. Without CUDA the
+    4-bit GPU path is unavailable, so the default model falls back to the
+    small CPU_LLM_MODEL.
+    """
+    import torch
+
+    if not cpu and not torch.cuda.is_available():
+        print("⚠️  CUDA not available, labelling on CPU")
+        cpu = True
+    if cpu and model_id == GPU_LLM_MODEL:
+        model_id = CPU_LLM_MODEL
+    return model_id, cpu
+
+
+def load_generator(model_id=GPU_LLM_MODEL, cpu=False):
+    """
+    Text-generation pipeline for labelling: 4-bit on the GPU as in the
+    notebook, or float32 on the CPU with cpu=True. Pass the result of
+    resolve_llm.
+    """
+    import torch
+    import transformers
+
+    if cpu:
+        model_kwargs = {"torch_dtype": torch.float32}
+    else:
+        model_kwargs = {
+            "quantization_config": transformers.BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_use_double_quant=True,
+                bnb_4bit_compute_dtype=torch.bfloat16,
+            ),
+            "device_map": "auto",
+        }
+
+    # Decoder-only models must be left-padded to generate in batches
+    tokenizer = transformers.AutoTokenizer.from_pretrained(
+        model_id, padding_side="left"
+    )
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model = transformers.AutoModelForCausalLM.from_pretrained(
+        model_id, trust_remote_code=True, **model_kwargs
+    )
+    model.eval()
+    generator = transformers.pipeline(
+        model=model,
+        tokenizer=tokenizer,
+        task="text-generation",
+        **GENERATION_KWARGS,
+    )
+    return generator
+
+
+class LabelCache:
+    """SQLite map from label key to generated label."""
+
+    def __init__(self, path=LABEL_CACHE_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS labels (key TEXT PRIMARY KEY, label TEXT)"
+        )
+        self.conn.commit()
+
+    def lookup(self, keys):
+        """Cached label for each key that has one."""
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 900):
+            batch = keys[start : start + 900]
+            placeholders = ",".join("?" * len(batch))
+            found.update(
+                self.conn.execute(
+                    f"SELECT key, label FROM labels WHERE key IN ({placeholders})",
+                    batch,
+                )
+            )
+        return found
+
+    def store(self, items):
+        self.conn.executemany("INSERT OR REPLACE INTO labels VALUES (?, ?)", items)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class CachedTextGeneration(TextGeneration):
+    """TextGeneration with a persistent label cache and batched generation."""
+
+    def __init__(
+        self,
+        model,
+        prompt,
+        model_name,
+        batch_size=LABEL_BATCH_SIZE,
+        cache_path=LABEL_CACHE_PATH,
+        **kwargs,
+    ):
+        super().__init__(model, prompt=prompt, **kwargs)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_path = cache_path
+
+    def label_key(self, docs, keywords):
+        """Cache key of one topic's label."""
+        payload = json.dumps(
+            {
+                "docs": hashlib.sha256("\n".join(docs or []).encode()).hexdigest(),
+                "keywords": keywords,
+                "prompt": self.prompt,
+                "model": self.model_name,
+                "generation": {**GENERATION_KWARGS, **self.pipeline_kwargs},
+                "doc_length": self.doc_length,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def extract_topics(self, topic_model, documents, c_tf_idf, topics):
+        """Labels for every topic, generating only those not in the cache."""
+        if "[DOCUMENTS]" in self.prompt:
+            repr_docs_mappings, _, _, _ = topic_model._extract_representative_docs(
+                c_tf_idf, documents, topics, 500, self.nr_docs, self.diversity
+            )
+        else:
+            repr_docs_mappings = {topic: None for topic in topics}
+
+        prompts, keys = {}, {}
+        for topic, docs in repr_docs_mappings.items():
+            truncated_docs = (
+                [
+                    truncate_document(topic_model, self.doc_length, self.tokenizer, doc)
+                    for doc in docs
+                ]
+                if docs is not None
+                else docs
+            )
+            prompts[topic] = self._create_prompt(truncated_docs, topic, topics)
+            keys[topic] = self.label_key(
+                truncated_docs, [word for word, _ in topics[topic]]
+            )
+        self.prompts_ = list(prompts.values())
+
+        cache = LabelCache(self.cache_path)
+        try:
+            labels = cache.lookup(keys.values())
+            pending = [topic for topic in prompts if keys[topic] not in labels]
+            print(
+                f"Topic labels: {len(prompts) - len(pending)} cached, "
+                f"{len(pending)} to generate"
+            )
+            for start in tqdm(
+                range(0, len(pending), self.batch_size), desc="Generating labels"
+            ):
+                batch = pending[start : start + self.batch_size]
+                outputs = self.model(
+                    [prompts[topic] for topic in batch],
+                    batch_size=self.batch_size,
+                    **self.pipeline_kwargs,
+                )
+                new_items = [
+                    (
+                        keys[topic],
+                        output[0]["generated_text"].replace(prompts[topic], ""),
+                    )
+                    for topic, output in zip(batch, outputs)
+                ]
+                # Store per batch so an interrupted run keeps what it generated
+                cache.store(new_items)
+                labels.update(new_items)
+        finally:
+            cache.close()
+
+        return {topic: [(labels[keys[topic]], 1)] + [("", 0)] * 9 for topic in prompts}
@@ -0,0 +1,383 @@
+"""
+Approximate nearest-neighbour search over reviews and ad creative text.
+Builds one HNSW index per kind of item (reviews, ads) from the cached
+sentence embeddings, with ad text embedded into the same embedding cache,
+and persists them under SEMANTIC_INDEX_DIR. Re-running only embeds and adds
+new or edited items; edited and removed items are marked deleted. The
+annotation server answers search queries from these indexes.
+
+Usage:
+    python semantic_index.py --reviews-folder "/path/to/google play reviews"
+                             --ads-folder "/path/to/meta ads metadata json"
+                             [--index-dir semantic_index]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from embedding_cache import (
+    EMBEDDING_MODEL,
+    embed_documents,
+    load_embedding_model,
+    text_hash,
+)
+from text_cleaning import clean_documents, clean_review
+
+# Configuration
+SEMANTIC_INDEX_DIR = Path("semantic_index")
+ADS_FOLDER = r"/path/to/meta ads metadata json"
+HNSW_M = 16  # Graph links per node
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64  # Higher is more accurate and slower
+KINDS = ("reviews", "ads")
+AD_KEY_PREFIX = "ad:"  # Keeps ad ids apart from reviewIds in the embedding cache
+
+
+class SemanticIndex:
+    """HNSW index of one kind of item, with its ids, sources and texts in SQLite."""
+
+    def __init__(self, kind, index_dir=SEMANTIC_INDEX_DIR, model_name=EMBEDDING_MODEL):
+        self.kind = kind
+        self.dir = Path(index_dir) / model_name.replace("/", "__")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.dir / f"{kind}.hnsw"
+        self.conn = sqlite3.connect(
+            self.dir / f"{kind}.sqlite", check_same_thread=False
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                label INTEGER PRIMARY KEY,
+                item_id TEXT NOT NULL UNIQUE,
+                text_hash TEXT NOT NULL,
+                source TEXT,
+                text TEXT
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.index = None
+        self.loaded_mtime = None
+        self.reload()
+
+    def meta(self, key, default=None):
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else default
+
+    @property
+    def size(self):
+        """Items that can be returned, i.e. not deleted."""
+        return self.conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def consistent(self):
+        """Whether the index file is the one the metadata was last committed with."""
+        saved = self.meta("index_mtime_ns")
+        if not self.index_path.exists():
+            return saved is None and self.size == 0
+        return saved == str(self.index_path.stat().st_mtime_ns)
+
+    def reset(self):
+        """Drop the index and its metadata, so the next sync rebuilds it."""
+        self.conn.execute("DELETE FROM items")
+        self.conn.execute("DELETE FROM meta")
+        self.conn.commit()
+        self.index_path.unlink(missing_ok=True)
+        with self.lock:
+            self.index = None
+            self.loaded_mtime = None
+
+    def reload(self):
+        """(Re)load the index file if it changed since it was last loaded."""
+        import hnswlib
+
+        if not self.index_path.exists():
+            return
+        mtime = os.path.getmtime(self.index_path)
+        if mtime == self.loaded_mtime:
+            return
+        index = hnswlib.Index(space="cosine", dim=int(self.meta("dim")))
+        index.load_index(str(self.index_path))
+        index.set_ef(HNSW_EF_SEARCH)
+        with self.lock:
+            self.index = index
+            self.loaded_mtime = mtime
+
+    def sync(self, item_ids, sources, texts, documents, embed):
+        """
+        Make the index hold exactly the given items. documents are the
+        cleaned texts that are embedded; embed(keys, documents) returns their
+        vectors. Returns (added, updated, removed) counts.
+        """
+        import hnswlib
+
+        if not self.consistent():
+            # A save interrupted between the index file and the metadata commit,
+            # or a missing index file; re-adding everything is cheap from the
+            # embedding cache, while marking deletions again would fail
+            print(
+                f"⚠️  {self.index_path.name} does not match its metadata, "
+                f"rebuilding the {self.kind} index"
+            )
+            self.reset()
+
+        existing = {
+            item_id: (label, hashed)
+            for label, item_id, hashed in self.conn.execute(
+                "SELECT label, item_id, text_hash FROM items"
+            )
+        }
+        hashes = [text_hash(document) for document in documents]
+        pending = [
+            i
+            for i, (item_id, hashed) in enumerate(zip(item_ids, hashes))
+            if existing.get(item_id, (None, None))[1] != hashed
+        ]
+        current = set(item_ids)
+        removed = [item_id for item_id in existing if item_id not in current]
+        replaced = [item_ids[i] for i in pending if item_ids[i] in existing]
+        if not pending and not removed:
+            return 0, 0, 0
+
+        next_label = int(self.meta("next_label", 0))
+        labels = np.arange(next_label, next_label + len(pending), dtype=np.int64)
+        if pending:
+            vectors = np.asarray(
+                embed([item_ids[i] for i in pending], [documents[i] for i in pending]),
+                dtype=np.float32,
+            )
+            if self.index is None:
+                self.index = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+                self.index.init_index(
+                    max_elements=len(pending),
+                    ef_construction=HNSW_EF_CONSTRUCTION,
+                    M=HNSW_M,
+                )
+                self.index.set_ef(HNSW_EF_SEARCH)
+            needed = self.index.element_count + len(pending)
+            if needed > self.index.max_elements:
+                # Grow geometrically so repeated small updates do not resize every time
+                self.index.resize_index(max(needed, self.index.max_elements * 3 // 2))
+            self.index.add_items(vectors, labels)
+        for item_id in removed + replaced:
+            self.index.mark_deleted(existing[item_id][0])
+
+        # The index file is replaced before the metadata commit, which records
+        # its mtime, so a crash in between is detected by the next sync
+        tmp_path = self.index_path.with_suffix(".tmp")
+        self.index.save_index(str(tmp_path))
+        os.replace(tmp_path, self.index_path)
+        self.conn.executemany(
+            "DELETE FROM items WHERE item_id = ?",
+            [(item_id,) for item_id in removed + replaced],
+        )
+        self.conn.executemany(
+            "INSERT INTO items VALUES (?, ?, ?, ?, ?)",
+            [
+                (int(label), item_ids[i], hashes[i], sources[i], texts[i])
+                for label, i in zip(labels, pending)
+            ],
+        )
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+            [
+                ("dim", str(self.index.dim)),
+                ("next_label", str(next_label + len(pending))),
+                ("index_mtime_ns", str(self.index_path.stat().st_mtime_ns)),
+            ],
+        )
+        self.conn.commit()
+        self.loaded_mtime = os.path.getmtime(self.index_path)
+        return len(pending) - len(replaced), len(replaced), len(removed)
+
+    def vector(self, item_id):
+        """Stored vector of an item, or None if it is not indexed."""
+        row = self.conn.execute(
+            "SELECT label FROM items WHERE item_id = ?", (item_id,)
+        ).fetchone()
+        if row is None or self.index is None:
+            return None
+        with self.lock:
+            return np.asarray(self.index.get_items([row[0]]), dtype=np.float32)[0]
+
+    def search(self, vector, k=10, exclude=None):
+        """The k nearest items to a vector as dicts with a cosine similarity score."""
+        with self.lock:
+            index = self.index
+        # One extra neighbour, since the query item finds itself first
+        fetch = min(k + (exclude is not None), self.size)
+        if index is None or fetch == 0:
+            return []
+        labels, distances = index.knn_query(
+            np.asarray(vector, dtype=np.float32), k=fetch
+        )
+        found = {
+            label: (item_id, source, text)
+            for label, item_id, source, text in self.conn.execute(
+                "SELECT label, item_id, source, text FROM items WHERE label IN "
+                f"({','.join('?' * len(labels[0]))})",
+                [int(label) for label in labels[0]],
+            )
+        }
+        results = []
+        for label, distance in zip(labels[0], distances[0]):
+            if int(label) not in found:
+                continue
+            item_id, source, text = found[int(label)]
+            if item_id == exclude:
+                continue
+            results.append(
+                {
+                    "id": item_id,
+                    "source": source,
+                    "text": text,
+                    "score": round(1.0 - float(distance), 4),
+                }
+            )
+        return results[:k]
+
+    def close(self):
+        self.conn.close()
+
+
+class SemanticSearch:
+    """Query side used by the annotation server: the indexes plus the query encoder."""
+
+    def __init__(self, index_dir=SEMANTIC_INDEX_DIR, model_name=EMBEDDING_MODEL):
+        self.indexes = {
+            kind: SemanticIndex(kind, index_dir, model_name) for kind in KINDS
+        }
+        self.model_name = model_name
+        self.model = None
+        self.model_lock = threading.Lock()
+
+    def encode(self, query):
+        with self.model_lock:
+            if self.model is None:
+                self.model = load_embedding_model(self.model_name)
+            return self.model.encode([clean_review(query)])[0]
+
+    def search(self, target, k=10, query=None, like_kind=None, like_id=None):
+        """
+        Items of kind `target` nearest to a free-text query, or to an indexed
+        item given by (like_kind, like_id). Ad ids are the Ad Library ids.
+        Returns None if that item is not indexed.
+        """
+        for index in self.indexes.values():
+            index.reload()
+        if query is not None:
+            results = self.indexes[target].search(self.encode(query), k)
+        else:
+            if like_kind == "ads":
+                like_id = AD_KEY_PREFIX + like_id
+            vector = self.indexes[like_kind].vector(like_id)
+            if vector is None:
+                return None
+            exclude = like_id if like_kind == target else None
+            results = self.indexes[target].search(vector, k, exclude=exclude)
+        if target == "ads":
+            for result in results:
+                result["id"] = result["id"].removeprefix(AD_KEY_PREFIX)
+        return results
+
+
+def load_ads(ads_folder):
+    """(ids, keyword files, texts) of every ad with creative text, first copy of each id."""
+    ids, sources, texts = [], [], []
+    seen = set()
+    for json_path in sorted(glob.glob(os.path.join(ads_folder, "*.json"))):
+        with open(json_path, "r", encoding="utf-8") as f:
+            for item in json.load(f):
+                parts = (item.get("ad_creative_bodies") or []) + (
+                    item.get("ad_creative_link_titles") or []
+                )
+                text = "\n".join(part for part in parts if isinstance(part, str))
+                if not item.get("id") or not text.strip() or item["id"] in seen:
+                    continue
+                seen.add(item["id"])
+                ids.append(AD_KEY_PREFIX + item["id"])
+                sources.append(os.path.basename(json_path))
+                texts.append(text)
+    return ids, sources, texts
+
+
+def benchmark_queries(index, queries=200, k=10):
+    """Median and p95 latency in ms of k-NN queries using stored vectors."""
+    labels = [
+        row[0]
+        for row in index.conn.execute(
+            "SELECT label FROM items ORDER BY random() LIMIT ?", (queries,)
+        )
+    ]
+    if not labels:
+        return None
+    vectors = index.index.get_items(labels)
+    timings = []
+    for vector in vectors:
+        start = time.perf_counter()
+        index.search(vector, k)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 95)
+
+
+def main():
+    from topic_pipeline import REVIEWS_FOLDER, load_reviews
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reviews-folder", default=REVIEWS_FOLDER)
+    parser.add_argument("--ads-folder", default=ADS_FOLDER)
+    parser.add_argument("--index-dir", type=Path, default=SEMANTIC_INDEX_DIR)
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    args = parser.parse_args()
+
+    reviews = load_reviews(args.reviews_folder)
+    reviews = reviews.drop_duplicates("reviewId", keep="last")
+    sources = {
+        "reviews": (
+            reviews["reviewId"].astype(str).tolist(),
+            reviews["app"].tolist(),
+            reviews["content"].tolist(),
+        ),
+        "ads": load_ads(args.ads_folder),
+    }
+
+    def embed(keys, documents):
+        # Reviews share cache entries with topic_pipeline.py
+        return embed_documents(keys, documents, args.embedding_model)
+
+    print(f"\n{'=' * 50}")
+    for kind in KINDS:
+        item_ids, item_sources, texts = sources[kind]
+        start = time.perf_counter()
+        index = SemanticIndex(kind, args.index_dir, args.embedding_model)
+        added, updated, removed = index.sync(
+            item_ids, item_sources, texts, clean_documents(texts), embed
+        )
+        print(
+            f"{kind:<8} {index.size:>9,} items  +{added:,} added, {updated:,} updated, "
+            f"{removed:,} removed in {time.perf_counter() - start:.1f}s"
+        )
+        latency = benchmark_queries(index)
+        if latency:
+            print(
+                f"         query latency p50 {latency[0]:.2f} ms, p95 {latency[1]:.2f} ms"
+            )
+        index.close()
+    print(f"✓ Indexes saved to {args.index_dir}")
+    print(f"{'=' * 50}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Batch cleaning of review text for topic modelling.
+Same output as the notebook's per-review clean_review, but duplicate reviews
+are cleaned once, chunks run across a process pool with precompiled
+patterns, and results are cached in SQLite by text hash so re-runs only
+clean new reviews.
+"""
+
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import emoji
+from embedding_cache import text_hash
+from tqdm import tqdm
+
+# Configuration
+CLEAN_CACHE_DIR = Path("clean_cache")
+CLEANER_VERSION = "v1"  # Bump when clean_review changes to invalidate the cache
+CLEAN_CHUNK_SIZE = 5000  # Reviews per pool task
+CLEAN_WORKERS = os.cpu_count() or 1
+MIN_PARALLEL_TEXTS = 20000  # Below this, pool startup costs more than it saves
+
+URL_PATTERN = re.compile(r"http\S+|www\S+|https\S+")
+EMAIL_PATTERN = re.compile(r"\S+@\S+")
+# Every non-ASCII character that occurs in an emoji, plus the variation
+# selectors demojize strips. Text without any of them is left unchanged by
+# demojize, which is by far the slowest step, so it can be skipped.
+EMOJI_CHARS = frozenset(
+    c for key in emoji.EMOJI_DATA for c in key if not c.isascii()
+) | {"\ufe0e", "\ufe0f"}
+
+
+def clean_review(text):
+    """Clean app review text for topic modeling"""
+    if not isinstance(text, str):
+        return ""
+
+    # 1. Deemojize - convert emojis to text
+    if not text.isascii() and not EMOJI_CHARS.isdisjoint(text):
+        text = emoji.demojize(text, delimiters=(" ", " "))
+
+    # 2. Lowercase
+    text = text.lower()
+
+    # 3. Remove URLs
+    text = URL_PATTERN.sub("", text)
+
+    # 4. Remove email addresses
+    text = EMAIL_PATTERN.sub("", text)
+
+    # 5. Remove excessive whitespace (split() uses the same whitespace as \s)
+    return " ".join(text.split())
+
+
+def clean_chunk(texts):
+    """Clean one chunk of texts; runs in a pool worker."""
+    return [clean_review(text) for text in texts]
+
+
+class CleanCache:
+    """SQLite map from raw text hash to cleaned text for one cleaner version."""
+
+    def __init__(self, cache_dir=CLEAN_CACHE_DIR, version=CLEANER_VERSION):
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(cache_dir / f"cleaned-{version}.sqlite")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cleaned (text_hash TEXT PRIMARY KEY, text TEXT)"
+        )
+        self.conn.commit()
+
+    def lookup(self, hashes):
+        """Cleaned text for each cached hash."""
+        found = {}
+        unique = list(set(hashes))
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 900):
+            batch = unique[start : start + 900]
+            placeholders = ",".join("?" * len(batch))
+            found.update(
+                self.conn.execute(
+                    f"SELECT text_hash, text FROM cleaned WHERE text_hash IN ({placeholders})",
+                    batch,
+                )
+            )
+        return found
+
+    def store(self, items):
+        self.conn.executemany("INSERT OR REPLACE INTO cleaned VALUES (?, ?)", items)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def clean_documents(
+    texts,
+    workers=None,
+    chunk_size=CLEAN_CHUNK_SIZE,
+    cache_dir=CLEAN_CACHE_DIR,
+    use_cache=True,
+):
+    """
+    Cleaned version of every text, in input order. Each distinct uncached
+    text is cleaned once, across a process pool when there are enough of
+    them.
+    """
+    texts = [text if isinstance(text, str) else "" for text in texts]
+    hashes = [text_hash(text) for text in texts]
+
+    cache = CleanCache(cache_dir) if use_cache else None
+    try:
+        cleaned = cache.lookup(hashes) if cache else {}
+        pending = {}
+        for hashed, text in zip(hashes, texts):
+            if hashed not in cleaned:
+                pending.setdefault(hashed, text)
+        print(
+            f"Cleaning: {len(texts):,} reviews, {len(set(hashes)):,} distinct, "
+            f"{len(pending):,} to clean"
+        )
+
+        if pending:
+            pending_hashes = list(pending)
+            pending_texts = list(pending.values())
+            chunks = [
+                pending_texts[start : start + chunk_size]
+                for start in range(0, len(pending_texts), chunk_size)
+            ]
+            workers = workers or CLEAN_WORKERS
+            if workers > 1 and len(pending_texts) >= MIN_PARALLEL_TEXTS:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = list(
+                        tqdm(
+                            executor.map(clean_chunk, chunks),
+                            total=len(chunks),
+                            desc="Cleaning reviews",
+                        )
+                    )
+            else:
+                results = [
+                    clean_chunk(chunk)
+                    for chunk in tqdm(chunks, desc="Cleaning reviews")
+                ]
+            new_items = list(
+                zip(pending_hashes, (text for chunk in results for text in chunk))
+            )
+            cleaned.update(new_items)
+            if cache:
+                cache.store(new_items)
+
+        return [cleaned[hashed] for hashed in hashes]
+    finally:
+        if cache:
+            cache.close()
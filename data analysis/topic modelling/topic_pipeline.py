@@ -0,0 +1,704 @@
+"""
+Stage-cached BERTopic pipeline for the Google Play reviews.
+Runs load -> clean -> embed -> reduce -> cluster -> topics -> outliers ->
+label -> export from the command line. Every stage output is stored under a
+key derived from its parameters and the keys of the stages it reads, so
+changing a parameter reruns only that stage and the ones after it.
+
+With --sample-size, UMAP, HDBSCAN and BERTopic are fitted on a sample
+stratified by app and star rating, and the other reviews are assigned in
+streamed batches through the fitted models' prediction data. --compare-full
+also runs (or reuses) the full fit and reports how well the two agree.
+
+Usage:
+    python topic_pipeline.py --reviews-folder "/path/to/google play reviews"
+                             [--min-cluster-size 150] [--no-llm | --cpu-llm]
+                             [--until cluster]
+                             [--sample-size 60000 [--compare-full]]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from embedding_cache import EMBEDDING_MODEL, embed_documents
+from text_cleaning import CLEANER_VERSION, clean_documents
+from tqdm import tqdm
+
+# Configuration
+REVIEWS_FOLDER = r"/path/to/google play reviews"
+PIPELINE_CACHE_DIR = Path("pipeline_cache")
+OUTPUT_DIR = Path(".")
+RESULTS_FILENAME = "reviews_with_topics.csv"
+MODEL_FILENAME = "topic_model.bertopic"
+LABELS_FILENAME = "topic_labels.json"
+LLM_MODEL = (
+    "Qwen/Qwen2.5-7B-Instruct-1M"  # Falls back to a small CPU model without CUDA
+)
+LABEL_PROMPT = """
+I have a topic that contains the following documents:
+[DOCUMENTS]
+The topic is described by the following keywords: [KEYWORDS]
+
+Based on the information above, extract a short but highly descriptive topic label of at most 5 words. Make sure it is in the following format:
+topic: <topic label>
+"""
+SAMPLE_SEED = 42
+MIN_PER_STRATUM = 50  # Keep small apps and rare ratings represented in the sample
+ASSIGN_BATCH_SIZE = 20000  # Reviews transformed at a time when assigning
+STAGES = [
+    "load",
+    "clean",
+    "embed",
+    "sample",
+    "reduce",
+    "cluster",
+    "topics",
+    "assign",
+    "outliers",
+    "label",
+    "export",
+]
+
+
+def hash_files(paths):
+    """Content hash of a set of files, independent of their order."""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(name, params, input_keys):
+    """Content address of a stage: its name, parameters and input keys."""
+    payload = json.dumps(
+        {"stage": name, "params": params, "inputs": input_keys}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class StageCache:
+    """
+    Directory per (stage, key) holding the stage's artifacts. The artifact
+    format follows its suffix: .npy arrays (memory-mapped on load), .pkl
+    pickles and .bertopic models saved without their embedding model.
+    """
+
+    def __init__(self, root=PIPELINE_CACHE_DIR, embedding_model=EMBEDDING_MODEL):
+        self.root = Path(root)
+        self.embedding_model = embedding_model
+
+    def path(self, name, key):
+        return self.root / name / key
+
+    def load(self, name, key):
+        """Artifacts of a cached stage run, or None on a miss."""
+        stage_dir = self.path(name, key)
+        if not (stage_dir / "meta.json").exists():
+            return None
+        artifacts = {}
+        for path in stage_dir.iterdir():
+            if path.suffix == ".npy":
+                artifacts[path.stem] = np.load(path, mmap_mode="r")
+            elif path.suffix == ".pkl":
+                with open(path, "rb") as f:
+                    artifacts[path.stem] = pickle.load(f)
+            elif path.suffix == ".bertopic":
+                from bertopic import BERTopic
+
+                artifacts[path.stem] = BERTopic.load(
+                    str(path), embedding_model=self.embedding_model
+                )
+        return artifacts
+
+    def save(self, name, key, artifacts, params):
+        """Write artifacts into a temporary directory and move it into place."""
+        stage_dir = self.path(name, key)
+        stage_dir.parent.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=stage_dir.parent, suffix=".tmp"))
+        try:
+            for artifact_name, value in artifacts.items():
+                if isinstance(value, np.ndarray):
+                    np.save(tmp_dir / f"{artifact_name}.npy", value)
+                elif type(value).__name__ == "BERTopic":
+                    value.save(
+                        str(tmp_dir / f"{artifact_name}.bertopic"),
+                        serialization="pickle",
+                        save_embedding_model=False,
+                    )
+                else:
+                    with open(tmp_dir / f"{artifact_name}.pkl", "wb") as f:
+                        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+                json.dump({"stage": name, "key": key, "params": params}, f, indent=2)
+            if stage_dir.exists():
+                shutil.rmtree(stage_dir)
+            os.replace(tmp_dir, stage_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+
+class Pipeline:
+    """Runs stages in order, reusing cached outputs and timing every stage."""
+
+    def __init__(self, cache, force=()):
+        self.cache = cache
+        self.force = set(force)
+        self.keys = {}
+        self.timings = []
+
+    def run(self, name, params, inputs, compute, persist=True):
+        """
+        Return the artifacts of a stage, from the cache when its key matches.
+        Stages with persist=False keep their own cache (the embedding store)
+        or are cheap, so they always run.
+        """
+        key = stage_key(name, params, [self.keys[i] for i in inputs])
+        self.keys[name] = key
+        start = time.perf_counter()
+
+        forced = name in self.force or any(i in self.force for i in inputs)
+        if forced:
+            # Forcing a stage invalidates everything that reads it
+            self.force.add(name)
+        if persist and not forced:
+            artifacts = self.cache.load(name, key)
+            if artifacts is not None:
+                self.timings.append((name, key, "cached", time.perf_counter() - start))
+                return artifacts
+
+        print(f"\n▶ {name} ({key})")
+        artifacts = compute()
+        if persist:
+            self.cache.save(name, key, artifacts, params)
+        self.timings.append((name, key, "ran", time.perf_counter() - start))
+        return artifacts
+
+    def report(self):
+        print(f"\n{'=' * 50}")
+        print("Stage timings:")
+        for name, key, status, seconds in self.timings:
+            print(f"  {name:<9} {key}  {status:<6} {seconds:8.1f}s")
+        print(f"  Total: {sum(t[3] for t in self.timings):.1f}s")
+        print(f"{'=' * 50}")
+
+
+def load_reviews(reviews_folder, csv_files=None):
+    """
+    Concatenate the per-app review CSVs (all of them unless csv_files is
+    given), dropping reviews without text.
+    """
+    if csv_files is None:
+        csv_files = sorted(glob.glob(os.path.join(reviews_folder, "*.csv")))
+    print(f"Found {len(csv_files)} CSV files")
+    df_list = []
+    for f in tqdm(csv_files, desc="Loading reviews"):
+        try:
+            if os.path.getsize(f) > 0:  # skip empty files
+                df = pd.read_csv(f)
+                df["app"] = Path(f).stem
+                df_list.append(df)
+            else:
+                print(f"Skipping empty file: {f}")
+        except (
+            OSError,
+            UnicodeDecodeError,
+            pd.errors.EmptyDataError,
+            pd.errors.ParserError,
+        ) as e:
+            print(f"Skipping {f} due to error: {e}")
+
+    if not df_list:
+        return pd.DataFrame(columns=["reviewId", "content", "app"])
+    merged_df = pd.concat(df_list, ignore_index=True)
+    reviews = merged_df.dropna(subset=["content"]).reset_index(drop=True)
+    print(f"Number of documents: {len(reviews):,}")
+    return reviews
+
+
+def fit_umap(embeddings, params):
+    from umap import UMAP
+
+    umap_model = UMAP(**params, metric="cosine", random_state=42)
+    reduced = umap_model.fit_transform(embeddings)
+    return {"umap": umap_model, "reduced": np.asarray(reduced, dtype=np.float32)}
+
+
+def fit_hdbscan(reduced, params):
+    from hdbscan import HDBSCAN
+
+    hdbscan_model = HDBSCAN(
+        **params,
+        metric="euclidean",
+        cluster_selection_method="eom",
+        prediction_data=True,
+    )
+    hdbscan_model.fit(reduced)
+    return {
+        "hdbscan": hdbscan_model,
+        "labels": hdbscan_model.labels_.astype(np.int64),
+        "probabilities": hdbscan_model.probabilities_.astype(np.float32),
+    }
+
+
+def fit_topics(documents, embeddings, reduce_out, cluster_out, params, embedding_model):
+    """
+    Fit BERTopic on the precomputed clusters, then attach the fitted UMAP and
+    HDBSCAN models so the saved model can still transform new reviews.
+    """
+    from bertopic import BERTopic
+    from bertopic.cluster import BaseCluster
+    from bertopic.dimensionality import BaseDimensionalityReduction
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    vectorizer_params = dict(params["vectorizer"])
+    vectorizer_params["ngram_range"] = tuple(vectorizer_params["ngram_range"])
+    topic_model = BERTopic(
+        embedding_model=embedding_model,
+        umap_model=BaseDimensionalityReduction(),
+        hdbscan_model=BaseCluster(),
+        vectorizer_model=CountVectorizer(**vectorizer_params),
+        top_n_words=params["top_n_words"],
+        verbose=True,
+    )
+    topic_model.fit(
+        documents,
+        embeddings=np.asarray(embeddings),
+        y=np.asarray(cluster_out["labels"]),
+    )
+    topic_model.umap_model = reduce_out["umap"]
+    topic_model.hdbscan_model = cluster_out["hdbscan"]
+    return {"model": topic_model, "topics": np.asarray(topic_model.topics_)}
+
+
+def stratified_sample(reviews, sample_size, seed=SAMPLE_SEED):
+    """
+    Sorted row indices of a sample stratified by app and star rating. Each
+    stratum contributes in proportion to its size, but at least
+    MIN_PER_STRATUM rows (or all of them, if it is smaller).
+    """
+    strata_columns = [c for c in ("app", "score") if c in reviews.columns]
+    if sample_size >= len(reviews) or not strata_columns:
+        return np.arange(len(reviews))
+
+    fraction = sample_size / len(reviews)
+    rng = np.random.default_rng(seed)
+    picks = []
+    for rows in reviews.groupby(strata_columns, dropna=False).indices.values():
+        n = min(len(rows), max(MIN_PER_STRATUM, round(len(rows) * fraction)))
+        picks.append(rng.choice(rows, n, replace=False))
+    sample = np.sort(np.concatenate(picks))
+    print(f"Sample: {len(sample):,} of {len(reviews):,} reviews")
+    return sample
+
+
+def assign_topics(topic_model, documents, embeddings, sample, fitted, batch_size):
+    """
+    Topics and probabilities for every review. Sampled reviews keep their
+    fitted values; the rest go through the model's UMAP transform and HDBSCAN
+    approximate_predict in batches, so only one batch of embeddings is in
+    memory at a time.
+    """
+    topics = np.empty(len(documents), dtype=np.int64)
+    probabilities = np.empty(len(documents), dtype=np.float32)
+    topics[sample] = fitted["topics"]
+    probabilities[sample] = fitted["probabilities"]
+
+    rest = np.setdiff1d(np.arange(len(documents)), sample)
+    verbose, topic_model.verbose = topic_model.verbose, False
+    try:
+        for start in tqdm(
+            range(0, len(rest), batch_size), desc="Assigning remaining reviews"
+        ):
+            rows = rest[start : start + batch_size]
+            batch_topics, batch_probabilities = topic_model.transform(
+                [documents[i] for i in rows], embeddings=np.asarray(embeddings[rows])
+            )
+            topics[rows] = batch_topics
+            probabilities[rows] = batch_probabilities
+    finally:
+        topic_model.verbose = verbose
+    return {"topics": topics, "probabilities": probabilities}
+
+
+def report_agreement(full_topics, sampled_topics, sample):
+    """Compare subsample-fit assignments with the full fit's topics."""
+    from sklearn.metrics import adjusted_rand_score, normalized_mutual_info_score
+
+    full_topics = np.asarray(full_topics)
+    sampled_topics = np.asarray(sampled_topics)
+    held_out = np.setdiff1d(np.arange(len(full_topics)), sample)
+
+    # Share of each sampled topic that falls in its most common full-fit topic
+    crosstab = pd.crosstab(sampled_topics, full_topics)
+    purity = crosstab.max(axis=1).sum() / len(full_topics)
+
+    print(f"\n{'=' * 50}")
+    print("Agreement of the subsample fit with the full fit:")
+    for name, rows in (("all reviews", slice(None)), ("held-out reviews", held_out)):
+        print(
+            f"  {name}: ARI {adjusted_rand_score(full_topics[rows], sampled_topics[rows]):.3f} | "
+            f"NMI {normalized_mutual_info_score(full_topics[rows], sampled_topics[rows]):.3f}"
+        )
+    print(f"  Purity against full-fit topics: {purity:.1%}")
+    print(
+        f"  Topics: {len(set(full_topics) - {-1})} full vs "
+        f"{len(set(sampled_topics) - {-1})} subsample"
+    )
+    print(
+        f"  Outliers: {(full_topics == -1).mean():.1%} full vs "
+        f"{(sampled_topics == -1).mean():.1%} subsample"
+    )
+    print(f"{'=' * 50}")
+
+
+def reduce_outliers(topic_model, documents, topics, embeddings):
+    """Reassign outliers to their nearest topic by embedding similarity."""
+    topics = np.asarray(topics)
+    if not (topics == -1).any():
+        return topics
+    return np.asarray(
+        topic_model.reduce_outliers(
+            documents, list(topics), strategy="embeddings", embeddings=embeddings
+        )
+    )
+
+
+def build_representation_models(llm_model, llm_cpu=False):
+    """The notebook's KeyBERT, MMR and POS representations, plus the LLM if set."""
+    from bertopic.representation import (
+        KeyBERTInspired,
+        MaximalMarginalRelevance,
+        PartOfSpeech,
+    )
+
+    representation_model = {
+        "KeyBERT": KeyBERTInspired(),
+        "MMR": MaximalMarginalRelevance(diversity=0.3),
+        "POS": PartOfSpeech("en_core_web_sm"),
+    }
+    if llm_model:
+        from llm_labels import CachedTextGeneration, load_generator
+
+        representation_model["Qwen"] = CachedTextGeneration(
+            load_generator(llm_model, cpu=llm_cpu),
+            prompt=LABEL_PROMPT,
+            model_name=llm_model,
+        )
+    return representation_model
+
+
+def label_topics(topics_out, documents, new_topics, llm_model, llm_cpu=False):
+    """Update topic representations with the reassigned topics and extract labels."""
+    topic_model = topics_out["model"]
+    topic_model.update_topics(
+        documents,
+        topics=list(new_topics),
+        representation_model=build_representation_models(llm_model, llm_cpu),
+    )
+
+    topic_info = topic_model.get_topic_info()
+    if llm_model:
+        label_topics_ = topic_model.get_topics(full=True)["Qwen"]
+        labels = {
+            int(topic_id): label_list[0][0].split("\n")[0]
+            for topic_id, label_list in label_topics_.items()
+        }
+    else:
+        labels = dict(zip(topic_info["Topic"].astype(int), topic_info["Name"]))
+
+    # The LLM pipeline is not picklable and not needed once labels exist
+    topic_model.representation_model = None
+    return {"model": topic_model, "labels": labels, "topic_info": topic_info}
+
+
+def results_frame(reviews, topics, probabilities, labels):
+    """One row per review with its topic, probability and label."""
+    return pd.DataFrame(
+        {
+            "reviewId": reviews["reviewId"].to_numpy(),
+            "app": reviews["app"].to_numpy(),
+            "score": reviews["score"].to_numpy() if "score" in reviews else None,
+            "review_text": reviews["content"].to_numpy(),
+            "topic_id": np.asarray(topics),
+            "topic_probability": np.asarray(probabilities),
+            "qwen_label": [labels.get(int(t), "Unknown") for t in topics],
+        }
+    )
+
+
+def export_results(reviews, new_topics, probabilities, label_out, output_dir):
+    """
+    Write reviews_with_topics.csv and the topic overview, as the notebook did,
+    plus the final model and labels for assign_new_reviews.py.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    labels = label_out["labels"]
+
+    results_df = results_frame(reviews, new_topics, probabilities, labels)
+    results_df.to_csv(output_dir / RESULTS_FILENAME, index=False, encoding="utf-8")
+    label_out["topic_info"].to_csv(output_dir / "topic_info.csv", index=False)
+    label_out["model"].save(
+        str(output_dir / MODEL_FILENAME),
+        serialization="pickle",
+        save_embedding_model=False,
+    )
+    with open(output_dir / LABELS_FILENAME, "w", encoding="utf-8") as f:
+        json.dump({str(k): v for k, v in labels.items()}, f, indent=2)
+    print(f"✓ Saved {len(results_df):,} reviews to {output_dir / RESULTS_FILENAME}")
+    return {}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reviews-folder", default=REVIEWS_FOLDER)
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--cache-dir", type=Path, default=PIPELINE_CACHE_DIR)
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument("--n-neighbors", type=int, default=15)
+    parser.add_argument("--n-components", type=int, default=5)
+    parser.add_argument("--min-dist", type=float, default=0.0)
+    parser.add_argument("--min-cluster-size", type=int, default=150)
+    parser.add_argument(
+        "--sample-size",
+        type=int,
+        default=None,
+        help="Fit on a stratified sample of this size and assign the rest",
+    )
+    parser.add_argument("--assign-batch-size", type=int, default=ASSIGN_BATCH_SIZE)
+    parser.add_argument(
+        "--compare-full",
+        action="store_true",
+        help="Report agreement of the sample fit with the full fit",
+    )
+    parser.add_argument("--llm-model", default=LLM_MODEL)
+    parser.add_argument("--no-llm", action="store_true", help="Skip LLM labels")
+    parser.add_argument(
+        "--cpu-llm", action="store_true", help="Label with a small model on the CPU"
+    )
+    parser.add_argument("--until", choices=STAGES, default="export")
+    parser.add_argument(
+        "--force", nargs="*", choices=STAGES, default=[], help="Stages to rerun"
+    )
+    return parser.parse_args()
+
+
+def fit_topic_model(args, pipeline, documents, embeddings, reviews, done, sample_size):
+    """
+    Run the sample, reduce, cluster, topics and assign stages. Returns the
+    topics stage output, full-length topic assignments and the stage they
+    come from, or None when --until stops inside these stages. A falsy
+    sample_size fits on every review.
+    """
+    if sample_size:
+        sample = pipeline.run(
+            "sample",
+            {
+                "sample_size": sample_size,
+                "seed": SAMPLE_SEED,
+                "min_per_stratum": MIN_PER_STRATUM,
+            },
+            ["load"],
+            lambda: {"indices": stratified_sample(reviews, sample_size)},
+        )["indices"]
+        if done("sample"):
+            return None
+        fit_inputs = ["embed", "sample"]
+        fit_documents = [documents[i] for i in sample]
+        fit_embeddings = np.asarray(embeddings[sample])
+    else:
+        fit_inputs = ["embed"]
+        fit_documents = documents
+        fit_embeddings = embeddings
+
+    umap_params = {
+        "n_neighbors": args.n_neighbors,
+        "n_components": args.n_components,
+        "min_dist": args.min_dist,
+    }
+    reduce_out = pipeline.run(
+        "reduce", umap_params, fit_inputs, lambda: fit_umap(fit_embeddings, umap_params)
+    )
+    if done("reduce"):
+        return None
+
+    hdbscan_params = {"min_cluster_size": args.min_cluster_size}
+    cluster_out = pipeline.run(
+        "cluster",
+        hdbscan_params,
+        ["reduce"],
+        lambda: fit_hdbscan(reduce_out["reduced"], hdbscan_params),
+    )
+    if done("cluster"):
+        return None
+
+    topic_params = {
+        "vectorizer": {"stop_words": "english", "min_df": 2, "ngram_range": [1, 2]},
+        "top_n_words": 10,
+    }
+    topics_out = pipeline.run(
+        "topics",
+        topic_params,
+        ["clean", *fit_inputs, "cluster"],
+        lambda: fit_topics(
+            fit_documents,
+            fit_embeddings,
+            reduce_out,
+            cluster_out,
+            topic_params,
+            args.embedding_model,
+        ),
+    )
+    if done("topics"):
+        return None
+
+    fitted = {
+        "topics": topics_out["topics"],
+        "probabilities": cluster_out["probabilities"],
+    }
+    if not sample_size:
+        return topics_out, fitted, "topics"
+
+    assigned = pipeline.run(
+        "assign",
+        {},
+        ["topics"],
+        lambda: assign_topics(
+            topics_out["model"],
+            documents,
+            embeddings,
+            sample,
+            fitted,
+            args.assign_batch_size,
+        ),
+    )
+    if done("assign"):
+        return None
+    return topics_out, assigned, "assign"
+
+
+def run_pipeline(args, pipeline):
+    """Run the stages in order, stopping after args.until."""
+    llm_model, llm_cpu = None, False
+    if not args.no_llm:
+        from llm_labels import resolve_llm
+
+        llm_model, llm_cpu = resolve_llm(args.llm_model, args.cpu_llm)
+    stop_after = STAGES.index(args.until)
+
+    def done(name):
+        return STAGES.index(name) >= stop_after
+
+    csv_files = glob.glob(os.path.join(args.reviews_folder, "*.csv"))
+    reviews = pipeline.run(
+        "load",
+        {"files": hash_files(csv_files)},
+        [],
+        lambda: {"reviews": load_reviews(args.reviews_folder)},
+    )["reviews"]
+    if done("load"):
+        return
+
+    documents = pipeline.run(
+        "clean",
+        {"cleaner": CLEANER_VERSION},
+        ["load"],
+        lambda: {"documents": clean_documents(reviews["content"].tolist())},
+    )["documents"]
+    if done("clean"):
+        return
+
+    embeddings = pipeline.run(
+        "embed",
+        {"model": args.embedding_model},
+        ["clean"],
+        lambda: {
+            "embeddings": embed_documents(
+                reviews["reviewId"].tolist(), documents, args.embedding_model
+            )
+        },
+        persist=False,
+    )["embeddings"]
+    if done("embed"):
+        return
+
+    fitted = fit_topic_model(
+        args, pipeline, documents, embeddings, reviews, done, args.sample_size
+    )
+    if fitted is None:
+        return
+    topics_out, assigned, assigned_stage = fitted
+
+    if args.sample_size and args.compare_full:
+        # The full fit reuses its own cached stages; restore the keys after
+        keys = dict(pipeline.keys)
+        full_topics_out, _, _ = fit_topic_model(
+            args, pipeline, documents, embeddings, reviews, done, sample_size=None
+        )
+        pipeline.keys = keys
+        report_agreement(
+            full_topics_out["topics"],
+            assigned["topics"],
+            stratified_sample(reviews, args.sample_size),
+        )
+
+    new_topics = pipeline.run(
+        "outliers",
+        {"strategy": "embeddings"},
+        [assigned_stage],
+        lambda: {
+            "topics": reduce_outliers(
+                topics_out["model"], documents, assigned["topics"], embeddings
+            )
+        },
+    )["topics"]
+    if done("outliers"):
+        return
+
+    label_out = pipeline.run(
+        "label",
+        {"llm_model": llm_model, "prompt": LABEL_PROMPT if llm_model else None},
+        ["topics", "outliers"],
+        lambda: label_topics(topics_out, documents, new_topics, llm_model, llm_cpu),
+    )
+    if done("label"):
+        return
+
+    pipeline.run(
+        "export",
+        {"output_dir": str(args.output_dir)},
+        ["label"],
+        lambda: export_results(
+            reviews,
+            new_topics,
+            assigned["probabilities"],
+            label_out,
+            args.output_dir,
+        ),
+        persist=False,
+    )
+
+
+def main():
+    args = parse_args()
+    pipeline = Pipeline(StageCache(args.cache_dir, args.embedding_model), args.force)
+    run_pipeline(args, pipeline)
+    pipeline.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Collect Instagram post URLs for hashtags by harvesting the grid.
+Logs in, opens each hashtag page and scrolls it, reading post shortcodes in
+bulk from the links in the loaded grid and from the feed responses the page
+fetches while scrolling (taken from Chrome's performance log). Shortcodes
+are deduplicated in a set, and a hashtag is done when the target is reached
+or several scrolls in a row bring no new shortcode, so throughput is bounded
+by scrolling rather than by opening each post. Writes posts/<hashtag>.csv
+with the url and hash_tag columns that download_images.ipynb reads.
+
+Usage:
+    python collect_hashtag_posts.py jeetwin rajabets [--target 500] [--headless]
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import time
+from time import sleep
+
+import pandas as pd
+from dotenv import load_dotenv
+from selenium import webdriver
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from tqdm import tqdm
+
+load_dotenv()
+
+# Configuration
+TARGET_POSTS = 500
+OUTPUT_FOLDER = "posts"
+SCROLL_PAUSE = (1.0, 2.0)  # Seconds to let the next feed page load after a scroll
+MAX_IDLE_SCROLLS = 6  # Stop after this many scrolls without a new shortcode
+# Requests whose JSON responses carry the hashtag feed
+FEED_URL_MARKERS = ("/graphql/query", "/api/v1/tags/", "/api/v1/feed/")
+POST_URL = "https://www.instagram.com/p/{}/"
+
+SHORTCODE_PATTERN = re.compile(r"/(?:p|reel|tv)/([A-Za-z0-9_-]+)")
+GRID_LINKS_SCRIPT = (
+    "return Array.from(document.querySelectorAll('a[href]'), "
+    "a => a.getAttribute('href'));"
+)
+
+
+def create_driver(headless=False):
+    """Chrome with network events in the performance log."""
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument("--headless=new")
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    driver = webdriver.Chrome(options=chrome_options)
+    driver.maximize_window()
+    return driver
+
+
+def login_to_instagram(driver, max_retries=3):
+    """Login to Instagram with retry logic."""
+    username_val = os.getenv("INSTA_USERNAME_2")
+    password_val = os.getenv("INSTA_PASSWORD_2")
+
+    if not username_val or not password_val:
+        raise ValueError("Instagram credentials not found in environment variables")
+
+    for attempt in range(max_retries):
+        try:
+            driver.get("https://www.instagram.com/")
+            # Wait for the login page to load
+            sleep(random.uniform(2, 3))
+
+            username = driver.find_element(By.NAME, "username")
+            username.send_keys(username_val)
+            sleep(random.uniform(2, 3))
+
+            password = driver.find_element(By.NAME, "password")
+            password.send_keys(password_val)
+            sleep(random.uniform(1.5, 2.5))
+
+            password.submit()
+            sleep(random.uniform(4, 6))
+            print("Successfully logged in to Instagram")
+            return True
+
+        except (TimeoutException, NoSuchElementException) as e:
+            print(f"Login attempt {attempt + 1} failed: {e}")
+            if attempt == max_retries - 1:
+                print("Maximum login retries exceeded")
+                raise
+            time.sleep(5)  # Wait before retry
+
+
+def shortcodes_from_links(hrefs):
+    """Shortcodes of the post and reel links among hrefs."""
+    return [
+        match.group(1)
+        for href in hrefs
+        if href and (match := SHORTCODE_PATTERN.search(href))
+    ]
+
+
+def shortcodes_from_json(data):
+    """
+    Shortcodes of every media object in a feed response: "shortcode" in
+    GraphQL nodes, "code" next to the media id in API v1 items.
+    """
+    found = []
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if isinstance(value.get("shortcode"), str):
+                found.append(value["shortcode"])
+            elif isinstance(value.get("code"), str) and "pk" in value:
+                found.append(value["code"])
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return found
+
+
+class HashtagCollector:
+    """Scrolls one hashtag page and gathers the shortcodes it loads."""
+
+    def __init__(self, driver, hashtag):
+        self.driver = driver
+        self.hashtag = hashtag.lstrip("#")
+        self.seen = set()
+        self.shortcodes = []  # In the order they were found
+        self.feed_requests = set()  # Feed request ids whose body is not read yet
+
+    def add(self, shortcodes):
+        """Record new shortcodes; returns how many were new."""
+        new = 0
+        for shortcode in shortcodes:
+            if shortcode not in self.seen:
+                self.seen.add(shortcode)
+                self.shortcodes.append(shortcode)
+                new += 1
+        return new
+
+    def feed_shortcodes(self):
+        """Shortcodes in the feed responses that finished loading since the last call."""
+        finished = []
+        for entry in self.driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            params = message.get("params", {})
+            if message.get("method") == "Network.responseReceived":
+                response = params.get("response", {})
+                if "json" in response.get("mimeType", "") and any(
+                    marker in response.get("url", "") for marker in FEED_URL_MARKERS
+                ):
+                    self.feed_requests.add(params["requestId"])
+            elif message.get("method") == "Network.loadingFinished":
+                if params.get("requestId") in self.feed_requests:
+                    finished.append(params["requestId"])
+
+        shortcodes = []
+        for request_id in finished:
+            self.feed_requests.discard(request_id)
+            try:
+                body = self.driver.execute_cdp_cmd(
+                    "Network.getResponseBody", {"requestId": request_id}
+                )
+                text = body["body"]
+                if body.get("base64Encoded"):
+                    text = base64.b64decode(text).decode("utf-8")
+                shortcodes.extend(shortcodes_from_json(json.loads(text)))
+            except (WebDriverException, ValueError):
+                continue  # Body evicted or not JSON; the grid links still count
+        return shortcodes
+
+    def harvest(self):
+        """Add the shortcodes currently in the grid and in new feed responses."""
+        hrefs = self.driver.execute_script(GRID_LINKS_SCRIPT)
+        return self.add(shortcodes_from_links(hrefs)) + self.add(self.feed_shortcodes())
+
+    def collect(self, target=TARGET_POSTS, max_idle_scrolls=MAX_IDLE_SCROLLS):
+        """
+        Scroll until `target` shortcodes are found or `max_idle_scrolls`
+        scrolls in a row find nothing new. Returns the first `target`.
+        """
+        self.driver.get(f"https://www.instagram.com/explore/tags/{self.hashtag}/")
+        sleep(random.uniform(5, 6.5))
+        self.driver.get_log("performance")  # Drop events from before the page
+
+        idle_scrolls = 0
+        with tqdm(total=target, desc=f"#{self.hashtag}", unit="post") as pbar:
+            while len(self.shortcodes) < target:
+                new = self.harvest()
+                pbar.update(min(new, target - pbar.n))
+                if new:
+                    idle_scrolls = 0
+                else:
+                    idle_scrolls += 1
+                    if idle_scrolls >= max_idle_scrolls:
+                        print(
+                            f"⚠️  No new posts after {max_idle_scrolls} scrolls, "
+                            f"stopping at {len(self.shortcodes)}"
+                        )
+                        break
+                self.driver.execute_script(
+                    "window.scrollTo(0, document.body.scrollHeight);"
+                )
+                sleep(random.uniform(*SCROLL_PAUSE))
+        return self.shortcodes[:target]
+
+    def to_frame(self, shortcodes):
+        return pd.DataFrame(
+            {
+                "url": [POST_URL.format(shortcode) for shortcode in shortcodes],
+                "hash_tag": self.hashtag,
+            }
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("hashtags", nargs="+")
+    parser.add_argument("--target", type=int, default=TARGET_POSTS)
+    parser.add_argument("--max-idle-scrolls", type=int, default=MAX_IDLE_SCROLLS)
+    parser.add_argument("--output-folder", default=OUTPUT_FOLDER)
+    parser.add_argument("--headless", action="store_true")
+    parser.add_argument(
+        "--overwrite", action="store_true", help="Recollect hashtags that have a CSV"
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.output_folder, exist_ok=True)
+    driver = create_driver(args.headless)
+    try:
+        login_to_instagram(driver)
+        for hashtag in args.hashtags:
+            hashtag = hashtag.lstrip("#")
+            output_file = os.path.join(args.output_folder, f"{hashtag}.csv")
+            if os.path.exists(output_file) and not args.overwrite:
+                print(f"⚠️  Skipping #{hashtag} – {output_file} already exists")
+                continue
+
+            start = time.time()
+            collector = HashtagCollector(driver, hashtag)
+            shortcodes = collector.collect(args.target, args.max_idle_scrolls)
+            collector.to_frame(shortcodes).to_csv(output_file, index=False)
+            print(
+                f"✓ #{hashtag}: {len(shortcodes)} posts in "
+                f"{time.time() - start:.1f}s -> {output_file}"
+            )
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()